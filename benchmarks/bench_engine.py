@@ -0,0 +1,296 @@
+"""AnalyticsEngine methods and the /analytics endpoint across dataset sizes.
+
+Each case is timed end to end and split into phases:
+
+- sql: time inside cursor.execute, from SQLAlchemy's cursor events
+- render: building Plotly figures (AnalyticsEngine._render minus nested sql and serialization)
+- serialization: Figure.to_plotly_json, plus encoding the HTTP response for endpoint cases
+- dataframe: everything else, i.e. row conversion and pandas work
+
+Databases are generated once per size and month with src.database.synthetic
+(fixed seed) and reused from benchmarks/data/. Results are written as JSON and
+compared against benchmarks/baseline_engine.json; phases that slowed down by
+more than --threshold are reported and the exit status is 1.
+
+Run with: PYTHONPATH=. python benchmarks/bench_engine.py
+The 10k and 1m sizes run by default and are the ones in the baseline; 10m
+is opt-in. Refresh the baseline with --save-baseline on the reference machine.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./dev.db")
+
+import plotly.basedatatypes
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.analytics.engine import AnalyticsEngine
+from src.database.migrations import apply_migrations
+from src.database.synthetic import generate_dataset
+
+HERE = Path(__file__).parent
+DATA_DIR = HERE / "data"
+BASELINE = HERE / "baseline_engine.json"
+
+SIZES = {
+    "10k": dict(organizations=10, users=2_000, badges=40, enrollments=10_000),
+    "1m": dict(organizations=100, users=100_000, badges=200, enrollments=1_000_000),
+    "10m": dict(organizations=500, users=1_000_000, badges=500, enrollments=10_000_000),
+}
+# 10m takes long to generate and has no baseline; pass --sizes 10m to run it
+DEFAULT_SIZES = ["10k", "1m"]
+SEED = 42
+# Data ends at the start of the current month so the engine's rolling
+# 180-day window always has data; databases are rebuilt once a month
+END = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+ENDPOINT_QUERIES = {
+    "badge_enrollments": "How many people are enrolled in Python Master badge?",
+    "organization_trends": "What's the enrollment trend for Tech Corp over time?",
+    "completion_metrics": "What's the completion rate across badges?",
+    "learning_paths": "Show me common learning paths",
+}
+
+PHASES = ("sql", "dataframe", "render", "serialization")
+
+class PhaseTimer:
+    """Accumulates SQL, render and serialization time while installed"""
+
+    def __init__(self):
+        self.reset()
+        self._patch_figures()
+
+    def reset(self) -> None:
+        self.totals = dict.fromkeys(("sql", "render", "serialization"), 0.0)
+
+    @contextmanager
+    def measure(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[phase] += time.perf_counter() - started
+
+    def watch(self, engine) -> None:
+        starts: List[float] = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(*args):
+            starts.append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(*args):
+            self.totals["sql"] += time.perf_counter() - starts.pop()
+
+    def _patch_figures(self) -> None:
+        timer = self
+        original_to_dict = plotly.basedatatypes.BaseFigure.to_plotly_json
+        original_render = AnalyticsEngine._render
+
+        def to_dict(figure, *args, **kwargs):
+            with timer.measure("serialization"):
+                return original_to_dict(figure, *args, **kwargs)
+
+        def render(builders, charts=None):
+            # Chart builders may query (e.g. the box plot); that time stays under sql
+            nested_before = timer.totals["serialization"] + timer.totals["sql"]
+            started = time.perf_counter()
+            try:
+                return original_render(builders, charts)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = timer.totals["serialization"] + timer.totals["sql"] - nested_before
+                timer.totals["render"] += elapsed - nested
+
+        plotly.basedatatypes.BaseFigure.to_plotly_json = to_dict
+        AnalyticsEngine._render = staticmethod(render)
+
+    def patch_responses(self) -> None:
+        """Counts FastAPI's response encoding as serialization"""
+        import fastapi.routing
+        from src.serialization import FastJSONResponse
+        timer = self
+        original_encoder = fastapi.routing.jsonable_encoder
+        original_json_render = FastJSONResponse.render
+
+        def jsonable_encoder(*args, **kwargs):
+            with timer.measure("serialization"):
+                return original_encoder(*args, **kwargs)
+
+        def json_render(response, content):
+            with timer.measure("serialization"):
+                return original_json_render(response, content)
+
+        fastapi.routing.jsonable_encoder = jsonable_encoder
+        FastJSONResponse.render = json_render
+
+def database_for(size: str) -> str:
+    DATA_DIR.mkdir(exist_ok=True)
+    path = DATA_DIR / f"engine_{size}_seed{SEED}_{END:%Y%m}.db"
+    if not path.exists():
+        print(f"Generating {size} database at {path} ...", flush=True)
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        generate_dataset(create_engine(f"sqlite:///{partial}"), seed=SEED, end=END, **SIZES[size])
+        partial.rename(path)
+    else:
+        # Databases generated by earlier versions
+        apply_migrations(create_engine(f"sqlite:///{path}"))
+    return f"sqlite:///{path}"
+
+def run_case(timer: PhaseTimer, fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        timer.reset()
+        started = time.perf_counter()
+        fn()
+        total = time.perf_counter() - started
+        phases = dict(timer.totals)
+        phases["dataframe"] = max(total - sum(phases.values()), 0.0)
+        phases["total"] = total
+        samples.append(phases)
+    return {name: round(statistics.median(s[name] for s in samples) * 1000, 3)
+            for name in PHASES + ("total",)}
+
+def engine_cases(db, use_rollups: bool) -> Dict[str, Callable[[], Any]]:
+    label = "" if use_rollups else " (raw)"
+
+    def call(method: str):
+        return lambda: getattr(AnalyticsEngine(db, use_rollups=use_rollups), method)()
+
+    return {
+        f"engine.get_badge_enrollments{label}": call("get_badge_enrollments"),
+        f"engine.get_organization_trends{label}": call("get_organization_trends"),
+        f"engine.get_completion_metrics{label}": call("get_completion_metrics"),
+        f"engine.get_learning_paths{label}": call("get_learning_paths"),
+    }
+
+def endpoint_cases(db_engine) -> Dict[str, Callable[[], Any]]:
+    """POST /analytics with a canned LLM and the result and answer caches bypassed"""
+    from fastapi.testclient import TestClient
+    from langchain_community.llms.fake import FakeListLLM
+    from src import deployment
+    from src.analytics import cache
+    from src.answer_cache import AnswerCache
+    from src.database.config import get_read_db
+
+    Session = sessionmaker(bind=db_engine)
+
+    def override_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    deployment.app.dependency_overrides[get_read_db] = override_db
+    deployment.sessions.llm_factory = lambda: FakeListLLM(responses=["Benchmark answer."])
+    deployment.answer_cache = AnswerCache(None)
+    client = TestClient(deployment.app)
+
+    def call(query: str):
+        def post():
+            cache.result_cache.clear()
+            response = client.post("/analytics", json={"query": query})
+            response.raise_for_status()
+            body = response.json()
+            if "error" in body:
+                raise RuntimeError(body["error"])
+        return post
+
+    return {f"endpoint /analytics {name}": call(query) for name, query in ENDPOINT_QUERIES.items()}
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_ms: float) -> List[str]:
+    """Phases slower than ``threshold`` times the baseline and by more than ``min_ms``"""
+    regressions = []
+    for size, cases in results["sizes"].items():
+        for case, timings in cases.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(case)
+            if not before:
+                continue
+            for phase in PHASES + ("total",):
+                old, new = before.get(phase), timings[phase]
+                if old is not None and new > old * threshold and new - old > min_ms:
+                    regressions.append(f"{size} {case} {phase}: {old:.1f} ms -> {new:.1f} ms ({new / old:.2f}x)"
+                                       if old else f"{size} {case} {phase}: 0 ms -> {new:.1f} ms")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--raw", action="store_true", help="also time the engine without rollups")
+    parser.add_argument("--no-endpoint", action="store_true", help="skip the /analytics cases")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--min-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    timer = PhaseTimer()
+    if not args.no_endpoint:
+        timer.patch_responses()
+    results: Dict[str, Any] = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "repeat": args.repeat,
+        "unit": "ms",
+        "sizes": {}
+    }
+    for size in args.sizes:
+        database_url = database_for(size)
+        db_engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        timer.watch(db_engine)
+        db = sessionmaker(bind=db_engine)()
+        cases = engine_cases(db, use_rollups=True)
+        if args.raw:
+            cases.update(engine_cases(db, use_rollups=False))
+        if not args.no_endpoint:
+            cases.update(endpoint_cases(db_engine))
+        results["sizes"][size] = {}
+        for case, fn in cases.items():
+            fn()  # warm caches and imports
+            timings = run_case(timer, fn, args.repeat)
+            results["sizes"][size][case] = timings
+            print(f"{size:>4} {case:<48} " + "  ".join(f"{p}={timings[p]:9.1f}" for p in PHASES + ("total",)),
+                  flush=True)
+        db.close()
+
+    output = args.output or HERE / "results" / f"engine-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"sizes": {}}
+        baseline.update({k: v for k, v in results.items() if k != "sizes"})
+        baseline.setdefault("sizes", {}).update(results["sizes"])
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline updated at {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("No baseline to compare against.")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold, args.min_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""/analytics payload size and encode time: embedded figure objects vs. figure strings.
+
+For each engine method's primary chart this builds the /analytics response
+body both ways, starting from the same Plotly figure:
+
+- string: fig.to_json() embedded as a string, encoded by FastAPI's
+  jsonable_encoder and the stdlib JSONResponse (the previous path)
+- object: fig.to_plotly_json() embedded as an object and encoded with
+  src.serialization.dumps (orjson)
+
+and reports body size, encode time, the browser-side decode time (JSON.parse
+approximated by json.loads, twice for the string form) and the gzip and brotli
+sizes of the new body. The last columns compare the figure with a chart spec
+(chart_format="spec"): the size of the visualization alone and the engine time.
+
+Run with: PYTHONPATH=. python benchmarks/bench_payloads.py --size 10k
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./dev.db")
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import JSONResponse
+
+from bench_engine import SIZES, database_for
+from src.analytics.engine import AnalyticsEngine, PRIMARY_CHARTS
+from src.config.settings import get_settings
+from src.database.config import create_database_engine
+from src.serialization import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def primary_figure(db, method: str):
+    """Engine data and the primary chart as a Plotly figure"""
+    figures = {}
+    original = AnalyticsEngine._render
+
+    def capture(builders, charts=None):
+        figures.update({name: builders[name]() for name in charts})
+        return original(builders, charts)
+
+    AnalyticsEngine._render = staticmethod(capture)
+    try:
+        result = getattr(AnalyticsEngine(db), method)(charts=[PRIMARY_CHARTS[method]])
+    finally:
+        AnalyticsEngine._render = staticmethod(original)
+    return result["data"], figures[PRIMARY_CHARTS[method]]
+
+def response_body(data: Any, visualization: Any) -> Dict[str, Any]:
+    return {
+        "response": "Benchmark answer.",
+        "type": "analytics",
+        "metadata": {"intent": "benchmark", "analytics_data": {"items": data} if isinstance(data, list) else data},
+        "visualization": visualization
+    }
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=list(SIZES), default="10k")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    db = sessionmaker(bind=create_database_engine(database_for(args.size)))()
+    print(f"{'method':<26} {'string KB':>10} {'object KB':>10} {'gzip KB':>8} {'br KB':>7} "
+          f"{'encode ms':>18} {'decode ms':>18} {'visualization KB':>18} {'engine ms':>20}")
+    for method in PRIMARY_CHARTS:
+        data, figure = primary_figure(db, method)
+
+        def encode_string():
+            return JSONResponse(None).render(jsonable_encoder(response_body(data, figure.to_json())))
+
+        def encode_object():
+            return dumps(response_body(data, figure.to_plotly_json()))
+
+        old_body, new_body = encode_string(), encode_object()
+        old_encode, new_encode = median_ms(encode_string, args.repeat), median_ms(encode_object, args.repeat)
+        old_decode = median_ms(lambda: json.loads(json.loads(old_body)["visualization"]), args.repeat)
+        new_decode = median_ms(lambda: json.loads(new_body), args.repeat)
+        gzip_size = len(gzip.compress(new_body, compresslevel=settings.GZIP_LEVEL))
+        br_size = len(brotli.compress(new_body, quality=settings.BROTLI_QUALITY)) if brotli else float("nan")
+
+        engine = AnalyticsEngine(db)
+        charts = [PRIMARY_CHARTS[method]]
+        spec = getattr(engine, method)(charts=charts, chart_format="spec")["visualization"]
+        figure_size, spec_size = len(dumps(figure.to_plotly_json())), len(dumps(spec))
+        figure_engine = median_ms(lambda: getattr(engine, method)(charts=charts), args.repeat)
+        spec_engine = median_ms(lambda: getattr(engine, method)(charts=charts, chart_format="spec"), args.repeat)
+
+        print(f"{method:<26} {len(old_body) / 1024:10.1f} {len(new_body) / 1024:10.1f} "
+              f"{gzip_size / 1024:8.1f} {br_size / 1024:7.1f} "
+              f"{old_encode:8.2f} -> {new_encode:6.2f} {old_decode:8.2f} -> {new_decode:6.2f} "
+              f"{figure_size / 1024:8.1f} -> {spec_size / 1024:6.1f} {figure_engine:9.1f} -> {spec_engine:7.1f}", flush=True)
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Routing cost per query: precompiled router vs. the previous regex chain.
+
+Run with: PYTHONPATH=. python benchmarks/bench_router.py
+"""
+import re
+import timeit
+from src.analytics.router import IntentRouter
+
+QUERIES = [
+    "How many people are enrolled in the Badge 0042 badge?",
+    "How many users are in organization Org 0117?",
+    "What's the enrollment trend for Org 0007 over the last 6 months?",
+    "What's the completion rate percentage across badges?",
+    "Show me common learning paths",
+    "Tell me something interesting",
+]
+
+def legacy_route(query):
+    # The per-request patterns the /analytics handler used before the router
+    badge_pattern = r"(?i)(how many|enrollments?|users?).+(?:badge|course)\s+[\"']?([^\"']+)[\"']?"
+    org_pattern = r"(?i)(how many|enrollments?|users?).+(?:organization|org)\s+[\"']?([^\"']+)[\"']?"
+    if re.search(badge_pattern, query):
+        return "badge", re.search(badge_pattern, query).group(2)
+    if re.search(org_pattern, query):
+        return "org", re.search(org_pattern, query).group(2)
+    if re.search(r"(?i)(trend|over time|historical)", query):
+        return "trend", None
+    if re.search(r"(?i)(completion|success).+(rate|percentage)", query):
+        return "completion", None
+    if re.search(r"(?i)(learning path|badge combination|journey)", query):
+        return "path", None
+    return None, None
+
+def main(badges: int = 500, organizations: int = 200, number: int = 20000):
+    router = IntentRouter()
+    router.load([f"Badge {i:04d}" for i in range(badges)], [f"Org {i:04d}" for i in range(organizations)])
+    for name, fn in (("router", router.route), ("legacy regex", legacy_route)):
+        seconds = timeit.timeit(lambda: [fn(q) for q in QUERIES], number=number // len(QUERIES))
+        per_query_us = seconds / number * 1e6
+        print(f"{name:>14}: {per_query_us:8.2f} µs/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Concurrent SQLite read throughput with and without the tuning profile.
+
+Reader threads run the engine's badge and organization queries for random
+badges and organizations while one writer commits small batches of
+enrollments through the ORM, as the app does. Two profiles run on separate
+copies of the same generated database:
+
+- default: one engine with SQLite's defaults (rollback journal), shared by readers and writer
+- tuned: the settings' PRAGMA profile (WAL, mmap, cache) and a read-only reader pool
+
+Run with: PYTHONPATH=. python benchmarks/bench_sqlite_reads.py --size 1m --readers 8
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./dev.db")
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from bench_engine import SIZES, database_for
+from src.analytics.engine import AnalyticsEngine
+from src.database.config import create_database_engine
+from src.models.models import Badge, Enrollment, Organization, User
+
+HERE = Path(__file__).parent
+
+def engines_for(profile: str, url: str):
+    """(writer, reader) engines for a profile"""
+    if profile == "default":
+        engine = create_database_engine(url, pragmas={"journal_mode": "DELETE"})
+        return engine, engine
+    return create_database_engine(url), create_database_engine(url, read_only=True)
+
+def run_profile(profile: str, source: Path, readers: int, seconds: float, write_batch: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / source.name
+        shutil.copy(source, path)
+        writer_engine, reader_engine = engines_for(profile, f"sqlite:///{path}")
+
+        with writer_engine.connect() as conn:
+            badge_names = conn.execute(select(Badge.name)).scalars().all()
+            org_names = conn.execute(select(Organization.name)).scalars().all()
+            user_count = conn.execute(select(func.count()).select_from(User)).scalar()
+            badge_count = len(badge_names)
+
+        stop = threading.Event()
+        latencies: List[List[float]] = [[] for _ in range(readers)]
+        errors = [0] * readers
+        writes = [0]
+
+        def read(index: int) -> None:
+            rng = random.Random(index)
+            Session = sessionmaker(bind=reader_engine)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    with Session() as db:
+                        analytics = AnalyticsEngine(db)
+                        analytics.badge_enrollments_query(rng.choice(badge_names)).all()
+                        db.execute(analytics.organization_trends_query(rng.choice(org_names))).all()
+                except Exception:
+                    errors[index] += 1
+                    continue
+                latencies[index].append(time.perf_counter() - started)
+
+        def write() -> None:
+            rng = random.Random(-1)
+            Session = sessionmaker(bind=writer_engine)
+            while not stop.is_set():
+                with Session() as db:
+                    now = datetime.utcnow()
+                    db.add_all([Enrollment(user_id=rng.randint(1, user_count), badge_id=rng.randint(1, badge_count),
+                                           enrollment_date=now - timedelta(minutes=rng.randint(0, 600)))
+                                for _ in range(write_batch)])
+                    db.commit()
+                writes[0] += 1
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+    samples = sorted(s for per_thread in latencies for s in per_thread)
+    return {
+        "reads_per_second": round(len(samples) / seconds, 1),
+        "read_p50_ms": round(statistics.median(samples) * 1000, 3) if samples else None,
+        "read_p95_ms": round(samples[int(len(samples) * 0.95)] * 1000, 3) if samples else None,
+        "write_commits_per_second": round(writes[0] / seconds, 1),
+        "read_errors": sum(errors),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=list(SIZES), default="1m")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-batch", type=int, default=100, help="enrollments per write commit")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    source = Path(database_for(args.size).replace("sqlite:///", ""))
+    results: Dict[str, Any] = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "size": args.size,
+        "readers": args.readers,
+        "seconds": args.seconds,
+        "write_batch": args.write_batch,
+        "profiles": {}
+    }
+    for profile in ("default", "tuned"):
+        timings = run_profile(profile, source, args.readers, args.seconds, args.write_batch)
+        results["profiles"][profile] = timings
+        print(f"{profile:>8}: " + "  ".join(f"{name}={value}" for name, value in timings.items()), flush=True)
+
+    output = args.output or HERE / "results" / f"sqlite-reads-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Sequence, Tuple, Hashable
+import threading
+import time
+from ..config.settings import get_settings
+from ..serialization import dumps
+from ..models.models import EnrollmentVersion
+from ..database.versions import VERSION_ROW_ID
+from .engine import AnalyticsEngine
+
+# Bumped by writers that change data the enrollment write counters do not
+# cover (badges, organizations, users moving between organizations, ...)
+_write_generation = 0
+_generation_lock = threading.Lock()
+
+def bump_data_version() -> int:
+    """Explicitly invalidate every cached result; call after writing enrollments"""
+    global _write_generation
+    with _generation_lock:
+        _write_generation += 1
+        return _write_generation
+
+def data_version(db: Session) -> Tuple[int, int]:
+    """Watermark of the enrollment data: (enrollment writes counted by the database, write generation)
+
+    The count is kept by triggers (see src.database.versions), so writes from
+    other processes and Core statements are seen too, at the cost of one row read.
+    """
+    writes = db.execute(select(EnrollmentVersion.writes).where(EnrollmentVersion.id == VERSION_ROW_ID)).scalar()
+    return (writes or 0, _write_generation)
+
+def history_version(db: Session) -> Tuple[int, int]:
+    """Watermark of days already past: (enrollment writes that can change them, write generation)
+
+    Also kept by the triggers, so only backdated inserts, updates of
+    enrollment_date, user_id or badge_id, deletes, users moving to another
+    organization, and organization renames and deletes move it, whoever makes them.
+    """
+    writes = db.execute(
+        select(EnrollmentVersion.history_writes).where(EnrollmentVersion.id == VERSION_ROW_ID)
+    ).scalar()
+    return (writes or 0, _write_generation)
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached result in bytes"""
+    return len(dumps(value))
+
+class ResultCache:
+    """LRU cache with TTL, memory cap and hit/miss counters for engine results
+
+    Entries are tagged with the data version they were computed against and are
+    treated as misses once the version moves on. Pinned entries (see pin()) are
+    exempt from the TTL and from eviction and are served until that happens.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._pinned: Dict[Hashable, Tuple[Any, Any, int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: Any) -> Tuple[bool, Any]:
+        """Returns (found, value) for a key computed against the given data version"""
+        with self._lock:
+            pinned = self._pinned.get(key)
+            if pinned is not None and pinned[1] == version:
+                self.hits += 1
+                return True, pinned[0]
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, stored_at, _ = entry
+                expired = self.ttl is not None and time.monotonic() - stored_at > self.ttl
+                if entry_version == version and not expired:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, version: Any, value: Any) -> None:
+        size = _estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, version, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pin(self, key: Hashable, version: Any, value: Any) -> None:
+        """Stores a result outside the LRU until unpin_stale() drops its version"""
+        size = _estimate_size(value)
+        with self._lock:
+            self._pinned[key] = (value, version, size)
+
+    def unpin_stale(self, version: Any) -> int:
+        """Drops pinned entries computed against any other version, returning how many"""
+        with self._lock:
+            stale = [key for key, (_, pinned_version, _) in self._pinned.items() if pinned_version != version]
+            for key in stale:
+                del self._pinned[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._pinned.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "pinned_entries": len(self._pinned),
+                "pinned_bytes": sum(size for _, _, size in self._pinned.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+settings = get_settings()
+
+# Process-wide cache shared by every request
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl=settings.RESULT_CACHE_TTL_SECONDS
+)
+
+# Closed trend buckets, kept until a write changes a past day or the TTL runs out
+trend_bucket_cache = ResultCache(
+    max_entries=settings.TREND_BUCKET_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl=settings.TREND_BUCKET_CACHE_TTL_SECONDS
+)
+
+class CachedAnalyticsEngine(AnalyticsEngine):
+    """AnalyticsEngine that serves repeated questions from a versioned result cache
+
+    The data version is read once per engine instance, i.e. once per request.
+    Cached results are shared between callers and must not be mutated. With
+    ``pin``, every call is computed afresh and pinned in the cache, which is how
+    the precompute scheduler warms results for later requests. Closed trend
+    buckets are shared through ``trend_bucket_cache``.
+    """
+    bucket_cache = trend_bucket_cache
+
+    def __init__(self, db: Session, cache: ResultCache = None, pin: bool = False):
+        super().__init__(db)
+        self.cache = cache if cache is not None else result_cache
+        self.pin = pin
+        self._version = None
+        self._bucket_version = None
+
+    def bucket_version(self) -> Tuple[int, int]:
+        if self._bucket_version is None:
+            self._bucket_version = history_version(self.db)
+        return self._bucket_version
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        if self._version is None:
+            self._version = data_version(self.db)
+        return self._version
+
+    def _cached(self, method: str, compute, *args, charts: Optional[Sequence[str]] = None, **options) -> Dict[str, Any]:
+        key = (method, args, None if charts is None else tuple(charts), tuple(sorted(options.items())))
+        if self.pin:
+            value = compute(*args, charts=charts, **options)
+            self.cache.pin(key, self.version, value)
+            return value
+        found, value = self.cache.get(key, self.version)
+        if found:
+            return value
+        value = compute(*args, charts=charts, **options)
+        self.cache.put(key, self.version, value)
+        return value
+
+    def get_badge_enrollments(self, badge_name: str = None, charts: Optional[Sequence[str]] = None,
+                              limit: Optional[int] = None, cursor: Optional[str] = None,
+                              chart_format: str = "figure") -> Dict[str, Any]:
+        return self._cached("get_badge_enrollments", super().get_badge_enrollments, badge_name, charts=charts,
+                            limit=limit, cursor=cursor, chart_format=chart_format)
+
+    def get_organization_trends(self, org_name: str = None, charts: Optional[Sequence[str]] = None,
+                                chart_format: str = "figure", start: Optional[datetime] = None,
+                                end: Optional[datetime] = None, granularity: str = "month") -> Dict[str, Any]:
+        return self._cached("get_organization_trends", super().get_organization_trends, org_name, charts=charts,
+                            chart_format=chart_format, start=start, end=end, granularity=granularity)
+
+    def get_completion_metrics(self, charts: Optional[Sequence[str]] = None,
+                               limit: Optional[int] = None, cursor: Optional[str] = None,
+                               chart_format: str = "figure") -> Dict[str, Any]:
+        return self._cached("get_completion_metrics", super().get_completion_metrics, charts=charts,
+                            limit=limit, cursor=cursor, chart_format=chart_format)
+
+    def get_learning_paths(self, charts: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+                           cursor: Optional[str] = None, summary_only: bool = False,
+                           chart_format: str = "figure") -> Dict[str, Any]:
+        return self._cached("get_learning_paths", super().get_learning_paths, charts=charts,
+                            limit=limit, cursor=cursor, summary_only=summary_only, chart_format=chart_format)
@@ -1,375 +1,951 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Union
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from ..models.models import Organization, User, Badge, Course, Enrollment
+from sqlalchemy import func, desc, select, union_all, case, cast, and_, or_, tuple_, Float
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Union, Optional, Sequence, Callable, Tuple
+import base64
+import binascii
+import json
+from ..lazy import lazy_module
+from ..models.models import (
+    Organization, User, Badge, Course, Enrollment,
+    BadgeDailyRollup, OrganizationMonthlyRollup, BadgeOrganizationRollup
+)
+from .rollups import rollups_ready
+from ..database.dialect import days_between, month_key, week_key, day_key, string_agg
+from ..tracing import stage
+
+# Imported on first use, so starting a worker does not pay for them
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+px = lazy_module("plotly.express")
+go = lazy_module("plotly.graph_objects")
+
+# Pass as ``charts`` to skip figure construction entirely and return data only
+DATA_ONLY: Sequence[str] = ()
+
+# "figure" returns Plotly figure dicts; "spec" returns a chart descriptor for
+# the client to draw, with only the columns it plots
+CHART_FORMATS = ("figure", "spec")
+
+# The chart each method exposes as its primary ``visualization``
+PRIMARY_CHARTS = {
+    "get_badge_enrollments": "bar",
+    "get_organization_trends": "line",
+    "get_completion_metrics": "heatmap",
+    "get_learning_paths": "sankey",
+}
+
+# Request options each method accepts besides the filters the router picks
+PAGE_OPTIONS = {
+    "get_badge_enrollments": ("limit", "cursor"),
+    "get_organization_trends": ("start", "end", "granularity"),
+    "get_completion_metrics": ("limit", "cursor"),
+    "get_learning_paths": ("limit", "cursor", "summary_only"),
+}
+
+# Time buckets organization trends can be counted in
+TREND_GRANULARITIES = ("day", "week", "month")
+
+# Length of the trend window when no start is given
+DEFAULT_TREND_DAYS = 180
+
+# Joins the badges of a learning path
+PATH_SEPARATOR = " → "
+
+# Most common learning paths returned, and pasted into the LLM prompt
+TOP_LEARNING_PATHS = 50
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the day, ISO week (from Monday) or month containing ``moment``"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    """Start of the bucket after the one starting at ``start``"""
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def bucket_label(start: datetime, granularity: str) -> str:
+    """'YYYY-MM' for months, the first day as 'YYYY-MM-DD' for days and weeks, as the SQL keys read"""
+    return start.strftime('%Y-%m' if granularity == "month" else '%Y-%m-%d')
+
+def _bucket_key(column, granularity: str):
+    return {"day": day_key, "week": week_key, "month": month_key}[granularity](column)
+
+def _in_range(column, start: Any, end: Optional[Any]):
+    return column >= start if end is None else and_(column >= start, column < end)
+
+def _naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, width: int) -> List[Any]:
+    """Sort key from a cursor made by encode_cursor; raises ValueError if malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if not isinstance(key, list) or len(key) != width:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return key
+
+def chart_spec(chart_type: str, title: str, columns: Dict[str, List[Any]], **encoding: Any) -> Dict[str, Any]:
+    """Descriptor of a chart drawn by the client: its type, title, encoding
+    (x, y, color, ...) and the plotted columns by name
+
+    Heatmaps carry z as a matrix over the distinct x and y values, and Sankey
+    diagrams list their nodes once and link them by index, as Plotly takes them.
+    """
+    return {'type': chart_type, 'title': title, **encoding, 'data': columns}
+
+def _columns(rows: Sequence[Dict[str, Any]], names: Sequence[str]) -> Dict[str, List[Any]]:
+    return {name: [row[name] for row in rows] for name in names}
+
+def _page(rows: Sequence[Any], limit: Optional[int], key: Callable[[Any], Sequence[Any]]) -> Tuple[Sequence[Any], Optional[str]]:
+    """Trims rows fetched with ``limit + 1`` to the page, returning the next cursor if more remain"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
 
 class AnalyticsEngine:
-    def __init__(self, db: Session):
+    # Rows of closed trend buckets shared across requests (a ResultCache); set by CachedAnalyticsEngine
+    bucket_cache = None
+
+    def __init__(self, db: Session, use_rollups: bool = True):
         self.db = db
-        
-    def _create_multi_visualization(self, data: Union[List[Dict[str, Any]], Dict[str, Any]], query_type: str) -> Dict[str, Any]:
+        self.use_rollups = use_rollups
+        self._rollups_ready = None
+
+    @property
+    def rollups_available(self) -> bool:
+        """Whether aggregates can be read from the rollup tables instead of enrollments"""
+        if not self.use_rollups:
+            return False
+        if self._rollups_ready is None:
+            self._rollups_ready = rollups_ready(self.db)
+        return self._rollups_ready
+
+    def bucket_version(self) -> Any:
+        """Version closed trend buckets are cached against"""
+        return None
+
+    @staticmethod
+    def _render(builders: Dict[str, Callable[[], "go.Figure"]],
+                charts: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Builds only the requested figures, as Plotly JSON dicts ready to embed in a response
+
+        Args:
+            builders: Mapping of chart name to a callable that builds the figure
+            charts: Names of the charts to build; None builds all of them
+        """
+        if charts is None:
+            charts = list(builders)
+        unknown = [name for name in charts if name not in builders]
+        if unknown:
+            raise ValueError(f"Unknown chart(s) {unknown}; available: {list(builders)}")
+        rendered = {}
+        for name in charts:
+            with stage("render"):
+                figure = builders[name]()
+            with stage("to_dict"):
+                rendered[name] = figure.to_plotly_json()
+        return rendered
+
+    @classmethod
+    def _visualize(cls, builders: Callable[[], Dict[str, Callable[[], "go.Figure"]]],
+                   specs: Callable[[], Dict[str, Callable[[], Dict[str, Any]]]],
+                   charts: Optional[Sequence[str]], chart_format: str) -> Dict[str, Dict[str, Any]]:
+        """Renders the requested charts as figures, or describes them with chart_spec
+
+        Only the primary chart of each method has a spec.
+        """
+        if chart_format == "figure":
+            return cls._render(builders(), charts)
+        if chart_format != "spec":
+            raise ValueError(f"Unknown chart_format {chart_format!r}; available: {list(CHART_FORMATS)}")
+        specs = specs()
+        if charts is None:
+            charts = list(specs)
+        unknown = [name for name in charts if name not in specs]
+        if unknown:
+            raise ValueError(f"No spec for chart(s) {unknown}; available: {list(specs)}")
+        return {name: specs[name]() for name in charts}
+
+    @staticmethod
+    def _result(method: str, data: Any, visualizations: Dict[str, Dict[str, Any]], next_cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Packs data and rendered figures, exposing the primary chart when it was built"""
+        return {
+            'data': data,
+            'visualization': visualizations.get(PRIMARY_CHARTS[method]),
+            'visualizations': visualizations,
+            'next_cursor': next_cursor
+        }
+
+    @staticmethod
+    def _check_limit(limit: Optional[int]) -> None:
+        if limit is not None and limit < 1:
+            raise ValueError(f"limit must be a positive integer, got {limit}")
+
+    def _create_multi_visualization(self, data: Union[List[Dict[str, Any]], Dict[str, Any]], query_type: str,
+                                    charts: Optional[Sequence[str]] = None,
+                                    chart_format: str = "figure", period: str = "month") -> Dict[str, Any]:
         """Creates multiple visualizations for the data
         
         Args:
             data: Either a list of dictionaries or a single dictionary with the data
             query_type: Type of visualization to create (enrollment or timeline)
+            charts: Names of the charts to build; None builds all of them
+            chart_format: One of CHART_FORMATS
+            period: Time bucket column of timeline data (day, week or month)
         """
-        figs = {}
-        df = pd.DataFrame(data if isinstance(data, list) else [data])
-        
+        return self._visualize(lambda: self._chart_builders(data, query_type, period),
+                               lambda: self._chart_specs(data, query_type, period), charts, chart_format)
+
+    @staticmethod
+    def _chart_specs(data: Union[List[Dict[str, Any]], Dict[str, Any]], query_type: str,
+                     period: str = "month") -> Dict[str, Callable[[], Dict[str, Any]]]:
+        """Returns chart_spec builders for the primary enrollment/timeline charts"""
+        rows = data if isinstance(data, list) else [data]
         if query_type == "enrollment":
-            # Primary visualization (bar chart)
-            figs["bar"] = px.bar(df, x='badge', y=['total_enrollments', 'completed'],
-                                title='Badge Enrollments and Completions',
-                                barmode='group')
-            
-            # Radar chart for completion rates
-            figs["radar"] = go.Figure()
-            figs["radar"].add_trace(go.Scatterpolar(
-                r=df['completion_rate'],
-                theta=df['badge'],
-                fill='toself',
-                name='Completion Rate'
-            ))
-            figs["radar"].update_layout(title='Completion Rates by Badge')
-            
-            # Funnel chart for enrollment stages
-            stages = ['total_enrollments', 'completed']
-            figs["funnel"] = go.Figure(go.Funnel(
-                y=stages,
-                x=df[stages].sum(),
-                textinfo="value+percent initial"
-            ))
-            figs["funnel"].update_layout(title='Enrollment Pipeline')
-            
-        elif query_type == "timeline":
-            # Line chart
-            figs["line"] = px.line(df, x='month', y='enrollments', 
-                                 color='organization',
-                                 title='Enrollment Timeline')
-            
-            # Area chart
-            figs["area"] = px.area(df, x='month', y='enrollments',
-                                 color='organization',
-                                 title='Cumulative Enrollments')
-            
-            # Box plot by month
-            figs["box"] = px.box(df, x='month', y='enrollments',
-                               title='Enrollment Distribution by Month')
-            
-        return {name: fig.to_json() for name, fig in figs.items()}
-
-    def get_badge_enrollments(self, badge_name: str = None) -> Dict[str, Any]:
-        """Get enrollment statistics for a specific badge or all badges with multiple visualizations"""
-        query = self.db.query(
-            Badge.name,
-            func.count(Enrollment.id).label('total_enrollments'),
-            func.count(Enrollment.completion_date).label('completed'),
-            func.avg(func.julianday(Enrollment.completion_date) - 
-                    func.julianday(Enrollment.enrollment_date)).label('avg_completion_time')
-        ).join(Enrollment).group_by(Badge.name)
+            return {"bar": lambda: chart_spec(
+                'bar', 'Badge Enrollments and Completions',
+                _columns(rows, ['badge', 'total_enrollments', 'completed']),
+                x='badge', y=['total_enrollments', 'completed'], barmode='group')}
+        if query_type == "timeline":
+            return {"line": lambda: chart_spec(
+                'line', 'Enrollment Timeline',
+                _columns(rows, ['organization', period, 'enrollments']),
+                x=period, y='enrollments', color='organization')}
+        return {}
+
+    def _chart_builders(self, data: Union[List[Dict[str, Any]], Dict[str, Any]], query_type: str,
+                        period: str = "month") -> Dict[str, Callable[[], "go.Figure"]]:
+        """Returns lazy figure builders for the shared enrollment/timeline charts"""
+        with stage("dataframe"):
+            df = pd.DataFrame(data if isinstance(data, list) else [data])
+
+        if query_type == "enrollment":
+            def bar():
+                # Primary visualization (bar chart)
+                return px.bar(df, x='badge', y=['total_enrollments', 'completed'],
+                              title='Badge Enrollments and Completions',
+                              barmode='group')
+
+            def radar():
+                # Radar chart for completion rates
+                fig = go.Figure()
+                fig.add_trace(go.Scatterpolar(
+                    r=df['completion_rate'],
+                    theta=df['badge'],
+                    fill='toself',
+                    name='Completion Rate'
+                ))
+                fig.update_layout(title='Completion Rates by Badge')
+                return fig
+
+            def funnel():
+                # Funnel chart for enrollment stages
+                stages = ['total_enrollments', 'completed']
+                fig = go.Figure(go.Funnel(
+                    y=stages,
+                    x=df[stages].sum(),
+                    textinfo="value+percent initial"
+                ))
+                fig.update_layout(title='Enrollment Pipeline')
+                return fig
+
+            return {"bar": bar, "radar": radar, "funnel": funnel}
+
+        if query_type == "timeline":
+            return {
+                # Line chart
+                "line": lambda: px.line(df, x=period, y='enrollments',
+                                        color='organization',
+                                        title='Enrollment Timeline'),
+                # Area chart
+                "area": lambda: px.area(df, x=period, y='enrollments',
+                                        color='organization',
+                                        title='Cumulative Enrollments'),
+                # Box plot by period
+                "box": lambda: px.box(df, x=period, y='enrollments',
+                                      title=f'Enrollment Distribution by {period.title()}'),
+            }
+
+        return {}
+
+    def badge_enrollments_query(self, badge_name: str = None):
+        """Per-badge enrollment aggregates behind get_badge_enrollments"""
+        if self.rollups_available:
+            query = self.db.query(
+                Badge.name.label('badge'),
+                func.sum(BadgeDailyRollup.enrollments).label('total_enrollments'),
+                func.sum(BadgeDailyRollup.completions).label('completed'),
+                (func.sum(BadgeDailyRollup.duration_sum) /
+                 func.nullif(func.sum(BadgeDailyRollup.completions), 0)).label('avg_completion_time')
+            ).join(BadgeDailyRollup, BadgeDailyRollup.badge_id == Badge.id).group_by(Badge.name)
+        else:
+            query = self.db.query(
+                Badge.name.label('badge'),
+                func.count(Enrollment.id).label('total_enrollments'),
+                func.count(Enrollment.completion_date).label('completed'),
+                func.avg(days_between(Enrollment.enrollment_date,
+                                      Enrollment.completion_date)).label('avg_completion_time')
+            ).join(Enrollment).group_by(Badge.name)
         
         if badge_name:
             query = query.filter(Badge.name == badge_name)
-        
-        results = query.all()
-        
-        data = [{
-            'badge': r[0],
-            'total_enrollments': r[1],
-            'completed': r[2],
-            'completion_rate': round(r[2] / r[1] * 100 if r[1] > 0 else 0, 2),
-            'avg_completion_time': round(r[3] if r[3] is not None else 0, 2)
-        } for r in results]
-        
-        # Create multiple visualizations
-        visualizations = self._create_multi_visualization(data, "enrollment")
-        
-        # Add bubble chart for multi-dimensional view
-        df = pd.DataFrame(data)
-        bubble_fig = px.scatter(df, 
-            x='total_enrollments',
-            y='completion_rate',
-            size='avg_completion_time',
-            color='badge',
-            title='Multi-dimensional Badge Analysis',
-            labels={
-                'total_enrollments': 'Total Enrollments',
-                'completion_rate': 'Completion Rate (%)',
-                'avg_completion_time': 'Avg. Completion Time (days)'
-            }
-        )
-        visualizations["bubble"] = bubble_fig.to_json()
-        
-        return {
-            'data': data,
-            'visualizations': visualizations
-        }
+        return query
 
-    def get_organization_trends(self, org_name: str = None) -> Dict[str, Any]:
-        """Get enrollment trends for an organization or all organizations"""
-        six_months_ago = datetime.utcnow() - timedelta(days=180)
-        
-        query = self.db.query(
-            Organization.name,
-            func.strftime('%Y-%m', Enrollment.enrollment_date).label('month'),
-            func.count(Enrollment.id).label('enrollments')
-        ).select_from(Organization)\
-         .join(User, User.organization_id == Organization.id)\
-         .join(Enrollment, Enrollment.user_id == User.id)\
-         .filter(Enrollment.enrollment_date >= six_months_ago)\
-         .group_by(Organization.name, func.strftime('%Y-%m', Enrollment.enrollment_date))
-        
-        if org_name:
-            query = query.filter(Organization.name == org_name)
-            
-        results = query.all()
-        
-        # Convert to pandas for easier processing
-        data = [{
-            'organization': r[0],
-            'month': r[1],
-            'enrollments': r[2]
-        } for r in results]
+    def get_badge_enrollments(self, badge_name: str = None, charts: Optional[Sequence[str]] = None,
+                              limit: Optional[int] = None, cursor: Optional[str] = None,
+                              chart_format: str = "figure") -> Dict[str, Any]:
+        """Get enrollment statistics for a specific badge or all badges with multiple visualizations
+
+        Pass ``charts`` to build only the named figures, or DATA_ONLY to skip them;
+        ``chart_format="spec"`` describes the primary chart instead of building it.
+        Badges are ordered by name; ``limit`` caps the page and the returned
+        ``next_cursor`` fetches the following one.
+        """
+        self._check_limit(limit)
+        query = self.badge_enrollments_query(badge_name)
+        if cursor:
+            query = query.filter(Badge.name > decode_cursor(cursor, 1)[0])
+        query = query.order_by(Badge.name)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        
+        with stage("sql"):
+            results, next_cursor = _page(query.all(), limit, lambda r: [r[0]])
+        
+        with stage("dataframe"):
+            data = [{
+                'badge': r[0],
+                'total_enrollments': r[1],
+                'completed': r[2],
+                'completion_rate': round(r[2] / r[1] * 100 if r[1] > 0 else 0, 2),
+                'avg_completion_time': round(r[3] if r[3] is not None else 0, 2)
+            } for r in results]
+        
+        def figure_builders():
+            builders = self._chart_builders(data, "enrollment")
+
+            # Add bubble chart for multi-dimensional view
+            def bubble():
+                return px.scatter(pd.DataFrame(data),
+                    x='total_enrollments',
+                    y='completion_rate',
+                    size='avg_completion_time',
+                    color='badge',
+                    title='Multi-dimensional Badge Analysis',
+                    labels={
+                        'total_enrollments': 'Total Enrollments',
+                        'completion_rate': 'Completion Rate (%)',
+                        'avg_completion_time': 'Avg. Completion Time (days)'
+                    }
+                )
+            builders["bubble"] = bubble
+            return builders
+        
+        visualizations = self._visualize(figure_builders, lambda: self._chart_specs(data, "enrollment"),
+                                         charts, chart_format)
+        return self._result("get_badge_enrollments", data, visualizations, next_cursor)
+
+    def _trend_window(self, start: Optional[datetime], end: Optional[datetime],
+                      granularity: str) -> Tuple[datetime, Optional[datetime]]:
+        """Validated [start, end) of a trend query as naive UTC; end None means up to now"""
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity!r}; available: {list(TREND_GRANULARITIES)}")
+        end = None if end is None else _naive_utc(end)
+        if start is None:
+            start = (end or datetime.utcnow()) - timedelta(days=DEFAULT_TREND_DAYS)
+        start = _naive_utc(start)
+        if end is not None and end <= start:
+            raise ValueError(f"end ({end}) must be after start ({start})")
+        return start, end
+
+    def organization_trends_query(self, org_name: str = None, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None, granularity: str = "month"):
+        """Enrollments per organization and time bucket behind get_organization_trends"""
+        start, end = self._trend_window(start, end, granularity)
+        return self._trends_select(org_name, granularity, [(start, end)])
+
+    def _trends_select(self, org_name: Optional[str], granularity: str,
+                       ranges: Sequence[Tuple[datetime, Optional[datetime]]]):
+        """Enrollments per organization and bucket within disjoint [start, end) ranges (end None: unbounded)
+
+        Each range is a plain enrollment_date range predicate. With rollups, the
+        whole months of monthly ranges are read from the rollup table instead.
+        """
+        raw_ranges, month_ranges = list(ranges), []
+        if granularity == "month" and self.rollups_available:
+            raw_ranges = []
+            for start, end in ranges:
+                first = bucket_start(start, "month")
+                if first < start:
+                    first = next_bucket(first, "month")
+                last = None if end is None else bucket_start(end, "month")
+                if last is not None and first >= last:
+                    raw_ranges.append((start, end))
+                    continue
+                month_ranges.append((bucket_label(first, "month"), None if last is None else bucket_label(last, "month")))
+                if start < first:
+                    raw_ranges.append((start, first))
+                if last is not None and last < end:
+                    raw_ranges.append((last, end))
+        
+        statements = []
+        if raw_ranges:
+            bucket = _bucket_key(Enrollment.enrollment_date, granularity)
+            query = self.db.query(
+                Organization.name.label('organization'),
+                bucket.label(granularity),
+                func.count(Enrollment.id).label('enrollments')
+            ).select_from(Organization)\
+             .join(User, User.organization_id == Organization.id)\
+             .join(Enrollment, Enrollment.user_id == User.id)\
+             .filter(or_(*[_in_range(Enrollment.enrollment_date, start, end) for start, end in raw_ranges]))\
+             .group_by(Organization.name, bucket)
+            if org_name:
+                query = query.filter(Organization.name == org_name)
+            statements.append(query.statement)
+        if month_ranges:
+            rollup_query = self.db.query(
+                Organization.name.label('organization'),
+                OrganizationMonthlyRollup.month.label('month'),
+                OrganizationMonthlyRollup.enrollments.label('enrollments')
+            ).join(OrganizationMonthlyRollup, OrganizationMonthlyRollup.organization_id == Organization.id)\
+             .filter(or_(*[_in_range(OrganizationMonthlyRollup.month, start, end) for start, end in month_ranges]))
+            if org_name:
+                rollup_query = rollup_query.filter(Organization.name == org_name)
+            statements.append(rollup_query.statement)
+        return statements[0] if len(statements) == 1 else union_all(*statements)
+
+    def get_organization_trends(self, org_name: str = None, charts: Optional[Sequence[str]] = None,
+                                chart_format: str = "figure", start: Optional[datetime] = None,
+                                end: Optional[datetime] = None, granularity: str = "month") -> Dict[str, Any]:
+        """Get enrollment trends for an organization or all organizations
+
+        Enrollments from ``start`` (default 180 days ago) up to ``end`` (default
+        now) are counted per ``granularity`` bucket: day, week or month. Rows are
+        keyed by that name and ordered by bucket. Buckets that lie wholly in the
+        window and closed before the current one are read from ``bucket_cache``
+        when set, so usually only the current bucket is queried.
+        Pass ``charts`` to build only the named figures, or DATA_ONLY to skip them;
+        ``chart_format="spec"`` describes the primary chart instead of building it.
+        """
+        start, end = self._trend_window(start, end, granularity)
+        now = datetime.utcnow()
+        open_bucket = bucket_start(now, granularity)
+        version = self.bucket_version()
+        
+        # Cached closed buckets, and the ranges still to query
+        rows, missing, closed = [], [], []
+        bucket = bucket_start(start, granularity)
+        while (bucket < end) if end is not None else (bucket <= now):
+            following = next_bucket(bucket, granularity)
+            label = bucket_label(bucket, granularity)
+            cacheable = (self.bucket_cache is not None and bucket >= start and following <= open_bucket
+                         and (end is None or following <= end))
+            if cacheable:
+                found, cached = self.bucket_cache.get((org_name, granularity, label), version)
+                if found:
+                    rows.extend(cached)
+                    bucket = following
+                    continue
+                closed.append(label)
+            range_start = max(bucket, start)
+            range_end = following if end is None or following < end else end
+            if missing and missing[-1][1] == range_start:
+                missing[-1] = (missing[-1][0], range_end)
+            else:
+                missing.append((range_start, range_end))
+            bucket = following
+        if end is None and missing and missing[-1][1] > now:
+            # Up to now, including any enrollment dated after the current bucket
+            missing[-1] = (missing[-1][0], None)
+        
+        results = []
+        if missing:
+            with stage("sql"):
+                results = self.db.execute(self._trends_select(org_name, granularity, missing)).all()
+        
+        with stage("dataframe"):
+            fresh = [{
+                'organization': r[0],
+                granularity: r[1] if isinstance(r[1], str) else r[1].isoformat(),
+                'enrollments': r[2]
+            } for r in results]
+            if closed:
+                by_bucket = {label: [] for label in closed}
+                for row in fresh:
+                    if row[granularity] in by_bucket:
+                        by_bucket[row[granularity]].append(row)
+                for label, bucket_rows in by_bucket.items():
+                    self.bucket_cache.put((org_name, granularity, label), version, bucket_rows)
+            data = sorted(rows + fresh, key=lambda row: (row[granularity], row['organization']))
         
         # Create visualizations using the helper method
-        visualizations = self._create_multi_visualization(data, "timeline")
+        visualizations = self._create_multi_visualization(data, "timeline", charts, chart_format, granularity)
         
         # For trend queries, the line chart is the most appropriate visualization
-        return {
-            'data': data,
-            'visualization': visualizations.get('line'),
-            'visualizations': visualizations  # Keep all visualizations for potential future use
-        }
+        return self._result("get_organization_trends", data, visualizations)
+
+    def completion_metrics_query(self):
+        """Completion aggregates per badge and organization, behind get_completion_metrics"""
+        if self.rollups_available:
+            query = self.db.query(
+                Badge.name.label('badge'),
+                Organization.name.label('organization'),
+                (BadgeOrganizationRollup.duration_sum /
+                 func.nullif(BadgeOrganizationRollup.completions, 0)).label('avg_days_to_complete'),
+                BadgeOrganizationRollup.enrollments.label('total_enrollments'),
+                BadgeOrganizationRollup.completions.label('completions'),
+                BadgeOrganizationRollup.duration_min.label('min_days'),
+                BadgeOrganizationRollup.duration_max.label('max_days')
+            ).select_from(BadgeOrganizationRollup)\
+             .join(Badge, Badge.id == BadgeOrganizationRollup.badge_id)\
+             .join(Organization, Organization.id == BadgeOrganizationRollup.organization_id)
+        else:
+            duration = days_between(Enrollment.enrollment_date, Enrollment.completion_date)
+            query = self.db.query(
+                Badge.name.label('badge'),
+                Organization.name.label('organization'),
+                func.avg(duration).label('avg_days_to_complete'),
+                func.count(Enrollment.id).label('total_enrollments'),
+                func.count(Enrollment.completion_date).label('completions'),
+                func.min(duration).label('min_days'),
+                func.max(duration).label('max_days')
+            ).join(Badge).join(User).join(Organization)\
+             .group_by(Badge.name, Organization.name)
+        return query
 
-    def get_completion_metrics(self) -> Dict[str, Any]:
-        """Get detailed completion metrics with multiple visualizations"""
-        results = self.db.query(
-            Badge.name,
-            Organization.name,
-            func.avg(
-                func.julianday(Enrollment.completion_date) - 
-                func.julianday(Enrollment.enrollment_date)
-            ).label('avg_days_to_complete'),
-            func.count(Enrollment.id).label('total_enrollments'),
-            func.count(Enrollment.completion_date).label('completions'),
-            func.min(
-                func.julianday(Enrollment.completion_date) - 
-                func.julianday(Enrollment.enrollment_date)
-            ).label('min_days'),
-            func.max(
-                func.julianday(Enrollment.completion_date) - 
-                func.julianday(Enrollment.enrollment_date)
-            ).label('max_days')
-        ).join(Badge).join(User).join(Organization)\
-         .group_by(Badge.name, Organization.name).all()
-        
-        data = [{
-            'badge': r[0],
-            'organization': r[1],
-            'avg_days_to_complete': round(r[2] if r[2] is not None else 0, 2),
-            'total_enrollments': r[3],
-            'completions': r[4],
-            'completion_rate': round(r[4] / r[3] * 100 if r[3] > 0 else 0, 2),
-            'min_days': round(r[5] if r[5] is not None else 0, 2),
-            'max_days': round(r[6] if r[6] is not None else 0, 2)
-        } for r in results]
-        
-        df = pd.DataFrame(data)
-        visualizations = {}
-        
-        # 1. Heatmap for completion rates
-        pivot_df = df.pivot(index='organization', columns='badge', values='completion_rate')
-        heatmap = px.imshow(pivot_df,
-                          title='Completion Rates by Organization and Badge (%)',
-                          labels=dict(x='Badge', y='Organization', color='Completion Rate %'))
-        visualizations["heatmap"] = heatmap.to_json()
-        
-        # 2. Box plot for completion times
-        box_data = []
-        for _, row in df.iterrows():
-            box_data.extend([{
-                'badge': row['badge'],
-                'org': row['organization'],
-                'days': days
-            } for days in np.linspace(row['min_days'], row['max_days'], 
-                                    num=row['completions'])])
-        
-        box_df = pd.DataFrame(box_data)
-        box_fig = px.box(box_df, x='badge', y='days', color='org',
-                        title='Completion Time Distribution by Badge and Organization')
-        visualizations["box_plot"] = box_fig.to_json()
-        
-        # 3. Sunburst chart for hierarchical view
-        sunburst_fig = px.sunburst(df, 
-                                  path=['organization', 'badge'],
-                                  values='total_enrollments',
-                                  color='completion_rate',
-                                  title='Hierarchical View of Enrollments and Completion Rates')
-        visualizations["sunburst"] = sunburst_fig.to_json()
-        
-        # 4. Parallel categories for multi-dimensional analysis
-        parallel_fig = px.parallel_categories(df,
-                                            dimensions=['organization', 'badge'],
-                                            color='completion_rate',
-                                            title='Multi-dimensional Completion Analysis')
-        visualizations["parallel"] = parallel_fig.to_json()
-        
-        # 5. Scatter matrix for correlations
-        scatter_matrix = px.scatter_matrix(df,
+    def get_completion_metrics(self, charts: Optional[Sequence[str]] = None,
+                               limit: Optional[int] = None, cursor: Optional[str] = None,
+                               chart_format: str = "figure") -> Dict[str, Any]:
+        """Get detailed completion metrics with multiple visualizations
+
+        Pass ``charts`` to build only the named figures, or DATA_ONLY to skip them;
+        ``chart_format="spec"`` describes the primary chart instead of building it.
+        Rows are ordered by badge then organization; ``limit`` caps the page and
+        the returned ``next_cursor`` fetches the following one.
+        """
+        self._check_limit(limit)
+        query = self.completion_metrics_query()
+        
+        if cursor:
+            query = query.filter(tuple_(Badge.name, Organization.name) > tuple(decode_cursor(cursor, 2)))
+        query = query.order_by(Badge.name, Organization.name)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        
+        with stage("sql"):
+            results, next_cursor = _page(query.all(), limit, lambda r: [r[0], r[1]])
+        
+        with stage("dataframe"):
+            data = [{
+                'badge': r[0],
+                'organization': r[1],
+                'avg_days_to_complete': round(r[2] if r[2] is not None else 0, 2),
+                'total_enrollments': r[3],
+                'completions': r[4],
+                'completion_rate': round(r[4] / r[3] * 100 if r[3] > 0 else 0, 2),
+                'min_days': round(r[5] if r[5] is not None else 0, 2),
+                'max_days': round(r[6] if r[6] is not None else 0, 2)
+            } for r in results]
+        
+        def figure_builders():
+            with stage("dataframe"):
+                df = pd.DataFrame(data)
+            
+            # 1. Heatmap for completion rates
+            def heatmap():
+                pivot_df = df.pivot(index='organization', columns='badge', values='completion_rate')
+                return px.imshow(pivot_df,
+                                 title='Completion Rates by Organization and Badge (%)',
+                                 labels=dict(x='Badge', y='Organization', color='Completion Rate %'))
+        
+            # 2. Box plot for completion times
+            def box_plot():
+                stats = self.get_completion_time_distribution()
+                fig = go.Figure()
+                for org in sorted({row['organization'] for row in stats}):
+                    rows = [row for row in stats if row['organization'] == org]
+                    fig.add_trace(go.Box(
+                        name=org,
+                        x=[row['badge'] for row in rows],
+                        q1=[row['q1'] for row in rows],
+                        median=[row['median'] for row in rows],
+                        q3=[row['q3'] for row in rows],
+                        lowerfence=[row['lowerfence'] for row in rows],
+                        upperfence=[row['upperfence'] for row in rows],
+                        mean=[row['mean'] for row in rows]
+                    ))
+                fig.update_layout(title='Completion Time Distribution by Badge and Organization',
+                                  xaxis_title='badge', yaxis_title='days', boxmode='group',
+                                  legend_title_text='org')
+                return fig
+        
+            # 3. Sunburst chart for hierarchical view
+            def sunburst():
+                return px.sunburst(df, 
+                                   path=['organization', 'badge'],
+                                   values='total_enrollments',
+                                   color='completion_rate',
+                                   title='Hierarchical View of Enrollments and Completion Rates')
+        
+            # 4. Parallel categories for multi-dimensional analysis
+            def parallel():
+                return px.parallel_categories(df,
+                                              dimensions=['organization', 'badge'],
+                                              color='completion_rate',
+                                              title='Multi-dimensional Completion Analysis')
+        
+            # 5. Scatter matrix for correlations
+            def scatter_matrix():
+                return px.scatter_matrix(df,
                                          dimensions=['total_enrollments', 'completions', 
-                                                   'avg_days_to_complete', 'completion_rate'],
+                                                     'avg_days_to_complete', 'completion_rate'],
                                          title='Correlation Matrix of Completion Metrics')
-        visualizations["scatter_matrix"] = scatter_matrix.to_json()
         
-        return {
-            'data': data,
-            'visualizations': visualizations
-        }
+            return {
+                "heatmap": heatmap,
+                "box_plot": box_plot,
+                "sunburst": sunburst,
+                "parallel": parallel,
+                "scatter_matrix": scatter_matrix,
+            }
+        
+        def specs():
+            def heatmap():
+                badges = sorted({row['badge'] for row in data})
+                organizations = sorted({row['organization'] for row in data})
+                column = {badge: i for i, badge in enumerate(badges)}
+                line = {organization: i for i, organization in enumerate(organizations)}
+                rates = [[None] * len(badges) for _ in organizations]
+                for row in data:
+                    rates[line[row['organization']]][column[row['badge']]] = row['completion_rate']
+                return chart_spec('heatmap', 'Completion Rates by Organization and Badge (%)',
+                                  {'badge': badges, 'organization': organizations, 'completion_rate': rates},
+                                  x='badge', y='organization', z='completion_rate')
+            return {"heatmap": heatmap}
+        
+        visualizations = self._visualize(figure_builders, specs, charts, chart_format)
+        
+        return self._result("get_completion_metrics", data, visualizations, next_cursor)
+
+    def get_completion_time_distribution(self) -> List[Dict[str, Any]]:
+        """Exact completion-time quartiles and Tukey whiskers per badge and organization
+
+        One query ranks each group's durations, reads the quartiles at their
+        rank positions and then the most extreme durations inside the fences,
+        so only one row per group leaves the database.
+        """
+        duration = days_between(Enrollment.enrollment_date, Enrollment.completion_date).label('days')
+        durations = select(
+            Enrollment.badge_id, User.organization_id, duration
+        ).join(User, User.id == Enrollment.user_id)\
+         .where(Enrollment.completion_date.isnot(None)).subquery()
+        
+        group = [durations.c.badge_id, durations.c.organization_id]
+        ranked = select(
+            *group, durations.c.days,
+            (func.row_number().over(partition_by=group, order_by=durations.c.days) - 1).label('rn'),
+            func.count().over(partition_by=group).label('n'),
+            func.avg(durations.c.days).over(partition_by=group).label('mean')
+        ).cte('ranked')
+        
+        def at(rank):
+            return func.max(case((ranked.c.rn == rank, ranked.c.days)))
+        
+        # Linear interpolation between the ranks around (n - 1) * q, with
+        # q = numerator / denominator; integer division keeps the lower rank
+        # portable across databases
+        last = ranked.c.n - 1
+        def quantile(numerator: int, denominator: int):
+            lower = last * numerator // denominator
+            fraction = cast(last * numerator % denominator, Float) / denominator
+            return at(lower) + fraction * (func.coalesce(at(lower + 1), at(lower)) - at(lower))
+        
+        quartiles = select(
+            ranked.c.badge_id, ranked.c.organization_id, ranked.c.n, func.max(ranked.c.mean).label('mean'),
+            at(0).label('min'), quantile(1, 4).label('q1'), quantile(1, 2).label('median'),
+            quantile(3, 4).label('q3'), at(last).label('max')
+        ).group_by(ranked.c.badge_id, ranked.c.organization_id, ranked.c.n).cte('quartiles')
+        
+        # Whiskers end at the most extreme durations inside the fences
+        iqr = quartiles.c.q3 - quartiles.c.q1
+        with stage("sql"):
+            rows = self.db.execute(
+                select(Badge.name, Organization.name, quartiles.c.n, quartiles.c.mean, quartiles.c.min,
+                       quartiles.c.q1, quartiles.c.median, quartiles.c.q3, quartiles.c.max,
+                       func.min(case((ranked.c.days >= quartiles.c.q1 - 1.5 * iqr, ranked.c.days))),
+                       func.max(case((ranked.c.days <= quartiles.c.q3 + 1.5 * iqr, ranked.c.days))))
+                .select_from(quartiles)
+                .join(ranked, and_(ranked.c.badge_id == quartiles.c.badge_id,
+                                   ranked.c.organization_id == quartiles.c.organization_id))
+                .join(Badge, Badge.id == quartiles.c.badge_id)
+                .join(Organization, Organization.id == quartiles.c.organization_id)
+                .group_by(quartiles.c.badge_id, quartiles.c.organization_id, Badge.name, Organization.name,
+                          quartiles.c.n, quartiles.c.mean, quartiles.c.min, quartiles.c.q1,
+                          quartiles.c.median, quartiles.c.q3, quartiles.c.max)
+            ).all()
+        
+        return [{
+            'badge': badge,
+            'organization': organization,
+            'completions': n,
+            'min': low,
+            'q1': q1,
+            'median': median,
+            'q3': q3,
+            'max': high,
+            'mean': mean,
+            'lowerfence': lowerfence,
+            'upperfence': upperfence
+        } for badge, organization, n, mean, low, q1, median, q3, high, lowerfence, upperfence in rows]
+
+    def path_steps_query(self, user_ids: Optional[Sequence[int]] = None):
+        """Every enrollment in path order per user, with the badge before it and the path length
 
-    def get_learning_paths(self) -> Dict[str, Any]:
-        """Analyze common learning paths and badge combinations with multiple visualizations"""
-        # Get users with multiple badges and their enrollment dates
-        user_badges = self.db.query(
-            User.id,
-            User.name,
+        ``user_ids`` restricts the steps to those users' paths.
+        """
+        path_order = (Enrollment.enrollment_date, Enrollment.id)
+        query = select(
+            Enrollment.user_id,
+            User.name.label('user_name'),
             Organization.name.label('organization'),
-            func.group_concat(Badge.name).label('badge_path'),
-            func.group_concat(Enrollment.enrollment_date).label('enrollment_dates')
-        ).join(Enrollment).join(Badge).join(Organization)\
-         .group_by(User.id, User.name, Organization.name)\
-         .having(func.count(Badge.id) > 1).all()
-        
-        paths = {}
-        path_details = []
-        
-        for user in user_badges:
-            badge_list = list(zip(user[3].split(','), user[4].split(',')))
-            # Sort by enrollment date
-            badge_list.sort(key=lambda x: x[1])
-            badges = [b[0] for b in badge_list]
-            path_key = ' → '.join(badges)
-            paths[path_key] = paths.get(path_key, 0) + 1
-            
-            # Collect detailed path information
-            path_details.append({
-                'user_id': user[0],
-                'user_name': user[1],
-                'organization': user[2],
-                'path': badges,
-                'dates': [b[1] for b in badge_list]
-            })
-        
-        visualizations = {}
+            Badge.name.label('badge'),
+            Enrollment.enrollment_date,
+            Enrollment.completion_date,
+            func.lag(Badge.name).over(partition_by=Enrollment.user_id, order_by=path_order).label('previous_badge'),
+            func.row_number().over(partition_by=Enrollment.user_id, order_by=path_order).label('step'),
+            func.count().over(partition_by=Enrollment.user_id).label('path_length')
+        ).select_from(Enrollment)\
+         .join(User, User.id == Enrollment.user_id)\
+         .join(Badge, Badge.id == Enrollment.badge_id)\
+         .join(Organization, Organization.id == User.organization_id)
+        if user_ids is not None:
+            query = query.where(Enrollment.user_id.in_(user_ids))
+        return query.subquery()
+
+    def path_users_query(self, cursor: Optional[str] = None, limit: Optional[int] = None):
+        """Ids of the users with more than one enrollment after ``cursor``, fetching ``limit + 1``"""
+        query = select(Enrollment.user_id).select_from(Enrollment)\
+            .join(User, User.id == Enrollment.user_id)\
+            .join(Badge, Badge.id == Enrollment.badge_id)\
+            .join(Organization, Organization.id == User.organization_id)\
+            .group_by(Enrollment.user_id).having(func.count() > 1)
+        if cursor:
+            query = query.where(Enrollment.user_id > decode_cursor(cursor, 1)[0])
+        query = query.order_by(Enrollment.user_id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        return query
+
+    def learning_path_edges_query(self):
+        """Badge-to-badge transition counts behind the learning-path charts"""
+        steps = self.path_steps_query()
+        return select(
+            steps.c.previous_badge.label('source'),
+            steps.c.badge.label('target'),
+            func.count().label('value')
+        ).where(steps.c.previous_badge.isnot(None))\
+         .group_by(steps.c.previous_badge, steps.c.badge)
+
+    def user_paths_query(self):
+        """Each user with more than one enrollment and their badges in path order, joined by PATH_SEPARATOR"""
+        path_order = (Enrollment.enrollment_date, Enrollment.id)
+        steps = select(
+            Enrollment.user_id,
+            # Aggregated over the whole ordered window, so the badges join in path order
+            string_agg(Badge.name, PATH_SEPARATOR).over(partition_by=Enrollment.user_id, order_by=path_order,
+                                                        rows=(None, None)).label('path'),
+            func.row_number().over(partition_by=Enrollment.user_id, order_by=path_order).label('step'),
+            func.count().over(partition_by=Enrollment.user_id).label('path_length')
+        ).select_from(Enrollment)\
+         .join(User, User.id == Enrollment.user_id)\
+         .join(Badge, Badge.id == Enrollment.badge_id)\
+         .join(Organization, Organization.id == User.organization_id).subquery()
+        return select(steps.c.user_id, steps.c.path).where(steps.c.step == 1, steps.c.path_length > 1)
+
+    def path_counts_query(self):
+        """Users per distinct learning path, most common first, with the number of paths and users in total"""
+        paths = self.user_paths_query().subquery()
+        return select(
+            paths.c.path,
+            func.count().label('users'),
+            func.count().over().label('distinct_paths'),
+            func.sum(func.count()).over().label('total_users')
+        ).group_by(paths.c.path).order_by(desc('users'), paths.c.path)
+
+    def get_learning_paths(self, charts: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+                           cursor: Optional[str] = None, summary_only: bool = False,
+                           chart_format: str = "figure") -> Dict[str, Any]:
+        """Analyze common learning paths and badge combinations with multiple visualizations
+
+        Pass ``charts`` to build only the named figures, or DATA_ONLY to skip them;
+        ``chart_format="spec"`` describes the primary chart instead of building it.
+        ``paths`` holds the TOP_LEARNING_PATHS most common paths, with
+        ``distinct_paths`` and ``total_users`` counted over every user.
+        ``path_details`` is ordered by user id; ``limit`` caps the page and the
+        returned ``next_cursor`` fetches the following one. ``summary_only``
+        leaves out ``path_details`` entirely.
+        """
+        self._check_limit(limit)
+        with stage("sql"):
+            counted = self.db.execute(self.path_counts_query().limit(TOP_LEARNING_PATHS)).all()
+            edges = self.db.execute(self.learning_path_edges_query()
+                                    .order_by(desc('value'), 'source', 'target')).all()
+        paths = {row.path: row.users for row in counted}
+        
+        # Transition counts shared by the Sankey, chord and treemap charts
+        all_nodes = list(dict.fromkeys([source for source, _, _ in edges] + [target for _, target, _ in edges]))
+        node_index = {node: i for i, node in enumerate(all_nodes)}
+        sources = [node_index[source] for source, _, _ in edges]
+        targets = [node_index[target] for _, target, _ in edges]
+        values = [value for _, _, value in edges]
+        
+        # Per-user detail is paged by user id
+        details: List[Dict[str, Any]] = []
+        page_steps: List[Any] = []
+        next_cursor = None
+        if not summary_only or (chart_format == "figure" and (charts is None or "timeline" in charts)):
+            with stage("sql"):
+                if limit is not None:
+                    # The page's users come from a keyset query, and only their steps are read
+                    user_ids = self.db.execute(self.path_users_query(cursor, limit)).scalars().all()
+                    page_users, next_cursor = _page(user_ids, limit, lambda user_id: [user_id])
+                    ordered = self.path_steps_query(page_users)
+                else:
+                    ordered = self.path_steps_query()
+                columns = ['user_id', 'user_name', 'organization', 'badge', 'enrollment_date', 'completion_date']
+                query = select(*[ordered.c[name] for name in columns]).where(ordered.c.path_length > 1)
+                if cursor and limit is None:
+                    query = query.where(ordered.c.user_id > decode_cursor(cursor, 1)[0])
+                page_steps = self.db.execute(query.order_by(ordered.c.user_id, ordered.c.step)).all()
+            for step in page_steps:
+                if not details or details[-1]['user_id'] != step.user_id:
+                    details.append({'user_id': step.user_id, 'user_name': step.user_name,
+                                    'organization': step.organization, 'path': [], 'dates': []})
+                details[-1]['path'].append(step.badge)
+                details[-1]['dates'].append(str(step.enrollment_date))
+            if summary_only:
+                next_cursor = None
         
         # 1. Enhanced Sankey diagram
-        path_data = []
-        for path, count in paths.items():
-            badges = path.split(' → ')
-            for i in range(len(badges) - 1):
-                path_data.append({
-                    'source': badges[i],
-                    'target': badges[i + 1],
-                    'value': count
-                })
-        
-        df = pd.DataFrame(path_data)
-        all_nodes = pd.concat([df['source'], df['target']]).unique()
-        node_indices = {node: idx for idx, node in enumerate(all_nodes)}
-        
-        sankey_fig = go.Figure(data=[go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=20,
-                line=dict(color="black", width=0.5),
-                label=all_nodes,
-                color="blue"  # Add color for better visibility
-            ),
-            link=dict(
-                source=[node_indices[row['source']] for _, row in df.iterrows()],
-                target=[node_indices[row['target']] for _, row in df.iterrows()],
-                value=df['value'],
-                color="rgba(0,0,255,0.2)"  # Semi-transparent links
-            )
-        )])
-        sankey_fig.update_layout(title="Learning Path Flows")
-        visualizations["sankey"] = sankey_fig.to_json()
+        def sankey():
+            fig = go.Figure(data=[go.Sankey(
+                node=dict(
+                    pad=15,
+                    thickness=20,
+                    line=dict(color="black", width=0.5),
+                    label=all_nodes,
+                    color="blue"  # Add color for better visibility
+                ),
+                link=dict(
+                    source=sources,
+                    target=targets,
+                    value=values,
+                    color="rgba(0,0,255,0.2)"  # Semi-transparent links
+                )
+            )])
+            fig.update_layout(title="Learning Path Flows")
+            return fig
         
         # 2. Network graph
-        network_fig = go.Figure()
-        
-        # Add nodes
-        for node in all_nodes:
-            network_fig.add_trace(go.Scatter(
-                x=[0],
-                y=[0],
-                mode='markers+text',
-                name=node,
-                text=[node],
-                textposition="bottom center"
-            ))
-        
-        network_fig.update_layout(
-            title="Badge Relationship Network",
-            showlegend=True,
-            hovermode='closest'
-        )
-        visualizations["network"] = network_fig.to_json()
-        
-        # 3. Timeline visualization
-        timeline_data = []
-        for detail in path_details:
-            for badge, date in zip(detail['path'], detail['dates']):
-                timeline_data.append({
-                    'organization': detail['organization'],
-                    'badge': badge,
-                    'date': date,
-                    'user': detail['user_name']
-                })
-        
-        timeline_df = pd.DataFrame(timeline_data)
-        timeline_fig = px.timeline(timeline_df,
-                                 x_start='date',
-                                 y='user',
-                                 color='badge',
-                                 title="Individual Learning Paths Timeline")
-        visualizations["timeline"] = timeline_fig.to_json()
+        def network():
+            fig = go.Figure()
+            
+            # Add nodes
+            for node in all_nodes:
+                fig.add_trace(go.Scatter(
+                    x=[0],
+                    y=[0],
+                    mode='markers+text',
+                    name=node,
+                    text=[node],
+                    textposition="bottom center"
+                ))
+            
+            fig.update_layout(
+                title="Badge Relationship Network",
+                showlegend=True,
+                hovermode='closest'
+            )
+            return fig
+        
+        # 3. Timeline visualization for the users on this page; bars run until
+        # completion, or today if still open
+        def timeline():
+            timeline_df = pd.DataFrame([{
+                'user': step.user_name,
+                'badge': step.badge,
+                'date': step.enrollment_date,
+                'end': step.completion_date or datetime.utcnow()
+            } for step in page_steps], columns=['user', 'badge', 'date', 'end'])
+            return px.timeline(timeline_df,
+                               x_start='date',
+                               x_end='end',
+                               y='user',
+                               color='badge',
+                               title="Individual Learning Paths Timeline")
         
         # 4. Chord diagram for badge relationships
-        matrix = np.zeros((len(all_nodes), len(all_nodes)))
-        for _, row in df.iterrows():
-            i = list(all_nodes).index(row['source'])
-            j = list(all_nodes).index(row['target'])
-            matrix[i][j] = row['value']
-        
-        chord_fig = go.Figure(data=[go.Heatmap(
-            z=matrix,
-            x=all_nodes,
-            y=all_nodes,
-            colorscale='Blues'
-        )])
-        chord_fig.update_layout(title="Badge Relationship Matrix")
-        visualizations["chord"] = chord_fig.to_json()
+        def chord():
+            matrix = np.zeros((len(all_nodes), len(all_nodes)))
+            np.add.at(matrix, (sources, targets), values)
+            
+            fig = go.Figure(data=[go.Heatmap(
+                z=matrix,
+                x=all_nodes,
+                y=all_nodes,
+                colorscale='Blues'
+            )])
+            fig.update_layout(title="Badge Relationship Matrix")
+            return fig
         
         # 5. Tree map of popular paths
-        treemap_fig = px.treemap(
-            path_data,
-            path=[px.Constant("All Paths"), 'source', 'target'],
-            values='value',
-            title="Popular Learning Path Combinations"
-        )
-        visualizations["treemap"] = treemap_fig.to_json()
+        def treemap():
+            return px.treemap(
+                pd.DataFrame(edges, columns=['source', 'target', 'value']),
+                path=[px.Constant("All Paths"), 'source', 'target'],
+                values='value',
+                title="Popular Learning Path Combinations"
+            )
         
-        return {
-            'data': {
-                'paths': paths,
-                'path_details': path_details
-            },
-            'visualizations': visualizations
+        def specs():
+            return {"sankey": lambda: chart_spec(
+                'sankey', 'Learning Path Flows',
+                {'badge': all_nodes, 'source': sources, 'target': targets, 'value': values},
+                label='badge', source='source', target='target', value='value')}
+        
+        visualizations = self._visualize(lambda: {
+            "sankey": sankey,
+            "network": network,
+            "timeline": timeline,
+            "chord": chord,
+            "treemap": treemap,
+        }, specs, charts, chart_format)
+        
+        data = {
+            'paths': paths,
+            'distinct_paths': counted[0].distinct_paths if counted else 0,
+            'total_users': counted[0].total_users if counted else 0
         }
+        if not summary_only:
+            data['path_details'] = details
+        
+        return self._result("get_learning_paths", data, visualizations, next_cursor)
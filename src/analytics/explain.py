@@ -0,0 +1,92 @@
+"""Query-plan checks for the AnalyticsEngine.
+
+Captures every SELECT an engine method issues, runs EXPLAIN on it and reports
+scans of the large tables, including full scans of an index. Run ``python -m src.analytics.explain``
+against a database to print the plans.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Tuple
+import re
+from .engine import AnalyticsEngine, DATA_ONLY
+
+# Tables that must never be read with a full scan
+LARGE_TABLES = ("enrollments",)
+
+# Every engine method with representative arguments
+ENGINE_CALLS: List[Tuple[str, Dict[str, Any]]] = [
+    ("get_badge_enrollments", {}),
+    ("get_badge_enrollments", {"badge_name": "?"}),
+    ("get_organization_trends", {}),
+    ("get_organization_trends", {"org_name": "?"}),
+    ("get_organization_trends", {"granularity": "week", "start": datetime(2025, 1, 1), "end": datetime(2025, 3, 1)}),
+    ("get_completion_metrics", {}),
+    ("get_learning_paths", {"limit": 10}),
+]
+
+@contextmanager
+def capture_queries(db: Session):
+    """Collects (statement, parameters) for every SELECT executed on the session's engine"""
+    captured = []
+    bind = db.get_bind()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+def explain(db: Session, statement: str, parameters) -> List[str]:
+    """Returns the plan lines for a raw DBAPI statement"""
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()
+    return [row[0] for row in rows]
+
+def full_scans(plan: Iterable[str], tables: Iterable[str] = LARGE_TABLES) -> List[str]:
+    """Plan lines that scan one of ``tables``, with or without an index; only a bounded SEARCH passes"""
+    patterns = [re.compile(rf"^SCAN {t}\b", re.I) for t in tables] + \
+               [re.compile(rf"Seq Scan on {t}\b", re.I) for t in tables]
+    return [line for line in plan if any(p.search(line.strip()) for p in patterns)]
+
+def explain_engine(db: Session, use_rollups: bool = True, analyze: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """Runs every engine method data-only and returns the plan of each query it issued
+
+    Plans depend on planner statistics; pass ``analyze`` to refresh them first.
+    """
+    if analyze:
+        db.execute(text("ANALYZE"))
+    report = {}
+    for method, kwargs in ENGINE_CALLS:
+        analytics = AnalyticsEngine(db, use_rollups=use_rollups)
+        with capture_queries(db) as captured:
+            getattr(analytics, method)(charts=DATA_ONLY, **kwargs)
+        label = method + (f"({', '.join(f'{k}={v!r}' for k, v in kwargs.items())})" if kwargs else "")
+        report[label] = [{
+            "statement": statement,
+            "plan": plan,
+            "full_scans": full_scans(plan)
+        } for statement, parameters in captured for plan in [explain(db, statement, parameters)]]
+    return report
+
+if __name__ == "__main__":
+    from ..database.config import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for use_rollups in (True, False):
+            for label, queries in explain_engine(db, use_rollups).items():
+                print(f"== {label} (rollups={use_rollups})")
+                for query in queries:
+                    for line in query["plan"]:
+                        print(("!! " if line in query["full_scans"] else "   ") + line)
+    finally:
+        db.close()
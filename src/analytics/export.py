@@ -0,0 +1,113 @@
+"""Columnar export of the datasets behind AnalyticsEngine.
+
+Rows are fetched from the database cursor one partition at a time and turned
+into Arrow record batches column by column, then written out as an Arrow IPC
+stream or a Parquet file while later partitions are still being read.
+
+pyarrow is optional; without it ``EXPORT_AVAILABLE`` is False and
+``stream_export`` raises RuntimeError.
+"""
+import io
+from importlib.util import find_spec
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+from sqlalchemy.orm import Session
+from .engine import AnalyticsEngine
+from ..lazy import lazy_module
+
+# pyarrow is only imported by the first export
+EXPORT_AVAILABLE = find_spec("pyarrow") is not None
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+
+# Media type per output format
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+class Dataset(NamedTuple):
+    query: Callable[..., Any]
+    # (column, pyarrow type factory name) in select order
+    columns: Tuple[Tuple[str, str], ...]
+
+DATASETS: Dict[str, Dataset] = {
+    "badge_enrollments": Dataset(
+        lambda engine, badge_name=None, **_: engine.badge_enrollments_query(badge_name).statement,
+        (("badge", "string"), ("total_enrollments", "int64"), ("completed", "int64"),
+         ("avg_completion_time", "float64"))
+    ),
+    "organization_trends": Dataset(
+        lambda engine, org_name=None, **_: engine.organization_trends_query(org_name),
+        (("organization", "string"), ("month", "string"), ("enrollments", "int64"))
+    ),
+    "completion_metrics": Dataset(
+        lambda engine, **_: engine.completion_metrics_query().statement,
+        (("badge", "string"), ("organization", "string"), ("avg_days_to_complete", "float64"),
+         ("total_enrollments", "int64"), ("completions", "int64"), ("min_days", "float64"),
+         ("max_days", "float64"))
+    ),
+    "learning_path_edges": Dataset(
+        lambda engine, **_: engine.learning_path_edges_query(),
+        (("source", "string"), ("target", "string"), ("value", "int64"))
+    ),
+}
+
+def schema(dataset: str) -> "pa.Schema":
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in DATASETS[dataset].columns])
+
+def record_batches(db: Session, dataset: str, batch_size: int = 50_000, **filters) -> Iterator["pa.RecordBatch"]:
+    """Yields the dataset as record batches of at most ``batch_size`` rows
+
+    Filters (``badge_name``, ``org_name``) apply to the datasets that support them.
+    """
+    if not EXPORT_AVAILABLE:
+        raise RuntimeError("Export requires pyarrow")
+    batch_schema = schema(dataset)
+    stmt = DATASETS[dataset].query(AnalyticsEngine(db), **filters)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), batch_schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=batch_schema)
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose buffered bytes are handed out as they accumulate"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_export(db: Session, dataset: str, fmt: str = "arrow", batch_size: int = 50_000, **filters) -> Iterator[bytes]:
+    """Encodes the dataset as an Arrow IPC stream or Parquet file, yielding bytes per batch"""
+    if not EXPORT_AVAILABLE:
+        raise RuntimeError("Export requires pyarrow")
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}; available: {list(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; available: {list(FORMATS)}")
+
+    sink = _Drain()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema(dataset))
+    else:
+        # One row group per batch, so memory stays bounded by batch_size
+        writer = pq.ParquetWriter(sink, schema(dataset))
+    try:
+        for batch in record_batches(db, dataset, batch_size, **filters):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,121 @@
+"""Background precomputation of the hottest engine results.
+
+A daemon thread wakes every PRECOMPUTE_INTERVAL_SECONDS and reads the data
+version. When it has changed since the last run, completion metrics, learning
+paths, trends for all organizations and the enrollments of the top badges are
+computed as /analytics requests them (primary chart, first page) and pinned in
+the result cache. Requests for them are then served the warmed results, and
+the first request after a data change no longer takes the slow path.
+"""
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+from ..config.settings import get_settings
+from .engine import CHART_FORMATS, PAGE_OPTIONS, PRIMARY_CHARTS
+from .cache import CachedAnalyticsEngine, ResultCache, result_cache
+from .stats import stats_provider
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+def first_page_options(method: str, chart_format: str) -> Dict[str, Any]:
+    """The options /analytics passes to ``method`` when the request sets none of its own"""
+    defaults = {
+        "limit": min(settings.ANALYTICS_DEFAULT_LIMIT, settings.ANALYTICS_MAX_LIMIT),
+        "cursor": None,
+        "summary_only": False,
+        "start": None,
+        "end": None,
+        "granularity": "month"
+    }
+    return {**{name: defaults[name] for name in PAGE_OPTIONS[method]}, "chart_format": chart_format}
+
+class PrecomputeScheduler:
+    """Keeps the hot engine results pinned in a ResultCache for the current data version
+
+    Results are recomputed when the data version changes, or once they are
+    ``max_age`` seconds old, since trend windows end at the current time.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], cache: ResultCache = None,
+                 interval: float = 30.0, max_age: Optional[float] = 3600.0, top_badges: int = 10,
+                 chart_formats: Sequence[str] = CHART_FORMATS):
+        self.session_factory = session_factory
+        self.cache = cache if cache is not None else result_cache
+        self.interval = interval
+        self.max_age = max_age
+        self.top_badges = top_badges
+        self.chart_formats = tuple(chart_formats)
+        self.version = None
+        self.warmed_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def jobs(self, db: Session) -> List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]:
+        """(method, args, options) of every engine call to warm"""
+        top = CachedAnalyticsEngine(db, self.cache).badge_enrollments_query()\
+            .order_by(desc('total_enrollments')).limit(self.top_badges).all()
+        calls = [("get_completion_metrics", ()), ("get_learning_paths", ()), ("get_organization_trends", (None,))]
+        calls += [("get_badge_enrollments", (row[0],)) for row in top]
+        return [(method, args, first_page_options(method, chart_format))
+                for method, args in calls for chart_format in self.chart_formats]
+
+    def due(self, version: Any) -> bool:
+        if version != self.version or self.warmed_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.warmed_at >= self.max_age
+
+    def run_once(self) -> bool:
+        """Warms every job if the results are due, returning whether it did"""
+        db = self.session_factory()
+        try:
+            engine = CachedAnalyticsEngine(db, self.cache, pin=True)
+            version = engine.version
+            if not self.due(version):
+                return False
+            started = time.monotonic()
+            stats_provider.get(db)
+            jobs = self.jobs(db)
+            for method, args, options in jobs:
+                getattr(engine, method)(*args, charts=[PRIMARY_CHARTS[method]], **options)
+            self.cache.unpin_stale(version)
+            self.version, self.warmed_at = version, time.monotonic()
+            logger.info(f"Precomputed {len(jobs)} analytics results for data version {version} "
+                        f"in {self.warmed_at - started:.2f}s")
+            return True
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """Runs the scheduler in a daemon thread, warming immediately"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-precompute", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Precomputing analytics results failed; retrying next interval")
+            self._stop.wait(self.interval)
+
+def create_precompute_scheduler(session_factory: Callable[[], Session]) -> PrecomputeScheduler:
+    return PrecomputeScheduler(
+        session_factory,
+        interval=settings.PRECOMPUTE_INTERVAL_SECONDS,
+        max_age=settings.PRECOMPUTE_MAX_AGE_SECONDS,
+        top_badges=settings.PRECOMPUTE_TOP_BADGES,
+        chart_formats=settings.PRECOMPUTE_CHART_FORMATS
+    )
@@ -0,0 +1,273 @@
+"""Incrementally maintained rollups of the enrollments table.
+
+Inserted enrollments are folded into the rollup rows as deltas on every flush.
+Updated or deleted enrollments, and users moving to another organization,
+trigger a recompute of just the groups they touch.
+Both are upserts, so concurrent writers neither lose updates nor collide on keys.
+Run ``python -m src.analytics.rollups`` to rebuild everything from scratch.
+
+Only writes made through ORM sessions keep the rollups exact. Writes that
+bypass the flush hooks (Core statements, other tools) are detected by comparing
+the trigger-maintained enrollment write counter with the writes the hooks have
+folded in; until the next rebuild the engine reads the enrollments table instead.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func, select, delete, insert, update, exists, case, and_, or_, inspect as sa_inspect
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Tuple, Optional
+import logging
+from ..models.models import (
+    User, Enrollment, BadgeDailyRollup, OrganizationMonthlyRollup,
+    BadgeOrganizationRollup, RollupState, EnrollmentVersion
+)
+from ..database.dialect import days_between, day_key, month_key, upsert
+from ..database.versions import VERSION_ROW_ID
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = (BadgeDailyRollup, OrganizationMonthlyRollup, BadgeOrganizationRollup)
+
+def _duration_days(enrollment_date: datetime, completion_date: Optional[datetime]) -> Optional[float]:
+    if enrollment_date is None or completion_date is None:
+        return None
+    return (completion_date - enrollment_date).total_seconds() / 86400
+
+def _month_bounds(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+def _aggregate_select(model, *filters):
+    """SELECT producing rollup rows for ``model`` straight from the enrollments table"""
+    duration = days_between(Enrollment.enrollment_date, Enrollment.completion_date)
+    if model is BadgeDailyRollup:
+        keys = [Enrollment.badge_id, day_key(Enrollment.enrollment_date)]
+        source = select(*keys)
+    elif model is OrganizationMonthlyRollup:
+        keys = [User.organization_id, month_key(Enrollment.enrollment_date)]
+        source = select(*keys).join(User, User.id == Enrollment.user_id)
+    else:
+        keys = [Enrollment.badge_id, User.organization_id]
+        source = select(*keys).join(User, User.id == Enrollment.user_id)
+    return source.add_columns(
+        func.count(Enrollment.id),
+        func.count(Enrollment.completion_date),
+        func.coalesce(func.sum(duration), 0.0),
+        func.min(duration),
+        func.max(duration)
+    ).select_from(Enrollment).where(*[k.isnot(None) for k in keys], *filters).group_by(*keys)
+
+_COLUMNS = {
+    BadgeDailyRollup: ["badge_id", "day"],
+    OrganizationMonthlyRollup: ["organization_id", "month"],
+    BadgeOrganizationRollup: ["badge_id", "organization_id"],
+}
+_MEASURES = ["enrollments", "completions", "duration_sum", "duration_min", "duration_max"]
+
+def _key_filters(model, key: Tuple) -> List:
+    """Index-friendly predicates on the enrollments table selecting one rollup group"""
+    if model is BadgeDailyRollup:
+        badge_id, day = key
+        start = datetime.combine(day, datetime.min.time())
+        return [Enrollment.badge_id == badge_id,
+                Enrollment.enrollment_date >= start,
+                Enrollment.enrollment_date < start + timedelta(days=1)]
+    if model is OrganizationMonthlyRollup:
+        organization_id, month = key
+        start, end = _month_bounds(month)
+        return [User.organization_id == organization_id,
+                Enrollment.enrollment_date >= start,
+                Enrollment.enrollment_date < end]
+    badge_id, organization_id = key
+    return [Enrollment.badge_id == badge_id, User.organization_id == organization_id]
+
+def _key_clause(model, key: Tuple):
+    table = model.__table__
+    return and_(*[table.c[name] == value for name, value in zip(_COLUMNS[model], key)])
+
+def _keys_for(badge_id, organization_id, enrollment_date) -> Dict[Any, Tuple]:
+    keys = {}
+    if badge_id is not None and enrollment_date is not None:
+        keys[BadgeDailyRollup] = (badge_id, enrollment_date.date())
+    if organization_id is not None and enrollment_date is not None:
+        keys[OrganizationMonthlyRollup] = (organization_id, enrollment_date.strftime('%Y-%m'))
+    if badge_id is not None and organization_id is not None:
+        keys[BadgeOrganizationRollup] = (badge_id, organization_id)
+    return keys
+
+def _merge(current: Optional[List], delta: List) -> List:
+    if current is None:
+        return list(delta)
+    def pick(fn, a, b):
+        return b if a is None else a if b is None else fn(a, b)
+    return [current[0] + delta[0], current[1] + delta[1], current[2] + delta[2],
+            pick(min, current[3], delta[3]), pick(max, current[4], delta[4])]
+
+def _least(current, new):
+    return case((or_(current.is_(None), new < current), new), else_=current)
+
+def _greatest(current, new):
+    return case((or_(current.is_(None), new > current), new), else_=current)
+
+def apply_deltas(conn, deltas: Dict[Tuple[Any, Tuple], List]) -> None:
+    """Folds per-group measure deltas into the rollup tables, one atomic upsert per group"""
+    for (model, key), delta in deltas.items():
+        table = model.__table__
+        statement = upsert(table, conn.dialect.name).values(**dict(zip(_COLUMNS[model], key)),
+                                                            **dict(zip(_MEASURES, delta)))
+        new = statement.excluded
+        conn.execute(statement.on_conflict_do_update(index_elements=_COLUMNS[model], set_={
+            "enrollments": table.c.enrollments + new.enrollments,
+            "completions": table.c.completions + new.completions,
+            "duration_sum": table.c.duration_sum + new.duration_sum,
+            "duration_min": _least(table.c.duration_min, new.duration_min),
+            "duration_max": _greatest(table.c.duration_max, new.duration_max),
+        }))
+
+def refresh_groups(conn, groups: List[Tuple[Any, Tuple]]) -> None:
+    """Recomputes the given rollup groups from the enrollments table
+
+    Groups left without enrollments are deleted.
+    """
+    for model, key in set(groups):
+        table = model.__table__
+        filters = _key_filters(model, key)
+        statement = upsert(table, conn.dialect.name).from_select(_COLUMNS[model] + _MEASURES,
+                                                                 _aggregate_select(model, *filters))
+        conn.execute(statement.on_conflict_do_update(index_elements=_COLUMNS[model], set_={
+            name: statement.excluded[name] for name in _MEASURES
+        }))
+        members = select(Enrollment.id).where(*filters)
+        if model is not BadgeDailyRollup:
+            members = members.join(User, User.id == Enrollment.user_id)
+        conn.execute(delete(table).where(_key_clause(model, key), ~exists(members)))
+
+def _organization_ids(conn, user_ids) -> Dict[int, int]:
+    user_ids = {uid for uid in user_ids if uid is not None}
+    if not user_ids:
+        return {}
+    rows = conn.execute(select(User.id, User.organization_id).where(User.id.in_(user_ids)))
+    return {uid: org_id for uid, org_id in rows}
+
+def _history_value(state, attr: str, new: bool):
+    history = state.attrs[attr].history
+    if new:
+        return history.added[0] if history.added else getattr(state.object, attr)
+    return history.deleted[0] if history.deleted else getattr(state.object, attr)
+
+def _moved_users(session: Session) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+    """(old, new) organization of every flushed user that moved to another organization"""
+    moved = {}
+    for user in session.dirty:
+        if isinstance(user, User) and session.is_modified(user):
+            state = sa_inspect(user)
+            old, new = (_history_value(state, "organization_id", new) for new in (False, True))
+            if old != new:
+                moved[user.id] = (old, new)
+    return moved
+
+def _organization_groups(conn, moved: Dict[int, Tuple[Optional[int], Optional[int]]]) -> List[Tuple[Any, Tuple]]:
+    """Organization rollup groups the enrollments of moved users leave or join"""
+    if not moved:
+        return []
+    groups = []
+    rows = conn.execute(select(Enrollment.user_id, Enrollment.badge_id, Enrollment.enrollment_date)
+                        .where(Enrollment.user_id.in_(moved)))
+    for user_id, badge_id, enrollment_date in rows:
+        for organization_id in moved[user_id]:
+            keys = _keys_for(badge_id, organization_id, enrollment_date)
+            keys.pop(BadgeDailyRollup, None)
+            groups.extend(keys.items())
+    return groups
+
+@event.listens_for(Session, "after_flush")
+def _maintain_rollups(session: Session, flush_context) -> None:
+    inserted = [obj for obj in session.new if isinstance(obj, Enrollment)]
+    changed = [obj for obj in session.dirty if isinstance(obj, Enrollment) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Enrollment)]
+    moved = _moved_users(session)
+    if not (inserted or changed or deleted or moved):
+        return
+
+    conn = session.connection()
+    states = [sa_inspect(obj) for obj in changed + deleted]
+    user_ids = [e.user_id for e in inserted] + [_history_value(s, "user_id", new) for s in states for new in (False, True)]
+    organization_ids = _organization_ids(conn, user_ids)
+
+    deltas: Dict[Tuple[Any, Tuple], List] = {}
+    for enrollment in inserted:
+        duration = _duration_days(enrollment.enrollment_date, enrollment.completion_date)
+        measures = [1, 0 if duration is None else 1, duration or 0.0, duration, duration]
+        keys = _keys_for(enrollment.badge_id, organization_ids.get(enrollment.user_id), enrollment.enrollment_date)
+        for model, key in keys.items():
+            deltas[(model, key)] = _merge(deltas.get((model, key)), measures)
+    apply_deltas(conn, deltas)
+
+    groups = []
+    for state in states:
+        for new in (False, True):
+            if new and state.object in deleted:
+                continue
+            user_id = _history_value(state, "user_id", new)
+            organization_id = organization_ids.get(user_id) if new or user_id not in moved else moved[user_id][0]
+            keys = _keys_for(_history_value(state, "badge_id", new), organization_id,
+                             _history_value(state, "enrollment_date", new))
+            groups.extend(keys.items())
+    # The enrollments of a moved user change organization without being written
+    groups.extend(_organization_groups(conn, moved))
+    refresh_groups(conn, groups)
+    
+    # One trigger-counted write per row flushed
+    versions = EnrollmentVersion.__table__
+    conn.execute(update(versions).where(versions.c.id == VERSION_ROW_ID).values(
+        rollup_writes=versions.c.rollup_writes + len(inserted) + len(changed) + len(deleted) + len(moved)))
+
+# (writes, rollup_writes) last reported as out of sync, so it is logged once
+_reported_drift = None
+
+def rollups_ready(db: Session) -> bool:
+    """True once a full rebuild has run and every enrollment write since went through the flush hooks"""
+    global _reported_drift
+    try:
+        row = db.execute(select(
+            select(RollupState.id).limit(1).scalar_subquery(),
+            EnrollmentVersion.writes,
+            EnrollmentVersion.rollup_writes
+        ).where(EnrollmentVersion.id == VERSION_ROW_ID)).first()
+    except Exception:
+        db.rollback()
+        return False
+    if row is None or row[0] is None:
+        return False
+    if row[1] != row[2]:
+        if _reported_drift != (row[1], row[2]):
+            _reported_drift = (row[1], row[2])
+            logger.warning(f"{row[1] - row[2]} enrollment writes bypassed the rollup hooks; reading the "
+                           f"enrollments table until `python -m src.analytics.rollups` rebuilds the rollups")
+        return False
+    return True
+
+def rebuild_rollups(db: Session) -> None:
+    """Recomputes every rollup table from the enrollments table (backfill)"""
+    for model in ROLLUPS:
+        db.execute(delete(model.__table__))
+        db.execute(insert(model.__table__).from_select(_COLUMNS[model] + _MEASURES, _aggregate_select(model)))
+    db.execute(delete(RollupState.__table__))
+    db.add(RollupState(rebuilt_at=datetime.utcnow()))
+    versions = EnrollmentVersion.__table__
+    db.execute(update(versions).where(versions.c.id == VERSION_ROW_ID).values(rollup_writes=versions.c.writes))
+    db.commit()
+
+if __name__ == "__main__":
+    from ..database.config import engine, SessionLocal
+    from ..models.models import Base
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[m.__table__ for m in ROLLUPS + (RollupState, EnrollmentVersion)])
+    db = SessionLocal()
+    try:
+        logger.info("Rebuilding rollup tables...")
+        rebuild_rollups(db)
+        logger.info("Rollup tables rebuilt successfully!")
+    finally:
+        db.close()
@@ -0,0 +1,150 @@
+"""Intent routing for natural language analytics questions.
+
+Keywords are found with one precompiled regex pass, and badge/organization
+names are matched against a word-level trie built from the ``badges`` and
+``organizations`` tables, so routing costs microseconds.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from typing import Dict, Any, List, Tuple, Optional, NamedTuple, Iterable
+import hashlib
+import json
+import re
+import threading
+import time
+from ..models.models import Organization, Badge
+
+# One alternation, scanned once per query; group names are the keyword classes
+_KEYWORDS = re.compile(
+    r"\b(?:"
+    r"(?P<count>how many|enrollments?|enrolled|users?)"
+    r"|(?P<trend>trends?|over time|historical)"
+    r"|(?P<completion>completion|completed|success)"
+    r"|(?P<rate>rates?|percentage)"
+    r"|(?P<path>learning paths?|badge combinations?|journeys?)"
+    r")\b",
+    re.IGNORECASE
+)
+
+class Route(NamedTuple):
+    intent: Optional[str]
+    method: Optional[str]
+    kwargs: Dict[str, Any]
+    entities: Dict[str, List[str]]
+
+_WORDS = re.compile(r"\w+")
+
+class EntityTrie:
+    """Word-level trie over case-folded entity names
+
+    Queries are tokenized once with a compiled regex and scanned left to right,
+    taking the longest name that starts at each word, so matches always fall on
+    word boundaries and cost grows with the number of words, not names.
+    """
+
+    _END = object()
+
+    def __init__(self, names: Iterable[Tuple[str, str]] = ()):
+        self._root: Dict[Any, Any] = {}
+        for kind, name in names:
+            self.add(kind, name)
+
+    def add(self, kind: str, name: str) -> None:
+        words = _WORDS.findall(name.casefold())
+        if not words:
+            return
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault(self._END, []).append((kind, name))
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """(kind, name) pairs found in ``text`` in order, preferring the longest match"""
+        words = _WORDS.findall(text.casefold())
+        root, end = self._root, self._END
+        found = []
+        i, n = 0, len(words)
+        while i < n:
+            node = root.get(words[i])
+            if node is None:
+                i += 1
+                continue
+            best, best_end = None, i
+            j = i
+            while node is not None:
+                j += 1
+                if end in node:
+                    best, best_end = node[end], j
+                node = node.get(words[j]) if j < n else None
+            if best is None:
+                i += 1
+                continue
+            found.extend(best)
+            i = best_end
+        return found
+
+class IntentRouter:
+    """Classifies a question into an AnalyticsEngine call
+
+    Entity dictionaries are rebuilt when the badge or organization tables
+    change, checked at most every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, refresh_interval: float = 30.0):
+        self.refresh_interval = refresh_interval
+        self._entities = EntityTrie()
+        self._version = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._checked_at = float("-inf")
+
+    def refresh(self, db: Session) -> None:
+        """Rebuilds the entity trie if any badge or organization name changed"""
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            badge_names = db.execute(select(Badge.name).order_by(Badge.name)).scalars().all()
+            organization_names = db.execute(select(Organization.name).order_by(Organization.name)).scalars().all()
+            # Renames keep the row counts and ids, so the names themselves are the version
+            version = hashlib.sha256(json.dumps([badge_names, organization_names]).encode("utf-8")).digest()
+            if version != self._version:
+                self.load(badge_names, organization_names)
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def load(self, badge_names: Iterable[str], organization_names: Iterable[str]) -> None:
+        trie = EntityTrie()
+        for name in badge_names:
+            if name:
+                trie.add("badges", name)
+        for name in organization_names:
+            if name:
+                trie.add("organizations", name)
+        self._entities = trie
+
+    def route(self, query: str, db: Optional[Session] = None) -> Route:
+        if db is not None:
+            self.refresh(db)
+        keywords = {m.lastgroup for m in _KEYWORDS.finditer(query)}
+        entities = {"badges": [], "organizations": []}
+        for kind, name in self._entities.find(query):
+            entities[kind].append(name)
+        badge = entities["badges"][0] if entities["badges"] else None
+        org = entities["organizations"][0] if entities["organizations"] else None
+
+        if "count" in keywords and badge:
+            return Route("badge_enrollments", "get_badge_enrollments", {"badge_name": badge}, entities)
+        if "count" in keywords and org:
+            return Route("organization_trends", "get_organization_trends", {"org_name": org}, entities)
+        if "trend" in keywords:
+            return Route("organization_trends", "get_organization_trends", {"org_name": org}, entities)
+        if "completion" in keywords and "rate" in keywords:
+            return Route("completion_metrics", "get_completion_metrics", {}, entities)
+        if "path" in keywords:
+            return Route("learning_paths", "get_learning_paths", {}, entities)
+        return Route(None, None, {}, entities)
+
+# Process-wide router; entity dictionaries load lazily from the database
+router = IntentRouter()
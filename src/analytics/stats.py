@@ -0,0 +1,54 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from typing import Dict, Any, Optional
+import threading
+import time
+from ..config.settings import get_settings
+from ..models.models import Organization, User, Badge, Enrollment
+from . import cache
+
+class DatabaseStatsProvider:
+    """Shared snapshot of the table counts shown alongside every answer
+
+    All four counts are collected in one round trip and reused for ``ttl``
+    seconds, or until bump_data_version() signals a write.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._snapshot: Optional[Dict[str, int]] = None
+        self._taken_at = 0.0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, int]:
+        with self._lock:
+            fresh = (self._snapshot is not None
+                     and self._generation == cache._write_generation
+                     and time.monotonic() - self._taken_at < self.ttl)
+            if fresh:
+                return dict(self._snapshot)
+        generation = cache._write_generation
+        snapshot = self._collect(db)
+        with self._lock:
+            self._snapshot, self._taken_at, self._generation = snapshot, time.monotonic(), generation
+        return dict(snapshot)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _collect(db: Session) -> Dict[str, int]:
+        counts = [select(func.count()).select_from(model).scalar_subquery()
+                  for model in (User, Badge, Enrollment, Organization)]
+        row = db.execute(select(*counts)).one()
+        return {
+            "total_users": row[0],
+            "total_badges": row[1],
+            "total_enrollments": row[2],
+            "total_organizations": row[3]
+        }
+
+# Process-wide provider shared by /analytics, the UI and the MCP tools
+stats_provider = DatabaseStatsProvider(ttl=get_settings().STATS_TTL_SECONDS)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+# Words that do not change what is being asked
+_FILLER = {
+    "a", "an", "the", "please", "me", "us", "can", "could", "would", "you", "tell",
+    "show", "give", "what", "whats", "is", "are", "s", "of", "for", "in", "on", "to"
+}
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+def normalize_query(query: str) -> str:
+    """Lower-cases, strips punctuation and filler words so trivial rewordings share a key"""
+    words = _NON_WORD.sub(" ", query.casefold().replace("'", "")).split()
+    return " ".join(w for w in words if w not in _FILLER)
+
+def payload_version(*payloads: Any) -> str:
+    """Digest of the data the answer is based on; changes whenever the numbers change"""
+    encoded = json.dumps(payloads, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class MemoryBackend:
+    """In-process LRU store"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteBackend:
+    """On-disk store that survives restarts and is shared by workers on one host"""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_answers_used_at ON answers (used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        with conn:
+            if expires_at is not None and expires_at < time.time():
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE answers SET used_at = ? WHERE key = ?", (time.time(), key))
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl is not None else None, now)
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+class AnswerCache:
+    """LLM answers keyed by normalized question, route and the data behind it"""
+
+    def __init__(self, backend=None, ttl: Optional[float] = 3600.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(query: str, intent: Optional[str], entities: Dict[str, Any], data_version: str) -> str:
+        parts = json.dumps([normalize_query(query), intent, entities, data_version], sort_keys=True)
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.enabled:
+            self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__ if self.backend else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+def create_answer_cache() -> AnswerCache:
+    backend = None
+    if settings.ANSWER_CACHE_BACKEND == "memory":
+        backend = MemoryBackend(settings.ANSWER_CACHE_MAX_ENTRIES)
+    elif settings.ANSWER_CACHE_BACKEND == "sqlite":
+        backend = SQLiteBackend(settings.ANSWER_CACHE_PATH, settings.ANSWER_CACHE_MAX_ENTRIES)
+    elif settings.ANSWER_CACHE_BACKEND != "none":
+        raise ValueError(f"Unknown ANSWER_CACHE_BACKEND {settings.ANSWER_CACHE_BACKEND!r}")
+    return AnswerCache(backend, ttl=settings.ANSWER_CACHE_TTL_SECONDS)
@@ -0,0 +1,165 @@
+"""Response compression with brotli or gzip, whichever the client prefers.
+
+Brotli is used when the client accepts ``br`` and the optional ``brotli``
+package is installed; otherwise gzip. Responses below the minimum size go out
+uncompressed. Streamed responses are flushed chunk by chunk, so NDJSON events
+still reach the client as they are produced. Only Starlette's public header
+helpers are used, so this works across Starlette releases.
+"""
+import zlib
+from typing import Callable, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Larger bodies are compressed in a worker thread so the event loop keeps serving
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+# Already compressed or not worth compressing; Arrow and Parquet exports are
+# binary and streamed in large batches. "type/*" covers every subtype.
+EXCLUDED_CONTENT_TYPES = (
+    "application/grpc",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "audio/*",
+    "font/woff",
+    "font/woff2",
+    "image/*",
+    "text/event-stream",
+    "video/*",
+    "application/vnd.apache.arrow.stream",
+    "application/vnd.apache.parquet",
+)
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def _excluded(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_CONTENT_TYPES or media_type.partition("/")[0] + "/*" in EXCLUDED_CONTENT_TYPES \
+        or media_type.startswith("application/grpc+")
+
+class GzipCompressor:
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        flush = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self._compressor.compress(body) + self._compressor.flush(flush)
+
+class BrotliCompressor:
+    def __init__(self, quality: int = 5):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self._compressor.process(body)
+        return compressed + (self._compressor.flush() if more_body else self._compressor.finish())
+
+class CompressionResponder:
+    """Compresses one response with ``compressor()``, created once its body turns out large enough
+
+    Responses that already have a Content-Encoding, partial content and
+    excluded media types pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, content_encoding: str, compressor: Callable[[], object]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_encoding = content_encoding
+        self.compressor = compressor
+        self.send: Optional[Send] = None
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.active = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.active.compress, body, more_body)
+        return self.active.compress(body, more_body)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body shows whether to compress
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or message["status"] == 206 \
+                or _excluded(headers.get("content-type", ""))
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+        elif self.passthrough:
+            await self.send(message)
+        elif message["type"] != "http.response.body":
+            # Trailers, early hints or a file sent by path; never compressed
+            if self.start is not None:
+                start, self.start = self.start, None
+                await self.send(start)
+            await self.send(message)
+        elif self.start is not None:
+            start, self.start = self.start, None
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(start)
+                await self.send(message)
+                return
+            self.active = self.compressor()
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            headers["Content-Encoding"] = self.content_encoding
+            message["body"] = await self.compress(body, more_body)
+            if more_body or start.get("trailers", False):
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(start)
+            await self.send(message)
+        elif self.active is not None:
+            message["body"] = await self.compress(message.get("body", b""), message.get("more_body", False))
+            await self.send(message)
+        else:
+            await self.send(message)
+
+class CompressionMiddleware:
+    """Compresses responses of at least ``minimum_size`` bytes"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: Optional[int] = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality if BROTLI_AVAILABLE else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if self.brotli_quality is not None and _accepts(accept_encoding, "br"):
+            responder = CompressionResponder(self.app, self.minimum_size, "br",
+                                             lambda: BrotliCompressor(self.brotli_quality))
+        elif _accepts(accept_encoding, "gzip"):
+            responder = CompressionResponder(self.app, self.minimum_size, "gzip",
+                                             lambda: GzipCompressor(self.gzip_level))
+        else:
+            await self.app(scope, receive, send)
+            return
+        await responder(scope, receive, send)
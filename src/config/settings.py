@@ -1,18 +1,93 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # OpenAI Settings
     OPENAI_API_KEY: str
     
+    # LLM Settings
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_TIMEOUT_SECONDS: float = 20.0
+    
+    # LLM Answer Cache Settings
+    ANSWER_CACHE_BACKEND: str = "memory"  # memory, sqlite or none
+    ANSWER_CACHE_PATH: str = "./answer_cache.db"
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Conversation Session Settings
+    SESSION_WINDOW_TURNS: int = 3
+    SESSION_MAX_MESSAGE_CHARS: int = 4000
+    SESSION_IDLE_SECONDS: float = 1800.0
+    SESSION_MAX_COUNT: int = 1000
+    SESSION_MAX_TOTAL_CHARS: int = 20_000_000
+    
     # Database Settings
     DATABASE_URL: str
+    # Connection pool (ignored by SQLite's pools); pre-ping drops connections the server closed
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite tuning applied on connect; set a PRAGMA to None to keep SQLite's default
+    SQLITE_JOURNAL_MODE: Optional[str] = "WAL"
+    SQLITE_SYNCHRONOUS: Optional[str] = "NORMAL"
+    SQLITE_MMAP_SIZE: Optional[int] = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: Optional[int] = 64 * 1024
+    SQLITE_TEMP_STORE: Optional[str] = "MEMORY"
+    SQLITE_READ_POOL_SIZE: int = 8
+    
+    # Sample Data Settings (see src.database.synthetic)
+    SEED_ORGANIZATIONS: int = 3
+    SEED_USERS: int = 15
+    SEED_BADGES: int = 4
+    SEED_ENROLLMENTS: int = 30
+    SEED_RANDOM_SEED: int = 42
+    # Written after the first successful schema/seed check so later boots skip it; None always checks
+    INIT_DB_MARKER_PATH: Optional[str] = ".init_db_state"
     
     # Server Settings
     PORT: int = 8000
     HOST: str = "0.0.0.0"
     
+    # Result Cache Settings
+    RESULT_CACHE_MAX_ENTRIES: int = 256
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_TTL_SECONDS: float = 300.0
+    # Closed organization-trend buckets, cached until past enrollments are rewritten
+    TREND_BUCKET_CACHE_MAX_ENTRIES: int = 10000
+    # Backstop for changes to past days the history counter does not see; None keeps buckets until it moves
+    TREND_BUCKET_CACHE_TTL_SECONDS: Optional[float] = 3600.0
+    
+    # Result Paging Settings
+    ANALYTICS_DEFAULT_LIMIT: int = 100
+    ANALYTICS_MAX_LIMIT: int = 1000
+    # Questions accepted by one /analytics/batch request
+    ANALYTICS_BATCH_MAX_QUERIES: int = 20
+    
+    # Response Compression Settings; brotli is used when installed and accepted
+    COMPRESSION_MINIMUM_BYTES: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: Optional[int] = 5
+    
+    # Columnar Export Settings
+    EXPORT_BATCH_SIZE: int = 50_000
+    
+    # Tracing Settings; requests slower than this are logged with their stages
+    SLOW_REQUEST_SECONDS: Optional[float] = None
+    
+    # Database Stats Snapshot Settings
+    STATS_TTL_SECONDS: float = 30.0
+    
+    # Background Precompute Settings; hot results are pinned in the result cache
+    # and recomputed when the data version changes or they reach the max age
+    PRECOMPUTE_ENABLED: bool = True
+    PRECOMPUTE_INTERVAL_SECONDS: float = 30.0
+    PRECOMPUTE_MAX_AGE_SECONDS: Optional[float] = 3600.0
+    PRECOMPUTE_TOP_BADGES: int = 10
+    PRECOMPUTE_CHART_FORMATS: List[str] = ["spec", "figure"]
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..config.settings import get_settings
@@ -8,17 +10,81 @@ settings = get_settings()
 # Get database URL from settings
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Configure SQLAlchemy engine
-connect_args = {}
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
+def sqlite_pragmas(read_only: bool = False) -> Dict[str, Any]:
+    """The SQLite tuning profile from settings, as PRAGMA name -> value
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args=connect_args
-)
+    Journal mode is a property of the database file, so only the writer sets it.
+    """
+    pragmas = {
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        # Negative sizes are in KiB rather than pages
+        "cache_size": None if settings.SQLITE_CACHE_SIZE_KIB is None else -settings.SQLITE_CACHE_SIZE_KIB,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    else:
+        pragmas = {"journal_mode": settings.SQLITE_JOURNAL_MODE, **pragmas}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+def sqlite_file(url: str) -> Optional[str]:
+    """Path of the SQLite database file ``url`` points to, None for other databases and in-memory ones"""
+    if not url.startswith("sqlite"):
+        return None
+    database = make_url(url).database
+    return database if database and database != ":memory:" else None
+
+def create_database_engine(url: str, read_only: bool = False,
+                           pragmas: Optional[Dict[str, Any]] = None) -> Engine:
+    """Engine for ``url`` with pool settings, and the SQLite profile applied on connect
+
+    Args:
+        url: Database URL
+        read_only: Open the SQLite file read-only, for a pool of reader connections
+        pragmas: PRAGMAs to run on each new SQLite connection; defaults to sqlite_pragmas()
+    """
+    engine_options: Dict[str, Any] = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            **engine_options
+        )
+
+    if read_only:
+        path = sqlite_file(url)
+        if path is None:
+            raise ValueError(f"Read-only engines need a SQLite database file, not {url}")
+        url = f"sqlite:///file:{path}?mode=ro&uri=true"
+        engine_options.update(pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0)
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **engine_options)
+
+    pragmas = sqlite_pragmas(read_only) if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+# Configure SQLAlchemy engines. Analytics endpoints read through a separate
+# read-only pool on SQLite files; other databases share the one engine.
+engine = create_database_engine(SQLALCHEMY_DATABASE_URL)
+if sqlite_file(SQLALCHEMY_DATABASE_URL):
+    reader_engine = create_database_engine(SQLALCHEMY_DATABASE_URL, read_only=True)
+else:
+    reader_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine)
 
 Base = declarative_base()
 
@@ -28,3 +94,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
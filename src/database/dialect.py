@@ -0,0 +1,104 @@
+"""SQL constructs whose spelling differs between SQLite and PostgreSQL.
+
+Queries use these instead of database-specific functions such as
+``julianday`` or ``strftime``; each one is compiled for the dialect of the
+connection that runs it. Format strings are rendered inline rather than bound,
+so an expression repeated in SELECT and GROUP BY compiles to identical SQL.
+"""
+from sqlalchemy import Date, Float, String, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+class days_between(FunctionElement):
+    """Fractional days from the first datetime to the second"""
+    type = Float()
+    name = "days_between"
+    inherit_cache = True
+
+class month_key(FunctionElement):
+    """A datetime's month as 'YYYY-MM' text"""
+    type = String()
+    name = "month_key"
+    inherit_cache = True
+
+class week_key(FunctionElement):
+    """The Monday starting a datetime's ISO week, as 'YYYY-MM-DD' text"""
+    type = String()
+    name = "week_key"
+    inherit_cache = True
+
+class day_key(FunctionElement):
+    """A datetime's calendar day"""
+    type = Date()
+    name = "day_key"
+    inherit_cache = True
+
+class string_agg(FunctionElement):
+    """Aggregates text values into one string joined by a separator"""
+    type = String()
+    name = "string_agg"
+    inherit_cache = True
+
+def upsert(table: Table, dialect_name: str):
+    """INSERT into ``table`` that supports on_conflict_do_update() on the given dialect"""
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    raise CompileError(f"upsert is not supported on the {dialect_name} dialect")
+
+def _args(element, compiler, **kw):
+    return [compiler.process(arg, **kw) for arg in element.clauses]
+
+@compiles(days_between)
+@compiles(month_key)
+@compiles(week_key)
+@compiles(day_key)
+@compiles(string_agg)
+def _unsupported(element, compiler, **kw):
+    raise CompileError(f"{element.name} is not supported on the {compiler.dialect.name} dialect")
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = _args(element, compiler, **kw)
+    return f"(julianday({end}) - julianday({start}))"
+
+@compiles(days_between, "postgresql")
+def _days_between_postgresql(element, compiler, **kw):
+    start, end = _args(element, compiler, **kw)
+    return f"CAST(EXTRACT(EPOCH FROM ({end}) - ({start})) / 86400.0 AS DOUBLE PRECISION)"
+
+@compiles(month_key, "sqlite")
+def _month_key_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m', {})".format(*_args(element, compiler, **kw))
+
+@compiles(month_key, "postgresql")
+def _month_key_postgresql(element, compiler, **kw):
+    return "to_char({}, 'YYYY-MM')".format(*_args(element, compiler, **kw))
+
+@compiles(week_key, "sqlite")
+def _week_key_sqlite(element, compiler, **kw):
+    # Forward to Sunday (or stay on it), then back to that week's Monday
+    return "date({}, 'weekday 0', '-6 days')".format(*_args(element, compiler, **kw))
+
+@compiles(week_key, "postgresql")
+def _week_key_postgresql(element, compiler, **kw):
+    return "to_char(date_trunc('week', {}), 'YYYY-MM-DD')".format(*_args(element, compiler, **kw))
+
+@compiles(day_key, "sqlite")
+def _day_key_sqlite(element, compiler, **kw):
+    return "date({})".format(*_args(element, compiler, **kw))
+
+@compiles(day_key, "postgresql")
+def _day_key_postgresql(element, compiler, **kw):
+    return "CAST({} AS DATE)".format(*_args(element, compiler, **kw))
+
+@compiles(string_agg, "sqlite")
+def _string_agg_sqlite(element, compiler, **kw):
+    return "group_concat({}, {})".format(*_args(element, compiler, **kw))
+
+@compiles(string_agg, "postgresql")
+def _string_agg_postgresql(element, compiler, **kw):
+    return "string_agg({}, {})".format(*_args(element, compiler, **kw))
@@ -1,113 +1,113 @@
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
 from sqlalchemy import inspect
-from ..models.models import Organization, User, Badge, Course, Enrollment, Base
-from ..database.config import engine, SessionLocal
-import random
+from sqlalchemy.engine import make_url
+from ..models.models import Organization, Base
+from ..database.config import engine, SessionLocal, SQLALCHEMY_DATABASE_URL, sqlite_file
+from ..analytics.rollups import rollups_ready, rebuild_rollups
+from ..database.migrations import MIGRATIONS, apply_migrations, mark_all_applied
+from ..config.settings import get_settings
+from typing import Optional
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-def init_db():
-    """Initialize the database with tables and sample data."""
+settings = get_settings()
+
+def _boot_fingerprint() -> Optional[str]:
+    """Identifies the database and schema version a successful boot checked
+
+    SQLite files are also identified by inode, so a deleted and recreated
+    database is checked again. Returns None when there is nothing to identify yet.
+    """
+    fingerprint = {
+        "database": make_url(SQLALCHEMY_DATABASE_URL).render_as_string(hide_password=True),
+        "schema_version": max(version for version, _, _ in MIGRATIONS)
+    }
+    path = sqlite_file(SQLALCHEMY_DATABASE_URL)
+    if path is not None:
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        fingerprint["file"] = [stat.st_dev, stat.st_ino]
+    return json.dumps(fingerprint, sort_keys=True)
+
+def _boot_recorded() -> bool:
+    marker = settings.INIT_DB_MARKER_PATH
+    if not marker or not os.path.exists(marker):
+        return False
+    with open(marker) as f:
+        return f.read() == _boot_fingerprint()
+
+def _record_boot() -> None:
+    marker = settings.INIT_DB_MARKER_PATH
+    fingerprint = _boot_fingerprint()
+    if marker and fingerprint:
+        with open(marker, "w") as f:
+            f.write(fingerprint)
+
+def init_db(force: bool = False):
+    """Initialize the database with tables and sample data.
+
+    After one successful run against a database, later boots skip the schema
+    and seed checks (see INIT_DB_MARKER_PATH) unless ``force`` is set. The
+    rollups are still checked on every boot, since writes made outside the
+    app since the last boot leave them out of date.
+    """
+    if not force and _boot_recorded():
+        logger.info("Database was checked by a previous boot; skipping schema and seed checks.")
+        _check_rollups()
+        return
+    _check_and_seed()
+    _record_boot()
+
+def _check_rollups():
+    # One read of the write counters unless the rollups need a rebuild
+    db = SessionLocal()
+    try:
+        if not rollups_ready(db):
+            logger.info("Backfilling rollup tables...")
+            rebuild_rollups(db)
+    finally:
+        db.close()
+
+def _check_and_seed():
     inspector = inspect(engine)
     existing_tables = inspector.get_table_names()
-    
+
     # Create all tables if they don't exist
     if not existing_tables:
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        mark_all_applied(engine)
         logger.info("Database tables created successfully!")
     else:
         logger.info("Database tables already exist.")
-    
+        apply_migrations(engine)
+
     db = SessionLocal()
-    
+
     # Check if we already have data
     if db.query(Organization).first():
         logger.info("Sample data already exists in the database.")
+        db.close()
+        _check_rollups()
         return
-        
-    logger.info("Initializing database with sample data...")
-    
-    # Sample Organizations
-    organizations = [
-        {"name": "Tech Corp", "description": "Technology Company"},
-        {"name": "Education Plus", "description": "Educational Institution"},
-        {"name": "Data Systems", "description": "Data Analytics Company"}
-    ]
-    
-    org_objects = []
-    for org in organizations:
-        db_org = Organization(**org)
-        db.add(db_org)
-        org_objects.append(db_org)
-    
-    # Sample Badges
-    badges = [
-        {"name": "Python Master", "description": "Advanced Python Programming"},
-        {"name": "Data Science Pro", "description": "Data Science and Analytics"},
-        {"name": "Cloud Expert", "description": "Cloud Computing and Architecture"},
-        {"name": "AI Developer", "description": "Artificial Intelligence Development"}
-    ]
-    
-    badge_objects = []
-    for badge in badges:
-        db_badge = Badge(**badge)
-        db.add(db_badge)
-        badge_objects.append(db_badge)
-    
-    # Sample Courses
-    courses = [
-        {"name": "Python Programming", "description": "Learn Python basics to advanced"},
-        {"name": "Data Analysis", "description": "Data analysis with Python"},
-        {"name": "Cloud Computing", "description": "Introduction to cloud computing"},
-        {"name": "Machine Learning", "description": "ML fundamentals"}
-    ]
-    
-    course_objects = []
-    for course in courses:
-        db_course = Course(**course)
-        db.add(db_course)
-        course_objects.append(db_course)
-    
-    # Associate courses with badges
-    course_objects[0].badges.append(badge_objects[0])  # Python course -> Python Master
-    course_objects[1].badges.append(badge_objects[1])  # Data Analysis -> Data Science Pro
-    course_objects[2].badges.append(badge_objects[2])  # Cloud Computing -> Cloud Expert
-    course_objects[3].badges.append(badge_objects[3])  # ML -> AI Developer
-    
-    # Sample Users and Enrollments
-    for org in org_objects:
-        # Create 5 users per organization
-        for i in range(5):
-            user = User(
-                email=f"user{i}@{org.name.lower().replace(' ', '')}.com",
-                name=f"User {i} {org.name}",
-                organization=org
-            )
-            db.add(user)
-            
-            # Enroll user in 1-3 random badges
-            num_enrollments = random.randint(1, 3)
-            selected_badges = random.sample(badge_objects, num_enrollments)
-            
-            for badge in selected_badges:
-                enrollment_date = datetime.utcnow() - timedelta(days=random.randint(0, 180))
-                completion_date = None
-                if random.random() > 0.5:  # 50% chance of completion
-                    completion_date = enrollment_date + timedelta(days=random.randint(30, 90))
-                
-                enrollment = Enrollment(
-                    user=user,
-                    badge=badge,
-                    enrollment_date=enrollment_date,
-                    completion_date=completion_date
-                )
-                db.add(enrollment)
-    
-    db.commit()
+
     db.close()
 
+    # numpy and pandas are only needed to seed
+    from ..database.synthetic import generate_dataset
+
+    logger.info("Initializing database with sample data...")
+    generate_dataset(
+        engine,
+        organizations=settings.SEED_ORGANIZATIONS,
+        users=settings.SEED_USERS,
+        badges=settings.SEED_BADGES,
+        enrollments=settings.SEED_ENROLLMENTS,
+        seed=settings.SEED_RANDOM_SEED
+    )
+
 if __name__ == "__main__":
-    init_db()
+    init_db(force=True)
@@ -0,0 +1,93 @@
+"""Minimal versioned schema migrations for databases created by earlier releases.
+
+Each migration runs once and is recorded in the ``schema_migrations`` table.
+Run ``python -m src.database.migrations`` to bring an existing database up to date.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, select, insert, text, inspect
+from sqlalchemy.engine import Engine
+from datetime import datetime
+from typing import Callable, List, Tuple
+import logging
+from ..models.models import (
+    User, Enrollment, BadgeDailyRollup, OrganizationMonthlyRollup,
+    BadgeOrganizationRollup, RollupState, EnrollmentVersion, Base
+)
+from .versions import create_version_triggers, drop_version_triggers
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow)
+)
+
+def _create_rollup_tables(conn) -> None:
+    Base.metadata.create_all(bind=conn, tables=[
+        BadgeDailyRollup.__table__, OrganizationMonthlyRollup.__table__,
+        BadgeOrganizationRollup.__table__, RollupState.__table__
+    ])
+
+def _create_enrollment_indexes(conn) -> None:
+    for index in list(Enrollment.__table__.indexes) + list(User.__table__.indexes):
+        index.create(bind=conn, checkfirst=True)
+    # Refresh planner statistics so the new indexes are actually chosen
+    conn.execute(text("ANALYZE"))
+
+def _create_enrollment_versions(conn) -> None:
+    # Creating the table also adds its row and the triggers
+    Base.metadata.create_all(bind=conn, tables=[EnrollmentVersion.__table__])
+
+def _replace_version_triggers(conn) -> None:
+    drop_version_triggers(conn)
+    create_version_triggers(conn)
+
+def _count_history_writes(conn) -> None:
+    # Tables created by migration 3 on this release already have the column
+    if "history_writes" not in {column["name"] for column in inspect(conn).get_columns("enrollment_versions")}:
+        conn.execute(text("ALTER TABLE enrollment_versions ADD COLUMN history_writes BIGINT NOT NULL DEFAULT 0"))
+    # Replaces the triggers of migration 3, which only count writes
+    _replace_version_triggers(conn)
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "rollup tables", _create_rollup_tables),
+    (2, "enrollment access-path indexes", _create_enrollment_indexes),
+    (3, "enrollment write counters", _create_enrollment_versions),
+    (4, "enrollment history write counter", _count_history_writes),
+    (5, "count users moving between organizations", _replace_version_triggers),
+    (6, "count organization renames and deletes", _replace_version_triggers),
+]
+
+def mark_all_applied(engine: Engine) -> None:
+    """Records every migration as applied, for databases created from the current models"""
+    _metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+        for version, name, _ in MIGRATIONS:
+            if version not in applied:
+                conn.execute(insert(schema_migrations).values(version=version, name=name))
+
+def apply_migrations(engine: Engine) -> List[int]:
+    """Applies pending migrations in order and returns the versions that ran"""
+    _metadata.create_all(bind=engine)
+    ran = []
+    with engine.begin() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {name}")
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name))
+        ran.append(version)
+    return ran
+
+if __name__ == "__main__":
+    from .config import engine
+
+    logging.basicConfig(level=logging.INFO)
+    ran = apply_migrations(engine)
+    logger.info(f"Applied migrations: {ran}" if ran else "Database schema is up to date.")
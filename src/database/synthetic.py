@@ -0,0 +1,246 @@
+"""Seeded synthetic data at configurable scale.
+
+Everything is drawn from one ``numpy.random.Generator``, so the same seed,
+scale and ``end`` date always produce the same database. Distributions are
+skewed the way real tenants are:
+
+- organization sizes and user activity are heavy-tailed,
+- badge popularity follows a Zipf law (the first badges are the most popular),
+- each badge has its own completion rate and log-normal completion times,
+- enrollment volume grows towards the end of the window.
+
+Rows go in through batched Core executemany inserts in one transaction, with
+the enrollment indexes and write-counting triggers recreated afterwards. Core
+inserts bypass the ORM flush hooks, so rollups are rebuilt and the data version
+is bumped at the end.
+
+    python -m src.database.synthetic --users 1000000 --enrollments 10000000
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, func, select, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from ..models.models import Organization, User, Badge, Course, Enrollment, Base, course_badge
+from ..analytics.cache import bump_data_version
+from ..analytics.rollups import rebuild_rollups
+from .migrations import apply_migrations, mark_all_applied
+from .versions import create_version_triggers, drop_version_triggers, bump_writes
+
+logger = logging.getLogger(__name__)
+
+# The original sample entities come first so example questions keep working
+SAMPLE_ORGANIZATIONS = [
+    ("Tech Corp", "Technology Company"),
+    ("Education Plus", "Educational Institution"),
+    ("Data Systems", "Data Analytics Company"),
+]
+SAMPLE_BADGES = [
+    ("Python Master", "Advanced Python Programming"),
+    ("Data Science Pro", "Data Science and Analytics"),
+    ("Cloud Expert", "Cloud Computing and Architecture"),
+    ("AI Developer", "Artificial Intelligence Development"),
+]
+SAMPLE_COURSES = [
+    ("Python Programming", "Learn Python basics to advanced"),
+    ("Data Analysis", "Data analysis with Python"),
+    ("Cloud Computing", "Introduction to cloud computing"),
+    ("Machine Learning", "ML fundamentals"),
+]
+
+def _named(samples, count: int, pattern: str):
+    return [samples[i] if i < len(samples) else (pattern.format(i + 1), pattern.format(i + 1))
+            for i in range(count)]
+
+def _insert(conn, table, rows, batch_size: int) -> None:
+    for start in range(0, len(rows), batch_size):
+        conn.execute(insert(table), rows[start:start + batch_size])
+
+def _insert_columns(conn, table, columns: Dict[str, Sequence]) -> None:
+    """executemany straight on the driver cursor, skipping per-row parameter processing
+
+    Values must already be in a form the driver accepts (see _datetimes).
+    """
+    compiled = insert(table).compile(dialect=conn.dialect, column_keys=list(columns))
+    if compiled.positional:
+        params = list(zip(*[columns[name] for name in compiled.positiontup]))
+    else:
+        names = list(columns)
+        params = [dict(zip(names, row)) for row in zip(*columns.values())]
+    conn.exec_driver_sql(str(compiled), params)
+
+def _datetimes(values: np.ndarray, dialect) -> np.ndarray:
+    """datetime64 values as driver parameters, with NaT as None
+
+    SQLite stores DateTime as text, so values are formatted the way
+    SQLAlchemy writes them; other drivers take Python datetimes.
+    """
+    if dialect.name == "sqlite":
+        converted = np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").astype(object)
+    else:
+        converted = pd.DatetimeIndex(values).to_pydatetime().astype(object)
+    converted[np.isnat(values)] = None
+    return converted
+
+def _enrollment_pairs(rng: np.random.Generator, count: int, user_weights: np.ndarray,
+                      badge_weights: np.ndarray) -> np.ndarray:
+    """Distinct (user, badge) index pairs encoded as user * n_badges + badge"""
+    n_badges = len(badge_weights)
+    if count > len(user_weights) * n_badges:
+        raise ValueError(f"Cannot create {count} distinct enrollments from "
+                         f"{len(user_weights)} users and {n_badges} badges")
+    keys = np.empty(0, dtype=np.int64)
+    unique_ratio = 1.0
+    while len(keys) < count:
+        # Oversample by the duplicate rate seen so far, so few rounds are needed
+        draw = int(max(count - len(keys), 1024) / max(unique_ratio, 0.01) * 1.1)
+        users = rng.choice(len(user_weights), size=draw, p=user_weights)
+        badges = rng.choice(n_badges, size=draw, p=badge_weights)
+        before = len(keys)
+        keys = np.union1d(keys, users.astype(np.int64) * n_badges + badges)
+        unique_ratio = (len(keys) - before) / draw
+    # union1d sorts; shuffle before truncating so the kept pairs stay unbiased
+    return rng.permutation(keys)[:count]
+
+def generate_dataset(engine: Engine, organizations: int = 3, users: int = 15, badges: int = 4,
+                     enrollments: int = 30, seed: int = 42, days: int = 365,
+                     end: Optional[datetime] = None, batch_size: int = 50_000) -> Dict[str, int]:
+    """Fills an empty database with synthetic data and returns the row counts
+
+    Args:
+        engine: Engine bound to a database whose tables are empty
+        organizations, users, badges, enrollments: Number of rows to create
+        seed: Seed for the random generator
+        days: Length of the enrollment window ending at ``end``
+        end: Latest enrollment time; defaults to today at midnight UTC
+        batch_size: Rows per executemany call
+    """
+    if min(organizations, users, badges) < 1 or enrollments < 0:
+        raise ValueError("organizations, users and badges must be positive")
+    rng = np.random.default_rng(seed)
+    end = end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    started = time.perf_counter()
+
+    if inspect(engine).get_table_names():
+        apply_migrations(engine)
+    else:
+        Base.metadata.create_all(bind=engine)
+        mark_all_applied(engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(Organization)).scalar():
+            raise ValueError("generate_dataset needs an empty database")
+
+    # Heavy-tailed organization sizes and per-user activity
+    org_weights = rng.pareto(1.2, organizations) + 1
+    user_orgs = rng.choice(organizations, size=users, p=org_weights / org_weights.sum())
+    user_activity = rng.lognormal(0.0, 1.0, users)
+    # Zipf badge popularity
+    badge_popularity = 1.0 / np.arange(1, badges + 1) ** 1.1
+    completion_rate = rng.uniform(0.3, 0.8, badges)
+    median_days = rng.uniform(20, 90, badges)
+
+    keys = _enrollment_pairs(rng, enrollments, user_activity / user_activity.sum(),
+                             badge_popularity / badge_popularity.sum())
+    user_index, badge_index = np.divmod(keys, badges)
+
+    # Volume grows towards the end of the window
+    window = np.timedelta64(days * 86400, "s")
+    offsets = (rng.power(1.5, enrollments) * window / np.timedelta64(1, "s")).astype(np.int64)
+    enrolled = np.datetime64(start, "s") + offsets.astype("timedelta64[s]")
+    durations = rng.lognormal(np.log(median_days[badge_index]), 0.6)
+    completed = np.datetime64(start, "s") + (offsets + (durations * 86400).astype(np.int64)).astype("timedelta64[s]")
+    completed[(rng.random(enrollments) >= completion_rate[badge_index]) |
+              (completed > np.datetime64(end, "s"))] = np.datetime64("NaT")
+
+    # Enrollment ids follow enrollment time, as in an append-only table
+    order = np.argsort(enrolled, kind="stable")
+    user_index, badge_index = user_index[order], badge_index[order]
+    enrolled, completed = enrolled[order], completed[order]
+
+    org_rows = _named(SAMPLE_ORGANIZATIONS, organizations, "Organization {:05d}")
+    badge_rows = _named(SAMPLE_BADGES, badges, "Badge {:04d}")
+    course_rows = _named(SAMPLE_COURSES, badges, "Course {:04d}")
+    slugs = [name.lower().replace(" ", "") for name, _ in org_rows]
+
+    enrollment_indexes = list(Enrollment.__table__.indexes)
+    with engine.begin() as conn:
+        # Index maintenance dominates large loads; build them once at the end.
+        # The load counts as a single write instead of one per row.
+        for index in enrollment_indexes:
+            index.drop(conn, checkfirst=True)
+        drop_version_triggers(conn)
+
+        _insert(conn, Organization.__table__, [
+            {"id": i + 1, "name": name, "description": description}
+            for i, (name, description) in enumerate(org_rows)], batch_size)
+        _insert(conn, Badge.__table__, [
+            {"id": i + 1, "name": name, "description": description}
+            for i, (name, description) in enumerate(badge_rows)], batch_size)
+        _insert(conn, Course.__table__, [
+            {"id": i + 1, "name": name, "description": description}
+            for i, (name, description) in enumerate(course_rows)], batch_size)
+        _insert(conn, course_badge, [
+            {"course_id": i + 1, "badge_id": i + 1} for i in range(badges)], batch_size)
+        _insert(conn, User.__table__, [
+            {"id": i + 1, "email": f"user{i + 1}@{slugs[org]}.com",
+             "name": f"User {i + 1} {org_rows[org][0]}", "organization_id": int(org) + 1}
+            for i, org in enumerate(user_orgs)], batch_size)
+
+        for offset in range(0, enrollments, batch_size):
+            chunk = slice(offset, offset + batch_size)
+            _insert_columns(conn, Enrollment.__table__, {
+                "id": range(offset + 1, offset + 1 + len(enrolled[chunk])),
+                "user_id": (user_index[chunk] + 1).tolist(),
+                "badge_id": (badge_index[chunk] + 1).tolist(),
+                "enrollment_date": _datetimes(enrolled[chunk], conn.dialect),
+                "completion_date": _datetimes(completed[chunk], conn.dialect)
+            })
+            if offset and offset % (batch_size * 20) == 0:
+                logger.info(f"Inserted {offset} enrollments...")
+
+        for index in enrollment_indexes:
+            index.create(conn)
+        create_version_triggers(conn)
+        bump_writes(conn)
+        if conn.dialect.name == "postgresql":
+            # Ids were given explicitly, so move the serial sequences past them
+            for table in (Organization.__table__, Badge.__table__, Course.__table__,
+                          User.__table__, Enrollment.__table__):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE(MAX(id), 0) + 1, false) FROM {table.name}")
+        conn.exec_driver_sql("ANALYZE")
+
+    db = sessionmaker(bind=engine)()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    bump_data_version()
+
+    counts = {"organizations": organizations, "users": users, "badges": badges, "enrollments": enrollments}
+    logger.info(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+    return counts
+
+if __name__ == "__main__":
+    from .config import engine
+
+    parser = argparse.ArgumentParser(description="Fill the configured database with seeded synthetic data")
+    parser.add_argument("--organizations", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--badges", type=int, default=200)
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    generate_dataset(engine, organizations=args.organizations, users=args.users, badges=args.badges,
+                     enrollments=args.enrollments, seed=args.seed, days=args.days, batch_size=args.batch_size)
@@ -0,0 +1,133 @@
+"""Write counters for the enrollments table, kept by database triggers.
+
+Every insert, update and delete on ``enrollments`` increments
+``enrollment_versions.writes``, whichever process or API made it, so readers
+learn whether the data changed from one single-row read. ``history_writes``
+only counts the writes that can change days already past: inserts dated before
+today (UTC), updates of enrollment_date, user_id or badge_id, and deletes.
+Moving a user to another organization counts as a write of both kinds, since
+it moves the user's enrollments between organizations. Renaming or deleting an
+organization rewrites the organization trends of past days, so it counts as a
+history write. The triggers are created with the table (see src.models.models)
+and by migrations 3 to 6.
+"""
+from typing import List
+
+# The one row of enrollment_versions
+VERSION_ROW_ID = 1
+
+# 1 when the written row can change a day before today, else 0
+_SQLITE_HISTORY = {
+    "insert": "CASE WHEN NEW.enrollment_date < date('now') THEN 1 ELSE 0 END",
+    "update": """CASE WHEN NEW.enrollment_date IS NOT OLD.enrollment_date OR NEW.user_id IS NOT OLD.user_id
+                      OR NEW.badge_id IS NOT OLD.badge_id THEN 1 ELSE 0 END""",
+    "delete": "1",
+}
+
+_SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS enrollments_versions_{operation} AFTER {operation.upper()} ON enrollments
+    BEGIN
+        UPDATE enrollment_versions SET writes = writes + 1, history_writes = history_writes + {history}
+        WHERE id = {VERSION_ROW_ID};
+    END"""
+    for operation, history in _SQLITE_HISTORY.items()
+] + [
+    # Moving a user to another organization moves their enrollments between organization groups
+    f"""CREATE TRIGGER IF NOT EXISTS users_versions_update AFTER UPDATE OF organization_id ON users
+    WHEN NEW.organization_id IS NOT OLD.organization_id
+    BEGIN
+        UPDATE enrollment_versions SET writes = writes + 1, history_writes = history_writes + 1
+        WHERE id = {VERSION_ROW_ID};
+    END""",
+] + [
+    # Organization trends are reported by name
+    f"""CREATE TRIGGER IF NOT EXISTS organizations_versions_{operation} AFTER {event} ON organizations
+    {condition}
+    BEGIN
+        UPDATE enrollment_versions SET history_writes = history_writes + 1 WHERE id = {VERSION_ROW_ID};
+    END"""
+    for operation, event, condition in (("update", "UPDATE OF name", "WHEN NEW.name IS NOT OLD.name"),
+                                        ("delete", "DELETE", ""))
+]
+
+_POSTGRESQL_TRIGGERS = [
+    f"""CREATE OR REPLACE FUNCTION enrollment_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        history integer := 1;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            history := CASE WHEN NEW.enrollment_date < CAST(now() AT TIME ZONE 'UTC' AS DATE) THEN 1 ELSE 0 END;
+        ELSIF TG_OP = 'UPDATE' THEN
+            history := CASE WHEN NEW.enrollment_date IS DISTINCT FROM OLD.enrollment_date
+                                 OR NEW.user_id IS DISTINCT FROM OLD.user_id
+                                 OR NEW.badge_id IS DISTINCT FROM OLD.badge_id THEN 1 ELSE 0 END;
+        END IF;
+        UPDATE enrollment_versions SET writes = writes + 1, history_writes = history_writes + history
+        WHERE id = {VERSION_ROW_ID};
+        RETURN NULL;
+    END
+    $$""",
+    "DROP TRIGGER IF EXISTS enrollments_versions ON enrollments",
+    """CREATE TRIGGER enrollments_versions AFTER INSERT OR UPDATE OR DELETE ON enrollments
+    FOR EACH ROW EXECUTE FUNCTION enrollment_versions_bump()""",
+    # Moving a user to another organization moves their enrollments between organization groups
+    f"""CREATE OR REPLACE FUNCTION user_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE enrollment_versions SET writes = writes + 1, history_writes = history_writes + 1
+        WHERE id = {VERSION_ROW_ID};
+        RETURN NULL;
+    END
+    $$""",
+    "DROP TRIGGER IF EXISTS users_versions ON users",
+    """CREATE TRIGGER users_versions AFTER UPDATE OF organization_id ON users
+    FOR EACH ROW WHEN (NEW.organization_id IS DISTINCT FROM OLD.organization_id)
+    EXECUTE FUNCTION user_versions_bump()""",
+    # Organization trends are reported by name
+    f"""CREATE OR REPLACE FUNCTION organization_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE enrollment_versions SET history_writes = history_writes + 1 WHERE id = {VERSION_ROW_ID};
+        RETURN NULL;
+    END
+    $$""",
+    "DROP TRIGGER IF EXISTS organizations_versions ON organizations",
+    """CREATE TRIGGER organizations_versions AFTER UPDATE OF name ON organizations
+    FOR EACH ROW WHEN (NEW.name IS DISTINCT FROM OLD.name)
+    EXECUTE FUNCTION organization_versions_bump()""",
+    "DROP TRIGGER IF EXISTS organizations_versions_delete ON organizations",
+    """CREATE TRIGGER organizations_versions_delete AFTER DELETE ON organizations
+    FOR EACH ROW EXECUTE FUNCTION organization_versions_bump()""",
+]
+
+_DROP = {
+    "sqlite": [f"DROP TRIGGER IF EXISTS enrollments_versions_{operation}"
+               for operation in ("insert", "update", "delete")] + [
+        "DROP TRIGGER IF EXISTS users_versions_update",
+        "DROP TRIGGER IF EXISTS organizations_versions_update",
+        "DROP TRIGGER IF EXISTS organizations_versions_delete",
+    ],
+    "postgresql": ["DROP TRIGGER IF EXISTS enrollments_versions ON enrollments",
+                   "DROP TRIGGER IF EXISTS users_versions ON users",
+                   "DROP TRIGGER IF EXISTS organizations_versions ON organizations",
+                   "DROP TRIGGER IF EXISTS organizations_versions_delete ON organizations"],
+}
+
+def _statements(dialect_name: str, statements) -> List[str]:
+    if dialect_name not in statements:
+        raise NotImplementedError(f"Enrollment write counters are not supported on the {dialect_name} dialect")
+    return statements[dialect_name]
+
+def create_version_triggers(conn) -> None:
+    """Creates the triggers counting enrollment writes, if they do not exist"""
+    for statement in _statements(conn.dialect.name, {"sqlite": _SQLITE_TRIGGERS,
+                                                    "postgresql": _POSTGRESQL_TRIGGERS}):
+        conn.exec_driver_sql(statement)
+
+def drop_version_triggers(conn) -> None:
+    """Drops the triggers, e.g. for a bulk load that counts itself with bump_writes()"""
+    for statement in _statements(conn.dialect.name, _DROP):
+        conn.exec_driver_sql(statement)
+
+def bump_writes(conn) -> None:
+    """Counts one write, possibly to past days, made while the triggers were off"""
+    conn.exec_driver_sql("UPDATE enrollment_versions SET writes = writes + 1, history_writes = history_writes + 1 "
+                         f"WHERE id = {VERSION_ROW_ID}")
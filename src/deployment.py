@@ -2,27 +2,39 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, Depends, Body
+from fastapi import FastAPI, Depends, Body, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import Dict, Any
-import re
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Literal, Hashable
 import json
-from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
-from pydantic import BaseModel
+from datetime import datetime
+from functools import lru_cache
+from contextlib import nullcontext
+from pydantic import BaseModel, Field
 
-from src.database.config import get_db
+from src.database.config import get_read_db, ReadSessionLocal
 from src.models.models import Organization, User, Badge, Course, Enrollment
-from src.analytics.engine import AnalyticsEngine
+from src.analytics.engine import PRIMARY_CHARTS, PAGE_OPTIONS
+from src.analytics.cache import CachedAnalyticsEngine, result_cache, trend_bucket_cache
+from src.analytics.stats import stats_provider
+from src.analytics.router import router
+from src.analytics import export
+from src.config.settings import get_settings
+from src import llm as llm_calls
+from src import tracing
+from src.compression import CompressionMiddleware
+from src.serialization import FastJSONResponse, dumps
+from src.tracing import stage
+from src.sessions import create_session_store, gather_by_session
+from src.answer_cache import create_answer_cache, payload_version
 
 # Create FastAPI app instance
 app = FastAPI(
     title="Analytics LLM Server",
     description="A server that processes natural language queries about badge and course enrollment data",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -34,14 +46,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses with brotli or gzip
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=get_settings().COMPRESSION_MINIMUM_BYTES,
+    gzip_level=get_settings().GZIP_LEVEL,
+    brotli_quality=get_settings().BROTLI_QUALITY
+)
+
 # Define request model
 class AnalyticsQuery(BaseModel):
     query: str = "How many people are enrolled in Python Basics badge?"
+    # Follow-up questions sharing a session_id see the recent conversation
+    session_id: Optional[str] = None
+    # Rows per page of detail; defaults to ANALYTICS_DEFAULT_LIMIT, capped at ANALYTICS_MAX_LIMIT
+    limit: Optional[int] = Field(None, ge=1)
+    # next_cursor from a previous response, to fetch the following page
+    cursor: Optional[str] = None
+    # Aggregates only, without per-user detail
+    summary_only: bool = False
+    # "figure" returns a Plotly figure; "spec" returns a small chart descriptor
+    # and the plotted columns for the client to draw
+    chart_format: Literal["figure", "spec"] = "figure"
+    # Window and bucket size of organization trends; by default the last 180 days by month
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    granularity: Literal["day", "week", "month"] = "month"
     
     class Config:
         json_schema_extra = {
             "example": {
-                "query": "How many people are enrolled in Python Basics badge?"
+                "query": "How many people are enrolled in Python Basics badge?",
+                "session_id": "3f1c2a9e",
+                "limit": 100
+            }
+        }
+
+class BatchAnalyticsQuery(BaseModel):
+    # Answered together; results come back in the same order
+    queries: List[AnalyticsQuery] = Field(..., min_length=1,
+                                          max_length=get_settings().ANALYTICS_BATCH_MAX_QUERIES)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": [
+                    {"query": "Show me the top 5 badges by enrollment"},
+                    {"query": "What's the completion rate for Python Basics?"}
+                ]
             }
         }
 
@@ -87,40 +139,119 @@ async def home():
                 </div>
             </div>
             <script>
+                // One conversation per page load so follow-up questions keep context.
+                // crypto.randomUUID only exists on HTTPS and localhost pages.
+                function newSessionId() {
+                    if (window.crypto && typeof crypto.randomUUID === 'function') {
+                        return crypto.randomUUID();
+                    }
+                    if (window.crypto && typeof crypto.getRandomValues === 'function') {
+                        return Array.from(crypto.getRandomValues(new Uint8Array(16)),
+                                          byte => byte.toString(16).padStart(2, '0')).join('');
+                    }
+                    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+                }
+                const sessionId = newSessionId();
+                
+                function renderStats(stats) {
+                    document.getElementById('metadata').innerHTML = '<h3>Statistics:</h3>' +
+                        `<p>Total Users: ${stats.total_users}</p>` +
+                        `<p>Total Badges: ${stats.total_badges}</p>` +
+                        `<p>Total Enrollments: ${stats.total_enrollments}</p>` +
+                        `<p>Total Organizations: ${stats.total_organizations}</p>`;
+                }
+                
+                // Builds a Plotly figure from a chart spec: type, title, encoding and columns
+                function buildFigure(spec) {
+                    const columns = spec.data;
+                    const layout = { title: { text: spec.title } };
+                    const unique = values => [...new Set(values)];
+                    let traces = [];
+                    if (spec.type === 'bar') {
+                        traces = spec.y.map(y => ({ type: 'bar', name: y, x: columns[spec.x], y: columns[y] }));
+                        layout.barmode = spec.barmode;
+                    } else if (spec.type === 'line') {
+                        const groups = spec.color ? unique(columns[spec.color]) : [null];
+                        traces = groups.map(group => {
+                            const rows = columns[spec.x].map((_, i) => i)
+                                .filter(i => group === null || columns[spec.color][i] === group);
+                            return {
+                                type: 'scatter', mode: 'lines', name: group,
+                                x: rows.map(i => columns[spec.x][i]),
+                                y: rows.map(i => columns[spec.y][i])
+                            };
+                        });
+                    } else if (spec.type === 'heatmap') {
+                        // z is a matrix over the distinct x and y values
+                        traces = [{ type: 'heatmap', x: columns[spec.x], y: columns[spec.y], z: columns[spec.z] }];
+                    } else if (spec.type === 'sankey') {
+                        // Links refer to nodes by index
+                        traces = [{
+                            type: 'sankey',
+                            node: { pad: 15, thickness: 20, label: columns[spec.label], color: 'blue' },
+                            link: {
+                                source: columns[spec.source],
+                                target: columns[spec.target],
+                                value: columns[spec.value],
+                                color: 'rgba(0,0,255,0.2)'
+                            }
+                        }];
+                    }
+                    return { data: traces, layout: layout };
+                }
+                
+                function renderVisualization(visualization) {
+                    if (visualization) {
+                        // Plotly figures have no top-level type; chart specs do
+                        const figure = visualization.type ? buildFigure(visualization) : visualization;
+                        Plotly.newPlot('visualization', figure.data, figure.layout);
+                    } else {
+                        document.getElementById('visualization').innerHTML = '';
+                    }
+                }
+                
                 async function sendQuery() {
                     const query = document.getElementById('query').value;
                     const responseText = document.getElementById('response-text');
                     const visualization = document.getElementById('visualization');
                     const metadata = document.getElementById('metadata');
+                    responseText.textContent = '';
+                    visualization.innerHTML = '';
+                    metadata.innerHTML = '';
                     
                     try {
-                        const response = await fetch('/analytics', {
+                        // Events arrive as newline-delimited JSON; render each part as it comes
+                        const response = await fetch('/analytics/stream', {
                             method: 'POST',
                             headers: {
                                 'Content-Type': 'application/json',
                             },
-                            body: JSON.stringify({ query: query })
+                            body: JSON.stringify({ query: query, session_id: sessionId, chart_format: 'spec' })
                         });
                         
-                        const data = await response.json();
-                        
-                        // Display the response text
-                        responseText.textContent = data.response;
-                        
-                        // Display the visualization if available
-                        if (data.visualization) {
-                            const figure = JSON.parse(data.visualization);
-                            Plotly.newPlot('visualization', figure.data, figure.layout);
-                        } else {
-                            visualization.innerHTML = '';
+                        const reader = response.body.getReader();
+                        const decoder = new TextDecoder();
+                        let buffer = '';
+                        while (true) {
+                            const { value, done } = await reader.read();
+                            if (done) break;
+                            buffer += decoder.decode(value, { stream: true });
+                            const lines = buffer.split('\\n');
+                            buffer = lines.pop();
+                            for (const line of lines) {
+                                if (!line.trim()) continue;
+                                const message = JSON.parse(line);
+                                if (message.event === 'database_stats') {
+                                    renderStats(message.data);
+                                } else if (message.event === 'visualization') {
+                                    renderVisualization(message.data);
+                                } else if (message.event === 'token') {
+                                    responseText.textContent += message.data;
+                                } else if (message.event === 'error') {
+                                    responseText.textContent = 'Error: ' + message.data;
+                                }
+                            }
                         }
-                        
-                        // Display metadata in a more readable format
-                        metadata.innerHTML = '<h3>Statistics:</h3>' +
-                            `<p>Total Users: ${data.metadata.database_stats.total_users}</p>` +
-                            `<p>Total Badges: ${data.metadata.database_stats.total_badges}</p>` +
-                            `<p>Total Enrollments: ${data.metadata.database_stats.total_enrollments}</p>` +
-                            `<p>Total Organizations: ${data.metadata.database_stats.total_organizations}</p>`;
                     } catch (error) {
                         responseText.innerHTML = 'Error: ' + error.message;
                         visualization.innerHTML = '';
@@ -132,19 +263,179 @@ async def home():
     </html>
     """)
 
-# Initialize LLM
-llm = ChatOpenAI(
-    temperature=0,
-    model="gpt-3.5-turbo",
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
+@lru_cache(maxsize=None)
+def get_llm():
+    """The shared chat model, created (and langchain_openai imported) by the first conversation"""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        temperature=0,
+        model="gpt-3.5-turbo",
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        request_timeout=get_settings().LLM_TIMEOUT_SECONDS
+    )
 
-# Initialize conversation chain
-conversation = ConversationChain(
-    llm=llm,
-    memory=ConversationBufferMemory(),
-    verbose=True
-)
+# Conversation state per client session, with bounded history
+sessions = create_session_store(get_llm)
+
+# Cache of LLM answers, checked before every LLM call
+answer_cache = create_answer_cache()
+
+# Engine result caches, by the value of their ``cache`` label
+RESULT_CACHES = {"result": result_cache, "trend_bucket": trend_bucket_cache}
+
+def cache_metrics() -> List[str]:
+    """Answer and result cache counters, read at scrape time"""
+    answers = answer_cache.stats()
+    lookups = answers["hits"] + answers["misses"]
+    results = [({"cache": name}, cache.stats()) for name, cache in RESULT_CACHES.items()]
+
+    def result_samples(stat: str, pinned: Optional[str] = None) -> List[Tuple[Dict[str, str], float]]:
+        return [(labels, stats[stat] + (stats[pinned] if pinned else 0)) for labels, stats in results]
+
+    return (
+        tracing.render_values("analytics_answer_cache_hits_total", "LLM answers served from the answer cache.",
+                              "counter", [({}, answers["hits"])])
+        + tracing.render_values("analytics_answer_cache_misses_total",
+                                "Answer cache lookups that had to call the LLM.", "counter", [({}, answers["misses"])])
+        + tracing.render_values("analytics_answer_cache_hit_ratio", "Share of answer cache lookups that hit.",
+                                "gauge", [({}, answers["hits"] / lookups if lookups else 0.0)])
+        + tracing.render_values("analytics_result_cache_hits_total", "Engine results served from a result cache.",
+                                "counter", result_samples("hits"))
+        + tracing.render_values("analytics_result_cache_misses_total",
+                                "Result cache lookups that had to run the engine.", "counter", result_samples("misses"))
+        + tracing.render_values("analytics_result_cache_evictions_total",
+                                "Results evicted from a result cache to stay within its limits.", "counter",
+                                result_samples("evictions"))
+        + tracing.render_values("analytics_result_cache_bytes", "Estimated size of the results held, pinned included.",
+                                "gauge", result_samples("bytes", "pinned_bytes"))
+        + tracing.render_values("analytics_result_cache_entries", "Results held, pinned included.",
+                                "gauge", result_samples("entries", "pinned_entries"))
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """
+    Per-intent, per-stage latency histograms and cache counters in the Prometheus text format.
+    """
+    return PlainTextResponse(tracing.render_metrics(cache_metrics()), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats", operation_id="get_database_stats")
+async def get_database_stats(db: Session = Depends(get_read_db)) -> Dict[str, int]:
+    """
+    Snapshot of user, badge, enrollment and organization counts.
+    """
+    return stats_provider.get(db)
+
+def page_options(query_data: AnalyticsQuery) -> Dict[str, Any]:
+    settings = get_settings()
+    limit = settings.ANALYTICS_DEFAULT_LIMIT if query_data.limit is None else query_data.limit
+    return {
+        "limit": min(limit, settings.ANALYTICS_MAX_LIMIT),
+        "cursor": query_data.cursor,
+        "summary_only": query_data.summary_only,
+        "chart_format": query_data.chart_format,
+        "start": query_data.start,
+        "end": query_data.end,
+        "granularity": query_data.granularity
+    }
+
+def analytics_call(route, options: Dict[str, Any]) -> Hashable:
+    """Identifies the engine call run_analytics makes for a route and options"""
+    if not route.method:
+        return None
+    return (route.method, tuple(sorted(route.kwargs.items())),
+            tuple((name, options[name]) for name in PAGE_OPTIONS[route.method]),
+            options.get("chart_format", "figure"))
+
+def run_analytics(analytics: CachedAnalyticsEngine, route,
+                  options: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    """Runs the engine call chosen by the router, returning its data, primary chart and next page cursor
+
+    The chart is a Plotly figure or, with ``chart_format="spec"``, a chart_spec descriptor.
+    """
+    analytics_data = {}
+    visualization = None
+    next_cursor = None
+    
+    if route.method:
+        paging = {name: options[name] for name in PAGE_OPTIONS[route.method]}
+        result = getattr(analytics, route.method)(**route.kwargs, **paging, charts=[PRIMARY_CHARTS[route.method]],
+                                                  chart_format=options.get("chart_format", "figure"))
+        if isinstance(result['data'], list):
+            analytics_data['items'] = result['data']
+        else:
+            analytics_data.update(result['data'])
+        visualization = result.get('visualization')
+        next_cursor = result.get('next_cursor')
+    
+    return analytics_data, visualization, next_cursor
+
+def build_prompt(stats: Dict[str, int], analytics_data: Dict[str, Any], query: str) -> str:
+    return f"""
+        Based on the following data:
+        - Total Users: {stats['total_users']}
+        - Total Badges: {stats['total_badges']}
+        - Total Enrollments: {stats['total_enrollments']}
+        - Total Organizations: {stats['total_organizations']}
+        
+        Analytics Data:
+        {json.dumps(analytics_data, indent=2)}
+        
+        Please analyze this query: {query}
+        """
+
+class Narrative:
+    """The LLM answer to one routed question, for /analytics, /analytics/stream and /analytics/batch
+
+    Answers are reused for the same question over the same data, unless earlier
+    turns in the session could change the answer; on an LLM timeout the answer
+    is TIMEOUT_RESPONSE. With ``traced`` the prompt, answer_cache and llm
+    stages are timed; batch answers run concurrently within one request and
+    leave them out.
+    """
+
+    def __init__(self, query_data: AnalyticsQuery, route, stats: Dict[str, int],
+                 analytics_data: Dict[str, Any], traced: bool = True):
+        self.session_id = query_data.session_id
+        self._stage = stage if traced else (lambda name: nullcontext())
+        with self._stage("prompt"):
+            self.prompt = build_prompt(stats, analytics_data, query_data.query)
+        self.conversation = sessions.get(self.session_id)
+        with self._stage("answer_cache"):
+            self.cache_key = answer_cache.key(query_data.query, route.intent, route.kwargs,
+                                              payload_version(stats, analytics_data))
+            self.cached = None
+            if not self.conversation.memory.chat_memory.messages:
+                self.cached = answer_cache.get(self.cache_key)
+        self.timed_out = False
+
+    async def tokens(self, stream: bool = False) -> AsyncIterator[str]:
+        """Yields the answer whole, or with ``stream`` one LLM chunk at a time"""
+        if self.cached is not None:
+            self.conversation.memory.save_context({"input": self.prompt}, {"response": self.cached})
+            yield self.cached
+        else:
+            parts = []
+            try:
+                # Without blocking the event loop; when streaming this includes
+                # the time the client takes to read each token
+                with self._stage("llm"):
+                    if stream:
+                        async for token in llm_calls.stream(self.conversation, self.prompt):
+                            parts.append(token)
+                            yield token
+                    else:
+                        parts.append(await llm_calls.predict(self.conversation, self.prompt))
+                answer_cache.set(self.cache_key, "".join(parts))
+                if not stream:
+                    yield parts[0]
+            except llm_calls.LLMTimeoutError:
+                self.timed_out = True
+                yield ("\n\n" if parts else "") + llm_calls.TIMEOUT_RESPONSE
+        sessions.touch(self.session_id)
+
+    async def text(self) -> str:
+        return "".join([token async for token in self.tokens()])
 
 @app.post("/analytics")
 async def handle_analytics_query(
@@ -158,113 +449,210 @@ async def handle_analytics_query(
             "query": "Show me the top 5 badges by enrollment"
         }]
     ),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     Process natural language queries about badge and course enrollment data.
     """
     query = query_data.query
     if not query:
-        return {"error": "No query provided"}
+        return FastJSONResponse({"error": "No query provided"})
     
-    try:
-        analytics = AnalyticsEngine(db)
-        
-        # Get basic statistics for context
-        stats = {
-            "total_users": db.query(User).count(),
-            "total_badges": db.query(Badge).count(),
-            "total_enrollments": db.query(Enrollment).count(),
-            "total_organizations": db.query(Organization).count()
-        }
-        
-        # Pattern matching for specific analytics queries
-        badge_pattern = r"(?i)(how many|enrollments?|users?).+(?:badge|course)\s+[\"']?([^\"']+)[\"']?"
-        org_pattern = r"(?i)(how many|enrollments?|users?).+(?:organization|org)\s+[\"']?([^\"']+)[\"']?"
-        trend_pattern = r"(?i)(trend|over time|historical)"
-        completion_pattern = r"(?i)(completion|success).+(rate|percentage)"
-        path_pattern = r"(?i)(learning path|badge combination|journey)"
-        
-        # Initialize response data
-        analytics_data = {}
-        visualization = None
-        
-        # Check for specific patterns and get corresponding analytics
-        if re.search(badge_pattern, query):
-            badge_name = re.search(badge_pattern, query).group(2)
-            result = analytics.get_badge_enrollments(badge_name)
-            if isinstance(result['data'], list):
-                analytics_data['items'] = result['data']
-            else:
-                analytics_data.update(result['data'])
-            visualization = result.get('visualizations', {}).get('bar')
-        
-        elif re.search(org_pattern, query):
-            org_name = re.search(org_pattern, query).group(2)
-            result = analytics.get_organization_trends(org_name)
-            if isinstance(result['data'], list):
-                analytics_data['items'] = result['data']
-            else:
-                analytics_data.update(result['data'])
-            visualization = result.get('visualizations', {}).get('line')
-        
-        elif re.search(trend_pattern, query):
-            result = analytics.get_organization_trends()
-            if isinstance(result['data'], list):
-                analytics_data['items'] = result['data']
-            else:
-                analytics_data.update(result['data'])
-            visualization = result.get('visualizations', {}).get('line')
-        
-        elif re.search(completion_pattern, query):
-            result = analytics.get_completion_metrics()
-            if isinstance(result['data'], dict):
-                analytics_data.update(result['data'])
-            else:
-                analytics_data['items'] = result['data']
-            visualization = result.get('visualizations', {}).get('heatmap')
-        
-        elif re.search(path_pattern, query):
-            result = analytics.get_learning_paths()
-            if isinstance(result['data'], dict):
-                analytics_data.update(result['data'])
-            else:
-                analytics_data['items'] = result['data']
-            visualization = result.get('visualizations', {}).get('sankey')
-        
-        # Enhance the query with context and analytics data
-        enhanced_query = f"""
-        Based on the following data:
-        - Total Users: {stats['total_users']}
-        - Total Badges: {stats['total_badges']}
-        - Total Enrollments: {stats['total_enrollments']}
-        - Total Organizations: {stats['total_organizations']}
-        
-        Analytics Data:
-        {json.dumps(analytics_data, indent=2)}
-        
-        Please analyze this query: {query}
-        """
-        
-        # Process through LLM
-        response = conversation.predict(input=enhanced_query)
-        
-        # Structure the response with visualization if available
-        result = {
-            "response": response,
-            "type": "analytics",
-            "metadata": {
-                "confidence": 0.9,
-                "query_type": "analytics",
-                "database_stats": stats,
-                "analytics_data": analytics_data
-            }
+    with tracing.trace("/analytics") as request_trace:
+        request_trace.detail["query"] = query[:200]
+        try:
+            analytics = CachedAnalyticsEngine(db)
+            
+            # Get basic statistics for context
+            with stage("stats"):
+                stats = stats_provider.get(db)
+            
+            # Route the question to an engine call
+            with stage("routing"):
+                route = router.route(query, db)
+            request_trace.intent = route.intent
+            
+            with stage("analytics"):
+                analytics_data, visualization, next_cursor = run_analytics(analytics, route, page_options(query_data))
+            
+            # Enhance the query with context and analytics data; on timeout
+            # still return the data and visualization
+            narrative = Narrative(query_data, route, stats, analytics_data)
+            response = await narrative.text()
+            
+            result = analytics_result(route, stats, analytics_data, visualization, next_cursor,
+                                      response, narrative.timed_out, narrative.cached is not None)
+            
+            # Returned as a response so figures skip FastAPI's jsonable_encoder pass
+            return FastJSONResponse(result)
+            
+        except Exception as e:
+            request_trace.detail["error"] = str(e)
+            return FastJSONResponse({"error": str(e)})
+
+def analytics_result(route, stats: Dict[str, int], analytics_data: Dict[str, Any], visualization: Optional[Any],
+                     next_cursor: Optional[str], response: str, llm_timed_out: bool,
+                     answer_cached: bool) -> Dict[str, Any]:
+    """The /analytics response body, with the visualization if there is one"""
+    result = {
+        "response": response,
+        "type": "analytics",
+        "metadata": {
+            "confidence": 0.9,
+            "query_type": "analytics",
+            "intent": route.intent,
+            "database_stats": stats,
+            "analytics_data": analytics_data,
+            "next_cursor": next_cursor,
+            "llm_timed_out": llm_timed_out,
+            "answer_cached": answer_cached
         }
-        
-        if visualization:
-            result["visualization"] = visualization
-        
-        return result
-        
-    except Exception as e:
-        return {"error": str(e)}
+    }
+    if visualization:
+        result["visualization"] = visualization
+    return result
+
+@app.post("/analytics/batch")
+async def handle_analytics_batch(batch: BatchAnalyticsQuery = Body(...),
+                                 db: Session = Depends(get_read_db)) -> Dict[str, Any]:
+    """
+    Answers several questions in one request, as {"results": [...]} in input order.
+    
+    All questions are routed first and share one stats snapshot and database
+    session; questions needing the same engine call share its result. LLM
+    calls then run concurrently, within LLM_MAX_CONCURRENCY, except that
+    questions in the same session are answered in order. A failed question
+    gets {"error": ...} in its place.
+    """
+    with tracing.trace("/analytics/batch") as request_trace:
+        request_trace.intent = "batch"
+        request_trace.detail["queries"] = len(batch.queries)
+        try:
+            analytics = CachedAnalyticsEngine(db)
+            with stage("stats"):
+                stats = stats_provider.get(db)
+            
+            with stage("routing"):
+                routes = [router.route(item.query, db) if item.query else None for item in batch.queries]
+            
+            engine_results: Dict[Hashable, Any] = {}
+            prepared: List[Any] = []
+            with stage("analytics"):
+                for item, route in zip(batch.queries, routes):
+                    if route is None:
+                        prepared.append({"error": "No query provided"})
+                        continue
+                    options = page_options(item)
+                    call = analytics_call(route, options)
+                    try:
+                        if call not in engine_results:
+                            engine_results[call] = run_analytics(analytics, route, options)
+                        prepared.append(engine_results[call])
+                    except Exception as e:
+                        prepared.append({"error": str(e)})
+            request_trace.detail["engine_calls"] = len(engine_results)
+            
+            def answer_item(item: AnalyticsQuery, route, outcome):
+                async def call() -> Dict[str, Any]:
+                    if isinstance(outcome, dict):
+                        return outcome
+                    analytics_data, visualization, next_cursor = outcome
+                    try:
+                        narrative = Narrative(item, route, stats, analytics_data, traced=False)
+                        response = await narrative.text()
+                    except Exception as e:
+                        return {"error": str(e)}
+                    return analytics_result(route, stats, analytics_data, visualization, next_cursor,
+                                            response, narrative.timed_out, narrative.cached is not None)
+                return call
+            
+            with stage("llm"):
+                results = await gather_by_session([
+                    (item.session_id, answer_item(item, route, outcome))
+                    for item, route, outcome in zip(batch.queries, routes, prepared)
+                ])
+            return FastJSONResponse({"results": results})
+            
+        except Exception as e:
+            request_trace.detail["error"] = str(e)
+            return FastJSONResponse({"error": str(e)})
+
+def _event(name: str, data: Any) -> bytes:
+    return dumps({"event": name, "data": data}) + b"\n"
+
+@app.post("/analytics/stream")
+async def stream_analytics_query(query_data: AnalyticsQuery = Body(...)) -> StreamingResponse:
+    """
+    Streaming variant of /analytics as newline-delimited JSON events:
+    database_stats, analytics_data and visualization as soon as they are ready,
+    then one token event per LLM chunk and a final done event.
+    """
+    query = query_data.query
+
+    async def events() -> AsyncIterator[bytes]:
+        if not query:
+            yield _event("error", "No query provided")
+            return
+        # The generator outlives the request scope, so it owns its session
+        db = ReadSessionLocal()
+        with tracing.trace("/analytics/stream") as request_trace:
+            request_trace.detail["query"] = query[:200]
+            try:
+                with stage("stats"):
+                    stats = stats_provider.get(db)
+                yield _event("database_stats", stats)
+                
+                with stage("routing"):
+                    route = router.route(query, db)
+                request_trace.intent = route.intent
+                with stage("analytics"):
+                    analytics_data, visualization, next_cursor = run_analytics(
+                        CachedAnalyticsEngine(db), route, page_options(query_data))
+                yield _event("analytics_data", {"intent": route.intent, "analytics_data": analytics_data,
+                                                "next_cursor": next_cursor})
+                yield _event("visualization", visualization)
+                
+                narrative = Narrative(query_data, route, stats, analytics_data)
+                async for token in narrative.tokens(stream=True):
+                    yield _event("token", token)
+                
+                yield _event("done", {
+                    "llm_timed_out": narrative.timed_out,
+                    "answer_cached": narrative.cached is not None
+                })
+            except Exception as e:
+                request_trace.detail["error"] = str(e)
+                yield _event("error", str(e))
+            finally:
+                db.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/export/{dataset}")
+async def export_dataset(dataset: str, format: str = "arrow", badge_name: Optional[str] = None,
+                         org_name: Optional[str] = None) -> StreamingResponse:
+    """
+    Dataset behind an engine method (badge_enrollments, organization_trends,
+    completion_metrics or learning_path_edges) as an Arrow IPC stream or a
+    Parquet file, streamed in record batches.
+    """
+    if not export.EXPORT_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Export requires pyarrow")
+    if dataset not in export.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset {dataset!r}")
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}; use one of {list(export.FORMATS)}")
+
+    def chunks():
+        # The generator outlives the request scope, so it owns its session
+        db = ReadSessionLocal()
+        try:
+            yield from export.stream_export(db, dataset, format, get_settings().EXPORT_BATCH_SIZE,
+                                            badge_name=badge_name, org_name=org_name)
+        finally:
+            db.close()
+
+    extension = "arrows" if format == "arrow" else "parquet"
+    return StreamingResponse(chunks(), media_type=export.FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="{dataset}.{extension}"'
+    })
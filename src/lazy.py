@@ -0,0 +1,36 @@
+"""Deferred imports for heavy optional-at-startup libraries.
+
+``pd = lazy_module("pandas")`` binds a stand-in that imports pandas on first
+attribute access, so modules can keep their usual ``pd.DataFrame`` spelling
+without paying for the import when the process starts. Annotations naming
+lazy modules must be quoted, or they trigger the import at definition time.
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+class LazyModule:
+    """Imports ``name`` the first time one of its attributes is used"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
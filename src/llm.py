@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+from src.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Returned in place of the narrative when the LLM does not answer in time
+TIMEOUT_RESPONSE = "The analysis narrative is taking longer than expected. The data and visualization are shown below."
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call (including time spent queued) exceeds its timeout"""
+
+# Created lazily so it binds to the running event loop
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+async def predict(chain, text: str, timeout: Optional[float] = None) -> str:
+    """Runs chain.apredict without blocking the event loop
+
+    At most LLM_MAX_CONCURRENCY calls are in flight at once; the timeout covers
+    both waiting for a slot and the completion itself.
+    """
+    timeout = settings.LLM_TIMEOUT_SECONDS if timeout is None else timeout
+
+    async def call() -> str:
+        async with _get_semaphore():
+            return await chain.apredict(input=text)
+
+    try:
+        return await asyncio.wait_for(call(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"LLM call timed out after {timeout}s")
+        raise LLMTimeoutError(f"LLM did not respond within {timeout}s")
+
+async def stream(chain, text: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """Yields the completion for a ConversationChain token by token
+
+    Same concurrency cap and overall timeout as predict(). The prompt is built
+    from the chain's memory and the finished turn is saved back to it.
+    """
+    timeout = settings.LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    semaphore = _get_semaphore()
+
+    async def within_deadline(awaitable):
+        remaining = deadline - loop.time()
+        try:
+            if remaining <= 0:
+                if hasattr(awaitable, "close"):
+                    awaitable.close()
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM stream timed out after {timeout}s")
+            raise LLMTimeoutError(f"LLM did not finish within {timeout}s")
+
+    await within_deadline(semaphore.acquire())
+    try:
+        inputs = chain.prep_inputs({chain.input_key: text})
+        prompt = chain.prompt.format(**{k: inputs[k] for k in chain.prompt.input_variables})
+        chunks = chain.llm.astream(prompt).__aiter__()
+        parts = []
+        while True:
+            try:
+                chunk = await within_deadline(chunks.__anext__())
+            except StopAsyncIteration:
+                break
+            token = getattr(chunk, "content", chunk)
+            parts.append(token)
+            yield token
+        chain.memory.save_context({chain.input_key: text}, {chain.output_key: "".join(parts)})
+    finally:
+        semaphore.release()
@@ -1,3 +1,7 @@
+# Started before the other imports so they count towards the startup time
+from src.startup import StartupTimer
+startup = StartupTimer()
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi_mcp import FastApiMCP
@@ -6,6 +10,9 @@ from dotenv import load_dotenv
 
 from src.deployment import app
 from src.database.init_db import init_db
+from src.database.config import ReadSessionLocal
+from src.analytics.precompute import create_precompute_scheduler
+from src.config.settings import get_settings
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +24,8 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+startup.mark("imports")
+
 def main():
     # Create FastApiMCP instance with operation IDs
     mcp = FastApiMCP(app, include_operations=[
@@ -24,11 +33,13 @@ def main():
         "get_organization_trends",
         "get_completion_metrics",
         "get_learning_paths",
+        "get_database_stats",
         "process_analytics_query"
     ])
     
     # Mount the MCP operations to the FastAPI app
     mcp.mount()
+    startup.mark("mcp")
     
     # Initialize database
     try:
@@ -38,6 +49,12 @@ def main():
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
+    startup.mark("init_db")
+    
+    # Keep the hot analytics results warm in the background
+    if get_settings().PRECOMPUTE_ENABLED:
+        create_precompute_scheduler(ReadSessionLocal).start()
+    logger.info(startup.report())
     
     # Run the FastAPI server with uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
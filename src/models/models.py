@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Table
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Date, Float, Table, Index, event, insert
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database.config import Base
+from ..database.versions import VERSION_ROW_ID, create_version_triggers
 
 # Many-to-many relationship table for Course-Badge
 course_badge = Table('course_badge', Base.metadata,
@@ -23,7 +24,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     name = Column(String)
-    organization_id = Column(Integer, ForeignKey("organizations.id"))
+    organization_id = Column(Integer, ForeignKey("organizations.id"), index=True)
     organization = relationship("Organization", back_populates="users")
     enrollments = relationship("Enrollment", back_populates="user")
 
@@ -55,3 +56,76 @@ class Enrollment(Base):
     
     user = relationship("User", back_populates="enrollments")
     badge = relationship("Badge", back_populates="enrollments")
+
+    # Composite indexes matching the engine's access paths; the trailing
+    # columns let the aggregates be answered from the index alone.
+    __table_args__ = (
+        Index("ix_enrollments_badge_enrollment_date", "badge_id", "enrollment_date", "completion_date", "user_id"),
+        Index("ix_enrollments_user_enrollment_date", "user_id", "enrollment_date", "badge_id"),
+        Index("ix_enrollments_enrollment_date_user", "enrollment_date", "user_id"),
+        Index("ix_enrollments_completion_date", "completion_date"),
+    )
+
+
+# Rollup tables maintained incrementally by src.analytics.rollups.
+# Durations are days between enrollment and completion, for completed enrollments only.
+
+class BadgeDailyRollup(Base):
+    __tablename__ = "rollup_badge_daily"
+
+    badge_id = Column(Integer, ForeignKey("badges.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    enrollments = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    duration_min = Column(Float, nullable=True)
+    duration_max = Column(Float, nullable=True)
+
+class OrganizationMonthlyRollup(Base):
+    __tablename__ = "rollup_org_monthly"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    enrollments = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    duration_min = Column(Float, nullable=True)
+    duration_max = Column(Float, nullable=True)
+
+class BadgeOrganizationRollup(Base):
+    __tablename__ = "rollup_badge_org"
+
+    badge_id = Column(Integer, ForeignKey("badges.id"), primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    enrollments = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    duration_min = Column(Float, nullable=True)
+    duration_max = Column(Float, nullable=True)
+
+class RollupState(Base):
+    """Marker row written by a full rebuild; rollups are only read once it exists"""
+    __tablename__ = "rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    rebuilt_at = Column(DateTime, default=datetime.utcnow)
+
+class EnrollmentVersion(Base):
+    """Counts of writes to the enrollments table in one row, kept by triggers (see src.database.versions)"""
+    __tablename__ = "enrollment_versions"
+
+    id = Column(Integer, primary_key=True)
+    writes = Column(BigInteger, nullable=False, default=0)
+    # Writes folded into the rollup tables by the ORM flush hooks, or covered by a rebuild
+    rollup_writes = Column(BigInteger, nullable=False, default=0)
+    # Writes that can change past days: backdated inserts, moved enrollments and users, deletes,
+    # and organization renames and deletes
+    history_writes = Column(BigInteger, nullable=False, default=0)
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_enrollment_versions(target, connection, tables=(), **kw) -> None:
+    # After every table, since the triggers live on enrollments
+    if EnrollmentVersion.__table__ in tables:
+        connection.execute(insert(EnrollmentVersion.__table__).values(
+            id=VERSION_ROW_ID, writes=0, rollup_writes=0, history_writes=0))
+        create_version_triggers(connection)
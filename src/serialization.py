@@ -0,0 +1,43 @@
+"""JSON encoding for API responses.
+
+Engine results carry Plotly figure dicts, NumPy arrays and scalars, and the
+occasional pandas timestamp. ``dumps`` encodes all of them in one orjson pass,
+so figures are embedded as JSON objects instead of pre-encoded strings.
+"""
+import datetime
+import decimal
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(value: Any) -> Any:
+    """Types orjson does not encode natively"""
+    # Object and non-contiguous arrays are rejected by OPT_SERIALIZE_NUMPY
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "to_pydatetime"):  # pandas Timestamp
+        return None if value != value else value.isoformat()
+    if hasattr(value, "to_dict"):  # pandas Series/DataFrame
+        return value.to_dict()
+    if hasattr(value, "to_plotly_json"):  # Plotly figures and graph objects
+        return value.to_plotly_json()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> bytes:
+    """Encodes ``value`` as UTF-8 JSON; NaN and infinity become null"""
+    return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps``"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Any, List, Optional, Sequence, Tuple
+from src.config.settings import get_settings
+
+if TYPE_CHECKING:
+    from langchain.chains import ConversationChain
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+@lru_cache(maxsize=None)
+def _memory_class() -> type:
+    # Defined on first use so importing this module does not load langchain
+    from langchain.memory import ConversationBufferWindowMemory
+
+    class BoundedWindowMemory(ConversationBufferWindowMemory):
+        """Window memory that also drops old messages and truncates long ones
+
+        ConversationBufferWindowMemory only limits what is loaded into the prompt;
+        the underlying message list keeps growing. This keeps at most ``k`` turns
+        stored, each message capped at ``max_message_chars``.
+        """
+        max_message_chars: int = 4000
+
+        def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+            super().save_context(inputs, outputs)
+            messages = self.chat_memory.messages[-2 * self.k:] if self.k > 0 else []
+            for message in messages:
+                if isinstance(message.content, str) and len(message.content) > self.max_message_chars:
+                    message.content = message.content[:self.max_message_chars] + " …[truncated]"
+            self.chat_memory.messages = messages
+
+        def size_chars(self) -> int:
+            return sum(len(m.content) for m in self.chat_memory.messages if isinstance(m.content, str))
+
+    return BoundedWindowMemory
+
+def __getattr__(name: str) -> Any:
+    if name == "BoundedWindowMemory":
+        return _memory_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class SessionStore:
+    """Conversation chains keyed by client session ID
+
+    Sessions idle for longer than ``idle_seconds`` are dropped, and the least
+    recently used sessions are evicted once ``max_sessions`` or
+    ``max_total_chars`` of stored conversation is exceeded.
+    """
+
+    def __init__(self, llm_factory: Callable[[], Any], window_turns: int = 3, max_message_chars: int = 4000,
+                 idle_seconds: float = 1800.0, max_sessions: int = 1000, max_total_chars: int = 20_000_000):
+        self.llm_factory = llm_factory
+        self.window_turns = window_turns
+        self.max_message_chars = max_message_chars
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.max_total_chars = max_total_chars
+        self._sessions: "OrderedDict[str, Tuple[ConversationChain, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _new_chain(self) -> "ConversationChain":
+        from langchain.chains import ConversationChain
+        return ConversationChain(
+            llm=self.llm_factory(),
+            memory=_memory_class()(k=self.window_turns, max_message_chars=self.max_message_chars),
+            verbose=True
+        )
+
+    def get(self, session_id: Optional[str]) -> "ConversationChain":
+        """Returns the chain for a session; without an ID the chain carries no history"""
+        if not session_id:
+            return self._new_chain()
+        with self._lock:
+            self._evict_idle()
+            entry = self._sessions.pop(session_id, None)
+            chain = entry[0] if entry else self._new_chain()
+            self._sessions[session_id] = (chain, time.monotonic())
+            self._enforce_caps()
+            return chain
+
+    def touch(self, session_id: Optional[str]) -> None:
+        """Re-applies the caps after a turn has been stored for ``session_id``"""
+        if not session_id:
+            return
+        with self._lock:
+            if session_id in self._sessions:
+                chain, _ = self._sessions[session_id]
+                self._sessions[session_id] = (chain, time.monotonic())
+                self._sessions.move_to_end(session_id)
+            self._enforce_caps()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "stored_chars": self._total_chars(),
+                "evictions": self.evictions
+            }
+
+    def _total_chars(self) -> int:
+        return sum(chain.memory.size_chars() for chain, _ in self._sessions.values())
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _enforce_caps(self) -> None:
+        total_chars = self._total_chars()
+        # Never evict the most recent session, which the caller is using
+        while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or total_chars > self.max_total_chars):
+            session_id, (chain, _) = self._sessions.popitem(last=False)
+            total_chars -= chain.memory.size_chars()
+            self.evictions += 1
+            logger.debug(f"Evicted conversation session {session_id}")
+
+def create_session_store(llm_factory: Callable[[], Any]) -> SessionStore:
+    return SessionStore(
+        llm_factory,
+        window_turns=settings.SESSION_WINDOW_TURNS,
+        max_message_chars=settings.SESSION_MAX_MESSAGE_CHARS,
+        idle_seconds=settings.SESSION_IDLE_SECONDS,
+        max_sessions=settings.SESSION_MAX_COUNT,
+        max_total_chars=settings.SESSION_MAX_TOTAL_CHARS
+    )
+
+async def gather_by_session(calls: Sequence[Tuple[Optional[str], Callable[[], Awaitable[Any]]]]) -> List[Any]:
+    """Awaits (session_id, call) pairs concurrently, returning results in input order
+
+    Calls for the same session run one after another in input order, so each
+    turn sees the ones before it; calls without a session ID are independent.
+    """
+    results: List[Any] = [None] * len(calls)
+    lanes: Dict[Any, List[int]] = {}
+    for index, (session_id, _) in enumerate(calls):
+        lanes.setdefault((session_id,) if session_id else index, []).append(index)
+
+    async def run(indices: List[int]) -> None:
+        for index in indices:
+            results[index] = await calls[index][1]()
+
+    await asyncio.gather(*(run(indices) for indices in lanes.values()))
+    return results
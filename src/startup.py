@@ -0,0 +1,69 @@
+"""Cold-start timing.
+
+``StartupTimer`` times the boot phases of ``src.main`` and logs one summary
+line. ``import_times()`` imports a module in a fresh interpreter under
+``python -X importtime``. The startup test uses it to check that the app
+imports within budget and without the heavy libraries that are loaded on
+first use. To see the slowest imports, run:
+
+    PYTHONPATH=. python -m src.startup
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Loaded on first use (charts, export, LLM calls), never while importing the app
+HEAVY_MODULES = ("pandas", "numpy", "plotly", "pyarrow", "langchain", "langchain_core",
+                 "langchain_openai", "openai")
+
+# Cumulative -X importtime of src.deployment; it was about 3.1 s with eager imports
+IMPORT_BUDGET_SECONDS = 2.0
+
+class StartupTimer:
+    """Wall time of consecutive boot phases"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        """Ends ``phase``, which started when the previous one ended"""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def report(self) -> str:
+        total = self._last - self.started
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        return f"Startup took {total:.2f}s ({phases})"
+
+def import_times(module: str = "src.deployment", cwd: Optional[Path] = None) -> Dict[str, Tuple[int, int]]:
+    """Module name -> (self, cumulative) import time in microseconds, from a fresh interpreter"""
+    cwd = cwd or Path(__file__).resolve().parents[1]
+    env = {**os.environ, "PYTHONPATH": str(cwd)}
+    env.setdefault("OPENAI_API_KEY", "startup-check")
+    env.setdefault("DATABASE_URL", "sqlite:///./dev.db")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+if __name__ == "__main__":
+    times = import_times()
+    print(f"src.deployment imports in {times['src.deployment'][1] / 1e6:.2f}s "
+          f"(budget {IMPORT_BUDGET_SECONDS:.1f}s); slowest top-level packages:")
+    top_level = {name: cumulative for name, (_, cumulative) in times.items() if "." not in name}
+    for name, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:15]:
+        print(f"  {cumulative / 1e3:9.1f} ms  {name}")
+    loaded = [name for name in HEAVY_MODULES if name in times]
+    if loaded:
+        print(f"Heavy modules imported at startup: {', '.join(loaded)}")
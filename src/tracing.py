@@ -0,0 +1,170 @@
+"""Per-stage request timing, Prometheus histograms and the slow-request log.
+
+A request opens a trace with ``trace()``; code anywhere below it marks stages
+with ``stage(name)``. Stage times are exclusive: a stage nested in another one
+(e.g. a box-plot query run while rendering) is subtracted from its parent, so
+the stages of a request add up to its total, with the untracked remainder
+reported as ``other``. Outside a trace, ``stage()`` does nothing.
+
+Histograms live in this process only; with several workers each exposes its own.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from src.config.settings import get_settings
+
+slow_logger = logging.getLogger("src.tracing.slow_requests")
+
+settings = get_settings()
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with +Inf last, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _labels(self, labelvalues: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labelvalues, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{self._labels(labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labelvalues)} {total!r}")
+            lines.append(f"{self.name}_count{self._labels(labelvalues)} {count}")
+        return lines
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+stage_seconds = Histogram(
+    "analytics_stage_duration_seconds",
+    "Exclusive time spent in each stage of an analytics request.",
+    ("endpoint", "intent", "stage")
+)
+request_seconds = Histogram(
+    "analytics_request_duration_seconds",
+    "Total time to answer an analytics request.",
+    ("endpoint", "intent")
+)
+
+def render_values(name: str, documentation: str, metric_type: str,
+                  samples: Sequence[Tuple[Dict[str, str], float]]) -> List[str]:
+    """One counter or gauge, read elsewhere at scrape time, in the Prometheus text format"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        pairs = ",".join(f'{label}="{_escape(labelvalue)}"' for label, labelvalue in labels.items())
+        lines.append(f"{name}{{{pairs}}} {value!r}" if pairs else f"{name} {value!r}")
+    return lines
+
+def render_metrics(extra: Sequence[str] = ()) -> str:
+    """All histograms, followed by the ``extra`` lines, in the Prometheus text exposition format"""
+    return "\n".join(stage_seconds.render() + request_seconds.render() + list(extra)) + "\n"
+
+class Trace:
+    """Stage timings for one request"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.intent: Optional[str] = None
+        self.detail: Dict[str, object] = {}
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        # [stage name, start time, time spent in nested stages]
+        self._stack: List[list] = []
+
+    def enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self) -> None:
+        name, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def finish(self) -> float:
+        total = time.perf_counter() - self.started
+        self.stages["other"] = max(total - sum(self.stages.values()), 0.0)
+        return total
+
+_current: ContextVar[Optional[Trace]] = ContextVar("analytics_trace", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the enclosed block as ``name`` in the current trace, if there is one"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    current.enter(name)
+    try:
+        yield
+    finally:
+        current.exit()
+
+@contextmanager
+def trace(endpoint: str, slow_seconds: Optional[float] = None) -> Iterator[Trace]:
+    """Traces one request and records its stages when it ends
+
+    Requests slower than ``slow_seconds`` (default SLOW_REQUEST_SECONDS; None
+    disables it) are logged with their per-stage breakdown.
+    """
+    current = Trace(endpoint)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        total = current.finish()
+        intent = current.intent or "none"
+        for name, seconds in current.stages.items():
+            stage_seconds.observe(seconds, endpoint, intent, name)
+        request_seconds.observe(total, endpoint, intent)
+
+        threshold = settings.SLOW_REQUEST_SECONDS if slow_seconds is None else slow_seconds
+        if threshold is not None and total >= threshold:
+            slow_logger.warning(json.dumps({
+                "endpoint": endpoint,
+                "intent": current.intent,
+                "total_seconds": round(total, 4),
+                "stages": {name: round(seconds, 4) for name, seconds in
+                           sorted(current.stages.items(), key=lambda item: -item[1])},
+                **current.detail
+            }, default=str))
@@ -3,8 +3,15 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..src.database.config import Base
 from ..src.models.models import Organization, User, Badge, Course, Enrollment
-from ..src.analytics.engine import AnalyticsEngine
+from ..src.analytics.engine import AnalyticsEngine, DATA_ONLY
+from ..src.analytics.cache import (
+    CachedAnalyticsEngine, ResultCache, bump_data_version, data_version, history_version
+)
+from ..src.analytics.stats import DatabaseStatsProvider
+from ..src.analytics.rollups import rebuild_rollups
+from ..src.analytics.explain import explain_engine
 from datetime import datetime, timedelta
+import numpy as np
 
 # Test database
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -91,3 +98,518 @@ def test_learning_paths(db_session):
     
     assert len(result["data"]) > 0
     assert "visualization" in result
+
+def test_requested_charts_only(db_session):
+    analytics = AnalyticsEngine(db_session)
+    result = analytics.get_completion_metrics(charts=["heatmap"])
+    
+    assert list(result["visualizations"]) == ["heatmap"]
+    assert result["visualization"] == result["visualizations"]["heatmap"]
+
+def test_data_only(db_session):
+    analytics = AnalyticsEngine(db_session)
+    result = analytics.get_badge_enrollments(charts=DATA_ONLY)
+    
+    assert len(result["data"]) == 2
+    assert result["visualizations"] == {}
+    assert result["visualization"] is None
+
+def test_unknown_chart(db_session):
+    analytics = AnalyticsEngine(db_session)
+    with pytest.raises(ValueError):
+        analytics.get_organization_trends(charts=["pie"])
+
+def test_chart_specs(db_session):
+    from ..src.tracing import trace
+    
+    analytics = AnalyticsEngine(db_session)
+    with trace("/test") as current:
+        badges = analytics.get_badge_enrollments(chart_format="spec")
+        trends = analytics.get_organization_trends(chart_format="spec")
+        metrics = analytics.get_completion_metrics(chart_format="spec")
+        paths = analytics.get_learning_paths(chart_format="spec")
+    
+    # No figure is built for specs
+    assert not {"render", "to_dict"} & set(current.stages)
+    assert badges["visualization"] == {
+        "type": "bar", "title": "Badge Enrollments and Completions", "x": "badge",
+        "y": ["total_enrollments", "completed"], "barmode": "group",
+        "data": {name: [row[name] for row in badges["data"]]
+                 for name in ("badge", "total_enrollments", "completed")}
+    }
+    assert (trends["visualization"]["type"], trends["visualization"]["color"]) == ("line", "organization")
+    heatmap = metrics["visualization"]["data"]
+    for row in metrics["data"]:
+        assert heatmap["completion_rate"][heatmap["organization"].index(row["organization"])][
+            heatmap["badge"].index(row["badge"])] == row["completion_rate"]
+    assert list(paths["visualizations"]) == ["sankey"]
+    assert paths["visualization"]["data"] == {"badge": ["Python Test", "Data Test"], "source": [0],
+                                              "target": [1], "value": [1]}
+    with pytest.raises(ValueError):
+        analytics.get_completion_metrics(charts=["box_plot"], chart_format="spec")
+    with pytest.raises(ValueError):
+        analytics.get_completion_metrics(chart_format="svg")
+
+def test_organization_trend_windows(db_session):
+    now = datetime.utcnow()
+    analytics = AnalyticsEngine(db_session)
+    
+    by_day = analytics.get_organization_trends(charts=DATA_ONLY, granularity="day", start=now - timedelta(days=26))
+    assert [row["day"] for row in by_day["data"]] == [
+        (now - timedelta(days=25)).strftime("%Y-%m-%d"), (now - timedelta(days=20)).strftime("%Y-%m-%d")]
+    by_week = analytics.get_organization_trends(charts=DATA_ONLY, granularity="week", start=now - timedelta(days=60))
+    assert sum(row["enrollments"] for row in by_week["data"]) == 3
+    assert all(datetime.strptime(row["week"], "%Y-%m-%d").weekday() == 0 for row in by_week["data"])
+    
+    # Just inside the first whole month of a window that starts later in the day
+    this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    db_session.add(Enrollment(user=db_session.query(User).first(), badge=db_session.query(Badge).first(),
+                              enrollment_date=this_month + timedelta(minutes=30)))
+    db_session.commit()
+    rebuild_rollups(db_session)
+    raw = AnalyticsEngine(db_session, use_rollups=False)
+    month_start = (now - timedelta(days=60)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for window in [{}, {"start": month_start}, {"start": this_month - timedelta(days=20) + timedelta(hours=2)},
+                   {"start": now - timedelta(days=60), "end": now - timedelta(days=22)}]:
+        rolled = AnalyticsEngine(db_session).get_organization_trends(charts=DATA_ONLY, **window)["data"]
+        assert rolled == raw.get_organization_trends(charts=DATA_ONLY, **window)["data"]
+    assert sum(row["enrollments"] for row in rolled) == 2
+    
+    with pytest.raises(ValueError):
+        analytics.get_organization_trends(granularity="quarter")
+    with pytest.raises(ValueError):
+        analytics.get_organization_trends(start=now, end=now - timedelta(days=1))
+
+def test_closed_trend_buckets_are_cached(db_session):
+    from ..src.analytics.explain import capture_queries
+    from ..src.analytics.engine import bucket_start
+    
+    buckets = ResultCache(ttl=None)
+    today = bucket_start(datetime.utcnow(), "day")
+    
+    def trends():
+        analytics = CachedAnalyticsEngine(db_session, ResultCache())
+        analytics.bucket_cache = buckets
+        with capture_queries(db_session) as captured:
+            result = analytics.get_organization_trends(charts=DATA_ONLY, granularity="day",
+                                                       start=today - timedelta(days=40))
+        bounds = [p for _, parameters in captured for p in parameters if isinstance(p, str) and p[:2] == "20"]
+        return sum(row["enrollments"] for row in result["data"]), min(bounds)[:10]
+    
+    assert trends() == (3, str((today - timedelta(days=40)).date()))
+    # Only the current day is queried once the 40 closed days are cached
+    assert trends() == (3, str(today.date()))
+    assert buckets.stats()["hits"] == 40
+    
+    user, badge = db_session.query(User).first(), db_session.query(Badge).first()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    assert trends() == (4, str(today.date()))
+    
+    # Backdated enrollments invalidate the closed buckets
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=today - timedelta(days=10)))
+    db_session.commit()
+    assert trends() == (5, str((today - timedelta(days=40)).date()))
+    assert trends() == (5, str(today.date()))
+    
+    # Completing an enrollment leaves past days alone
+    enrollment = db_session.query(Enrollment).filter(Enrollment.completion_date.is_(None)).first()
+    enrollment.completion_date = datetime.utcnow()
+    db_session.commit()
+    assert trends() == (5, str(today.date()))
+    
+    # Backdated writes from other connections are seen too
+    from sqlalchemy import insert
+    with engine.begin() as conn:
+        conn.execute(insert(Enrollment.__table__).values(user_id=user.id, badge_id=badge.id,
+                                                         enrollment_date=today - timedelta(days=3)))
+    assert trends() == (6, str((today - timedelta(days=40)).date()))
+
+def test_closed_trend_buckets_follow_organization_changes(db_session):
+    from ..src.analytics.engine import bucket_start
+    
+    buckets = ResultCache(ttl=None)
+    today = bucket_start(datetime.utcnow(), "day")
+    
+    def organizations():
+        analytics = CachedAnalyticsEngine(db_session, ResultCache())
+        analytics.bucket_cache = buckets
+        result = analytics.get_organization_trends(charts=DATA_ONLY, granularity="day",
+                                                   start=today - timedelta(days=40))
+        return sorted({row["organization"] for row in result["data"]})
+    
+    assert organizations() == ["Test Corp"]
+    organization = db_session.query(Organization).one()
+    organization.name = "Renamed Corp"
+    db_session.commit()
+    assert organizations() == ["Renamed Corp"]
+    
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    user.organization = Organization(name="Other Corp", description="Other Organization")
+    db_session.commit()
+    assert organizations() == ["Other Corp", "Renamed Corp"]
+    
+    db_session.delete(organization)
+    db_session.commit()
+    assert organizations() == ["Other Corp"]
+
+def test_result_cache_invalidated_by_new_enrollment(db_session):
+    cache = ResultCache()
+    first = CachedAnalyticsEngine(db_session, cache).get_badge_enrollments("Python Test", charts=DATA_ONLY)
+    again = CachedAnalyticsEngine(db_session, cache).get_badge_enrollments("Python Test", charts=DATA_ONLY)
+    
+    assert again is first
+    assert cache.stats()["hits"] == 1
+    
+    badge = db_session.query(Badge).filter(Badge.name == "Python Test").one()
+    user = db_session.query(User).first()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    
+    fresh = CachedAnalyticsEngine(db_session, cache).get_badge_enrollments("Python Test", charts=DATA_ONLY)
+    assert fresh["data"][0]["total_enrollments"] == 3
+    assert cache.stats()["misses"] == 2
+
+def test_data_version_counts_writes_from_other_connections(db_session):
+    from sqlalchemy import insert, update
+    
+    enrollments = Enrollment.__table__
+    before, history = data_version(db_session), history_version(db_session)
+    with engine.begin() as conn:
+        conn.execute(update(enrollments).where(enrollments.c.completion_date.is_(None))
+                     .values(completion_date=datetime.utcnow()))
+        conn.execute(insert(enrollments).values(user_id=1, badge_id=1, enrollment_date=datetime.utcnow()))
+    
+    assert data_version(db_session)[0] == before[0] + 2
+    # Neither write changed a past day
+    assert history_version(db_session) == history
+
+def test_result_cache_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, 1, {"value": key})
+    
+    assert cache.get("a", 1) == (False, None)
+    assert cache.get("c", 1) == (True, {"value": "c"})
+    assert cache.stats()["evictions"] == 1
+
+def test_precompute_warms_requested_results(db_session):
+    from ..src.analytics.precompute import PrecomputeScheduler, first_page_options
+    
+    cache = ResultCache(ttl=0)
+    scheduler = PrecomputeScheduler(TestingSessionLocal, cache, top_badges=1, chart_formats=["spec"])
+    assert scheduler.run_once()
+    assert not scheduler.run_once()
+    assert cache.stats()["pinned_entries"] == 4
+    
+    # Pinned results outlive the TTL and serve requests made the way /analytics makes them
+    warmed = CachedAnalyticsEngine(db_session, cache).get_completion_metrics(
+        charts=["heatmap"], **first_page_options("get_completion_metrics", "spec"))
+    assert cache.stats()["hits"] == 1
+    assert warmed["visualization"]["type"] == "heatmap"
+    
+    badge = db_session.query(Badge).filter(Badge.name == "Python Test").one()
+    db_session.add(Enrollment(user=db_session.query(User).first(), badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    assert scheduler.run_once()
+    top = CachedAnalyticsEngine(db_session, cache).get_badge_enrollments(
+        "Python Test", charts=["bar"], **first_page_options("get_badge_enrollments", "spec"))
+    assert top["data"][0]["total_enrollments"] == 3
+    assert cache.stats()["hits"] == 2
+
+def test_rollups_match_raw_queries(db_session):
+    raw = AnalyticsEngine(db_session, use_rollups=False)
+    rebuild_rollups(db_session)
+    rolled = AnalyticsEngine(db_session)
+    
+    assert rolled.rollups_available
+    assert sorted(rolled.get_badge_enrollments(charts=DATA_ONLY)["data"], key=str) == sorted(raw.get_badge_enrollments(charts=DATA_ONLY)["data"], key=str)
+    assert sorted(rolled.get_completion_metrics(charts=DATA_ONLY)["data"], key=str) == sorted(raw.get_completion_metrics(charts=DATA_ONLY)["data"], key=str)
+    assert sorted(rolled.get_organization_trends(charts=DATA_ONLY)["data"], key=str) == \
+        sorted(raw.get_organization_trends(charts=DATA_ONLY)["data"], key=str)
+
+def test_rollups_maintained_on_write(db_session):
+    rebuild_rollups(db_session)
+    badge = db_session.query(Badge).filter(Badge.name == "Data Test").one()
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    now = datetime.utcnow()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=now - timedelta(days=10),
+                              completion_date=now - timedelta(days=4)))
+    db_session.commit()
+    enrollment = db_session.query(Enrollment).filter(Enrollment.badge_id == badge.id,
+                                                     Enrollment.completion_date.is_(None)).one()
+    enrollment.completion_date = now
+    db_session.commit()
+    
+    raw = AnalyticsEngine(db_session, use_rollups=False)
+    rolled = AnalyticsEngine(db_session)
+    assert sorted(rolled.get_completion_metrics(charts=DATA_ONLY)["data"], key=str) == sorted(raw.get_completion_metrics(charts=DATA_ONLY)["data"], key=str)
+    assert rolled.get_badge_enrollments("Data Test", charts=DATA_ONLY)["data"][0]["completed"] == 2
+    
+    # Groups left empty are removed
+    db_session.delete(db_session.query(Enrollment).filter(Enrollment.user_id == user.id,
+                                                          Enrollment.badge_id == badge.id).one())
+    db_session.commit()
+    assert AnalyticsEngine(db_session).rollups_available
+    assert sorted(AnalyticsEngine(db_session).get_completion_metrics(charts=DATA_ONLY)["data"], key=str) == \
+        sorted(raw.get_completion_metrics(charts=DATA_ONLY)["data"], key=str)
+
+def test_rollups_follow_users_moving_between_organizations(db_session):
+    from sqlalchemy import update
+    
+    rebuild_rollups(db_session)
+    other = Organization(name="Other Corp", description="Other Organization")
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    user.organization = other
+    db_session.commit()
+    
+    raw = AnalyticsEngine(db_session, use_rollups=False)
+    rolled = AnalyticsEngine(db_session)
+    assert rolled.rollups_available
+    assert sorted(rolled.get_completion_metrics(charts=DATA_ONLY)["data"], key=str) == \
+        sorted(raw.get_completion_metrics(charts=DATA_ONLY)["data"], key=str)
+    assert sorted(rolled.get_organization_trends(charts=DATA_ONLY)["data"], key=str) == \
+        sorted(raw.get_organization_trends(charts=DATA_ONLY)["data"], key=str)
+    
+    # A move that bypasses the ORM is counted as drift
+    with engine.begin() as conn:
+        conn.execute(update(User.__table__).where(User.__table__.c.id == user.id)
+                     .values(organization_id=user.organization_id - 1))
+    assert not AnalyticsEngine(db_session).rollups_available
+
+def test_rollups_not_read_after_writes_bypassing_the_orm(db_session):
+    from sqlalchemy import insert
+    from ..src.analytics.rollups import apply_deltas
+    from ..src.models.models import BadgeOrganizationRollup
+    
+    rebuild_rollups(db_session)
+    badge = db_session.query(Badge).filter(Badge.name == "Data Test").one()
+    # Deltas add to the stored measures in place
+    with engine.begin() as conn:
+        apply_deltas(conn, {(BadgeOrganizationRollup, (badge.id, 1)): [2, 1, 3.0, 3.0, 3.0]})
+    row = db_session.query(BadgeOrganizationRollup).filter_by(badge_id=badge.id).one()
+    assert (row.enrollments, row.completions, row.duration_min) == (3, 1, 3.0)
+    
+    rebuild_rollups(db_session)
+    with engine.begin() as conn:
+        conn.execute(insert(Enrollment.__table__).values(user_id=1, badge_id=badge.id,
+                                                         enrollment_date=datetime.utcnow()))
+    stale = AnalyticsEngine(db_session)
+    assert not stale.rollups_available
+    assert stale.get_badge_enrollments("Data Test", charts=DATA_ONLY)["data"][0]["total_enrollments"] == 2
+    
+    rebuild_rollups(db_session)
+    assert AnalyticsEngine(db_session).rollups_available
+
+@pytest.mark.parametrize("use_rollups", [True, False])
+def test_engine_queries_avoid_full_scans(db_session, use_rollups):
+    if use_rollups:
+        rebuild_rollups(db_session)
+    report = explain_engine(db_session, use_rollups=use_rollups, analyze=True)
+    
+    scans = {label: [q["full_scans"] for q in queries if q["full_scans"]] for label, queries in report.items()}
+    # Path counts and transitions cover every user by design, and the first page of users
+    # walks the user index only up to its LIMIT; the page's steps are read by user id
+    assert len(scans.pop("get_learning_paths(limit=10)")) == 3
+    assert {label: lines for label, lines in scans.items() if lines} == {}
+
+def test_full_scans_include_index_scans():
+    from ..src.analytics.explain import full_scans
+    
+    plan = ["SCAN enrollments USING COVERING INDEX ix_enrollments_user_enrollment_date",
+            "SEARCH enrollments USING INDEX ix_enrollments_badge_enrollment_date (badge_id=?)",
+            "SCAN enrollments",
+            "SCAN badges"]
+    assert full_scans(plan) == [plan[0], plan[2]]
+
+def test_database_stats_snapshot(db_session):
+    provider = DatabaseStatsProvider(ttl=60)
+    stats = provider.get(db_session)
+    
+    assert stats == {"total_users": 2, "total_badges": 2, "total_enrollments": 3, "total_organizations": 1}
+    
+    db_session.add(Organization(name="Other Corp", description="Other"))
+    db_session.commit()
+    assert provider.get(db_session)["total_organizations"] == 1
+    
+    bump_data_version()
+    assert provider.get(db_session)["total_organizations"] == 2
+
+def test_completion_time_distribution_is_exact(db_session):
+    badge = db_session.query(Badge).filter(Badge.name == "Data Test").one()
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    start = datetime(2025, 1, 1)
+    days = [3, 4, 5, 5, 6, 7, 8, 60]
+    db_session.add_all([Enrollment(user=user, badge=badge, enrollment_date=start,
+                                   completion_date=start + timedelta(days=d)) for d in days])
+    db_session.commit()
+    
+    analytics = AnalyticsEngine(db_session)
+    dist = {(d["badge"], d["organization"]): d for d in analytics.get_completion_time_distribution()}
+    data_test = dist[("Data Test", "Test Corp")]
+    
+    assert data_test["completions"] == len(days)
+    assert data_test["median"] == pytest.approx(np.percentile(days, 50))
+    assert data_test["q1"] == pytest.approx(np.percentile(days, 25))
+    assert data_test["q3"] == pytest.approx(np.percentile(days, 75))
+    assert data_test["lowerfence"] == pytest.approx(3)
+    assert data_test["upperfence"] == pytest.approx(8)
+    assert dist[("Python Test", "Test Corp")]["median"] == pytest.approx(24)
+    assert analytics.get_completion_metrics(charts=["box_plot"])["visualizations"]["box_plot"]
+
+def test_learning_paths_with_comma_in_badge_name(db_session):
+    badge = Badge(name="Python, Advanced", description="Comma in name")
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    
+    result = AnalyticsEngine(db_session).get_learning_paths(charts=["sankey", "chord"])
+    
+    assert result["data"]["paths"] == {
+        "Python Test → Data Test": 1,
+        "Python Test → Python, Advanced": 1
+    }
+    details = {d["user_name"]: d["path"] for d in result["data"]["path_details"]}
+    assert details["Test User 2"] == ["Python Test", "Python, Advanced"]
+
+@pytest.mark.parametrize("use_rollups", [True, False])
+def test_keyset_pagination(db_session, use_rollups):
+    if use_rollups:
+        rebuild_rollups(db_session)
+    analytics = AnalyticsEngine(db_session, use_rollups=use_rollups)
+    
+    first = analytics.get_badge_enrollments(charts=DATA_ONLY, limit=1)
+    second = analytics.get_badge_enrollments(charts=DATA_ONLY, limit=1, cursor=first["next_cursor"])
+    assert [r["badge"] for r in first["data"] + second["data"]] == ["Data Test", "Python Test"]
+    assert second["next_cursor"] is None
+    
+    rows, cursor = [], None
+    while True:
+        page = analytics.get_completion_metrics(charts=DATA_ONLY, limit=1, cursor=cursor)
+        rows += page["data"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert rows == analytics.get_completion_metrics(charts=DATA_ONLY)["data"]
+
+def test_learning_paths_paging_and_summary(db_session):
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    badge = db_session.query(Badge).filter(Badge.name == "Data Test").one()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    analytics = AnalyticsEngine(db_session)
+    
+    first = analytics.get_learning_paths(charts=["timeline"], limit=1)
+    second = analytics.get_learning_paths(charts=DATA_ONLY, limit=1, cursor=first["next_cursor"])
+    assert [d["user_name"] for d in first["data"]["path_details"]] == ["Test User 1"]
+    assert [d["user_name"] for d in second["data"]["path_details"]] == ["Test User 2"]
+    assert second["next_cursor"] is None
+    assert first["data"]["paths"] == second["data"]["paths"]
+    
+    summary = analytics.get_learning_paths(charts=DATA_ONLY, summary_only=True)
+    assert "path_details" not in summary["data"]
+    assert summary["data"]["total_users"] == 2
+    assert summary["data"]["distinct_paths"] == 1
+    assert summary["next_cursor"] is None
+    
+    with pytest.raises(ValueError):
+        analytics.get_learning_paths(charts=DATA_ONLY, cursor="not-a-cursor")
+
+def test_learning_paths_capped_to_most_common(db_session, monkeypatch):
+    from ..src.analytics import engine
+    
+    badge = Badge(name="Python, Advanced", description="Comma in name")
+    user = db_session.query(User).filter(User.email == "user2@test.com").one()
+    db_session.add(Enrollment(user=user, badge=badge, enrollment_date=datetime.utcnow()))
+    db_session.commit()
+    monkeypatch.setattr(engine, "TOP_LEARNING_PATHS", 1)
+    
+    result = AnalyticsEngine(db_session).get_learning_paths(charts=DATA_ONLY, limit=1)
+    
+    assert result["data"]["paths"] == {"Python Test → Data Test": 1}
+    assert (result["data"]["distinct_paths"], result["data"]["total_users"]) == (2, 2)
+    assert [d["user_name"] for d in result["data"]["path_details"]] == ["Test User 1"]
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_export_matches_engine_data(db_session, fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from ..src.analytics.export import stream_export
+    import io
+    
+    encoded = b"".join(stream_export(db_session, "completion_metrics", fmt, batch_size=1))
+    if fmt == "arrow":
+        table = pa.ipc.open_stream(encoded).read_all()
+    else:
+        table = pq.read_table(io.BytesIO(encoded))
+    
+    expected = AnalyticsEngine(db_session).get_completion_metrics(charts=DATA_ONLY)["data"]
+    assert table.num_rows == len(expected)
+    assert sorted(table.column("badge").to_pylist()) == sorted(r["badge"] for r in expected)
+    assert sum(table.column("total_enrollments").to_pylist()) == sum(r["total_enrollments"] for r in expected)
+    
+    edges = pa.ipc.open_stream(b"".join(stream_export(db_session, "learning_path_edges"))).read_all()
+    assert edges.to_pylist() == [{"source": "Python Test", "target": "Data Test", "value": 1}]
+
+def test_engine_stages_are_traced(db_session):
+    from ..src.tracing import trace
+    
+    with trace("/test") as current:
+        AnalyticsEngine(db_session).get_completion_metrics(charts=["heatmap", "box_plot"])
+    
+    assert {"sql", "dataframe", "render", "to_dict"} <= set(current.stages)
+
+@pytest.mark.parametrize("use_rollups", [True, False])
+def test_engine_queries_compile_for_postgresql(db_session, use_rollups):
+    from sqlalchemy import event
+    from sqlalchemy.dialects import postgresql
+    from ..src.analytics.rollups import _aggregate_select, ROLLUPS
+    
+    if use_rollups:
+        rebuild_rollups(db_session)
+    statements = [_aggregate_select(model) for model in ROLLUPS]
+    
+    def capture(state):
+        statements.append(state.statement)
+    event.listen(db_session, "do_orm_execute", capture)
+    try:
+        analytics = AnalyticsEngine(db_session, use_rollups=use_rollups)
+        analytics.get_badge_enrollments()
+        analytics.get_organization_trends()
+        analytics.get_completion_metrics()
+        analytics.get_learning_paths()
+    finally:
+        event.remove(db_session, "do_orm_execute", capture)
+    
+    compiled = [str(statement.compile(dialect=postgresql.dialect())) for statement in statements]
+    assert not [sql for sql in compiled if "julianday" in sql or "strftime" in sql or "date(" in sql]
+    assert any("EXTRACT(EPOCH FROM" in sql for sql in compiled)
+    assert any("to_char(" in sql for sql in compiled)
+
+def test_dialect_constructs():
+    from sqlalchemy import column, select
+    from sqlalchemy.dialects import postgresql, sqlite
+    from ..src.database.dialect import days_between, month_key, week_key, day_key, string_agg
+    
+    statement = select(days_between(column("a"), column("b")), month_key(column("a")), week_key(column("a")),
+                       day_key(column("a")), string_agg(column("name"), ", "))
+    sqlite_sql = str(statement.compile(dialect=sqlite.dialect()))
+    postgresql_sql = str(statement.compile(dialect=postgresql.dialect()))
+    for fragment in ("(julianday(b) - julianday(a))", "strftime('%Y-%m', a)", "date(a, 'weekday 0', '-6 days')",
+                     "date(a)", "group_concat(name, "):
+        assert fragment in sqlite_sql
+    for fragment in ("CAST(EXTRACT(EPOCH FROM (b) - (a)) / 86400.0 AS DOUBLE PRECISION)",
+                     "to_char(a, 'YYYY-MM')", "to_char(date_trunc('week', a), 'YYYY-MM-DD')",
+                     "CAST(a AS DATE)", "string_agg(name, "):
+        assert fragment in postgresql_sql
+    
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        row = conn.execute(select(
+            days_between(datetime(2025, 1, 1), datetime(2025, 1, 2, 12)),
+            month_key(datetime(2025, 3, 9)),
+            day_key(datetime(2025, 3, 9, 15)),
+            week_key(datetime(2025, 3, 9, 15)),
+            week_key(datetime(2025, 3, 10))
+        )).one()
+    assert tuple(row) == (1.5, "2025-03", datetime(2025, 3, 9).date(), "2025-03-03", "2025-03-10")
@@ -0,0 +1,29 @@
+from ..src.answer_cache import AnswerCache, MemoryBackend, SQLiteBackend, normalize_query, payload_version
+
+def test_trivial_rewordings_share_a_key():
+    version = payload_version({"items": [1, 2]})
+    a = AnswerCache.key("What's the completion rate?", "completion_metrics", {}, version)
+    b = AnswerCache.key("what is the  completion rate", "completion_metrics", {}, version)
+    
+    assert normalize_query("Show me the Completion RATE!") == "completion rate"
+    assert a == b
+    assert a != AnswerCache.key("what is the completion rate", "completion_metrics", {}, payload_version({"items": [1, 3]}))
+
+def test_memory_backend_hits_and_expiry():
+    cache = AnswerCache(MemoryBackend(max_entries=1), ttl=60)
+    cache.set("k1", "answer 1")
+    cache.set("k2", "answer 2")
+    
+    assert cache.get("k1") is None
+    assert cache.get("k2") == "answer 2"
+    assert cache.stats()["hit_rate"] == 0.5
+    
+    expired = AnswerCache(MemoryBackend(), ttl=-1)
+    expired.set("k", "stale")
+    assert expired.get("k") is None
+
+def test_sqlite_backend_persists(tmp_path):
+    path = str(tmp_path / "answers.db")
+    AnswerCache(SQLiteBackend(path), ttl=60).set("k", "stored")
+    
+    assert AnswerCache(SQLiteBackend(path), ttl=60).get("k") == "stored"
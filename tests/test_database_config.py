@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from ..src.database.config import create_database_engine, sqlite_pragmas
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+def test_sqlite_profile_applied_on_connect(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 1  # NORMAL
+    assert pragma(engine, "temp_store") == 2  # MEMORY
+    assert pragma(engine, "cache_size") == sqlite_pragmas()["cache_size"]
+    
+    default = create_database_engine(f"sqlite:///{tmp_path / 'default.db'}", pragmas={})
+    assert pragma(default, "journal_mode") == "delete"
+
+def test_read_only_engine_cannot_write(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    writer = create_database_engine(url)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    
+    reader = create_database_engine(url, read_only=True)
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT x FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+    
+    with pytest.raises(ValueError):
+        create_database_engine("sqlite://", read_only=True)
@@ -0,0 +1,215 @@
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake import FakeStreamingListLLM
+from sqlalchemy.orm import sessionmaker
+# The app imports its modules as ``src``; patch those same modules
+from src import deployment
+from src.analytics import cache
+from src.answer_cache import AnswerCache, MemoryBackend
+from src.database.config import Base, create_database_engine
+from src.models.models import Organization, User, Badge, Enrollment
+from src.sessions import SessionStore
+
+BADGE_QUESTION = "How many people are enrolled in Python Test?"
+COMPLETION_QUESTION = "What is the completion rate by organization?"
+PATHS_QUESTION = "What are the common learning paths?"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with Session() as db:
+        org = Organization(name="Test Corp", description="Test Organization")
+        python = Badge(name="Python Test", description="Python Testing")
+        data = Badge(name="Data Test", description="Data Testing")
+        user1 = User(name="Test User 1", email="user1@test.com", organization=org)
+        user2 = User(name="Test User 2", email="user2@test.com", organization=org)
+        now = datetime.utcnow()
+        db.add_all([
+            Enrollment(user=user1, badge=python, enrollment_date=now - timedelta(days=30),
+                       completion_date=now - timedelta(days=5)),
+            Enrollment(user=user1, badge=data, enrollment_date=now - timedelta(days=20)),
+            Enrollment(user=user2, badge=python, enrollment_date=now - timedelta(days=10))
+        ])
+        db.commit()
+
+    def read_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Every session gets its own canned LLM, answering "first", "second", ... in turn
+    monkeypatch.setitem(deployment.app.dependency_overrides, deployment.get_read_db, read_db)
+    monkeypatch.setattr(deployment, "ReadSessionLocal", Session)
+    monkeypatch.setattr(deployment, "sessions",
+                        SessionStore(lambda: FakeStreamingListLLM(responses=["first", "second", "third"])))
+    monkeypatch.setattr(deployment, "answer_cache", AnswerCache(None))
+
+    def reset():
+        cache.result_cache.clear()
+        cache.trend_bucket_cache.clear()
+        deployment.router.invalidate()
+        deployment.stats_provider.invalidate()
+
+    reset()
+    yield TestClient(deployment.app)
+    reset()
+    engine.dispose()
+
+def test_batch_results_in_input_order_with_shared_engine_calls(client, monkeypatch):
+    calls = []
+    run_analytics = deployment.run_analytics
+
+    def counted(analytics, route, options):
+        calls.append(route.method)
+        return run_analytics(analytics, route, options)
+
+    monkeypatch.setattr(deployment, "run_analytics", counted)
+    response = client.post("/analytics/batch", json={"queries": [
+        {"query": BADGE_QUESTION, "session_id": "a"},
+        {"query": COMPLETION_QUESTION, "session_id": "b"},
+        {"query": BADGE_QUESTION, "session_id": "c"}
+    ]})
+
+    results = response.json()["results"]
+    assert [r["metadata"]["intent"] for r in results] == ["badge_enrollments", "completion_metrics",
+                                                         "badge_enrollments"]
+    assert sorted(calls) == ["get_badge_enrollments", "get_completion_metrics"]
+    assert results[0]["metadata"]["analytics_data"] == results[2]["metadata"]["analytics_data"]
+    assert results[0]["metadata"]["analytics_data"]["items"][0]["total_enrollments"] == 2
+
+def test_batch_answers_a_session_in_order(client):
+    response = client.post("/analytics/batch", json={"queries": [
+        {"query": BADGE_QUESTION, "session_id": "s"},
+        {"query": COMPLETION_QUESTION, "session_id": "t"},
+        {"query": PATHS_QUESTION, "session_id": "s"}
+    ]})
+
+    assert [r["response"] for r in response.json()["results"]] == ["first", "first", "second"]
+    messages = [m.content for m in deployment.sessions.get("s").memory.chat_memory.messages]
+    assert BADGE_QUESTION in messages[0] and PATHS_QUESTION in messages[2]
+    assert (messages[1], messages[3]) == ("first", "second")
+
+def test_batch_isolates_failed_questions(client):
+    response = client.post("/analytics/batch", json={"queries": [
+        {"query": ""},
+        {"query": PATHS_QUESTION, "cursor": "not-a-cursor"},
+        {"query": BADGE_QUESTION}
+    ]})
+
+    results = response.json()["results"]
+    assert results[0] == {"error": "No query provided"}
+    assert list(results[1]) == ["error"]
+    assert results[2]["response"] == "first"
+    assert results[2]["metadata"]["llm_timed_out"] is False
+
+def stream_events(client, **body):
+    response = client.post("/analytics/stream", json=body)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_stream_sends_data_before_tokens(client):
+    events = stream_events(client, query=BADGE_QUESTION, chart_format="spec")
+
+    names = [e["event"] for e in events]
+    assert names[:3] == ["database_stats", "analytics_data", "visualization"]
+    assert set(names[3:-1]) == {"token"} and names[-1] == "done"
+    assert events[0]["data"]["total_enrollments"] == 3
+    assert events[1]["data"]["intent"] == "badge_enrollments"
+    assert events[2]["data"]["type"] == "bar"
+    assert "".join(e["data"] for e in events[3:-1]) == "first"
+    assert events[-1]["data"] == {"llm_timed_out": False, "answer_cached": False}
+
+def test_stream_still_sends_data_when_the_llm_times_out(client, monkeypatch):
+    monkeypatch.setattr(deployment.sessions, "llm_factory",
+                        lambda: FakeStreamingListLLM(responses=["too late"], sleep=1))
+    monkeypatch.setattr(deployment.llm_calls.settings, "LLM_TIMEOUT_SECONDS", 0.05)
+
+    events = stream_events(client, query=BADGE_QUESTION, chart_format="spec")
+
+    assert [e["event"] for e in events] == ["database_stats", "analytics_data", "visualization", "token", "done"]
+    assert events[3]["data"] == deployment.llm_calls.TIMEOUT_RESPONSE
+    assert events[-1]["data"] == {"llm_timed_out": True, "answer_cached": False}
+
+def scrape(client):
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+def test_metrics_record_each_stage_of_an_analytics_request(client):
+    before = scrape(client)
+    body = client.post("/analytics", json={"query": BADGE_QUESTION, "chart_format": "spec"}).json()
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert body["response"] == "first"
+    labels = 'endpoint="/analytics",intent="badge_enrollments"'
+    for stage in ("stats", "routing", "analytics", "sql", "prompt", "answer_cache", "llm", "other"):
+        assert delta(f'analytics_stage_duration_seconds_count{{{labels},stage="{stage}"}}') == 1
+        assert delta(f'analytics_stage_duration_seconds_bucket{{{labels},stage="{stage}",le="+Inf"}}') == 1
+    assert delta(f"analytics_request_duration_seconds_count{{{labels}}}") == 1
+    # Stage times are exclusive, so they add up to the request's total
+    stage_seconds = sum(delta(name) for name in after
+                        if name.startswith(f"analytics_stage_duration_seconds_sum{{{labels},"))
+    assert stage_seconds == pytest.approx(delta(f"analytics_request_duration_seconds_sum{{{labels}}}"))
+
+def test_metrics_export_answer_cache_counters(client, monkeypatch):
+    monkeypatch.setattr(deployment, "answer_cache", AnswerCache(MemoryBackend(16)))
+    assert scrape(client)["analytics_answer_cache_hit_ratio"] == 0
+    
+    for _ in range(3):
+        client.post("/analytics", json={"query": BADGE_QUESTION, "chart_format": "spec"})
+    samples = scrape(client)
+    
+    assert samples["analytics_answer_cache_hits_total"] == 2
+    assert samples["analytics_answer_cache_misses_total"] == 1
+    assert samples["analytics_answer_cache_hit_ratio"] == pytest.approx(2 / 3)
+
+def test_metrics_export_result_cache_counters(client):
+    before = scrape(client)
+    for _ in range(2):
+        client.post("/analytics", json={"query": BADGE_QUESTION, "chart_format": "spec"})
+    samples = scrape(client)
+    
+    result = '{cache="result"}'
+    for name, delta in (("hits_total", 1), ("misses_total", 1), ("evictions_total", 0)):
+        name = f"analytics_result_cache_{name}{result}"
+        assert samples[name] - before[name] == delta
+    assert samples[f"analytics_result_cache_entries{result}"] == 1
+    assert samples[f"analytics_result_cache_bytes{result}"] == cache.result_cache.stats()["bytes"] > 0
+    assert 'analytics_result_cache_hits_total{cache="trend_bucket"}' in samples
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_export_round_trips_through_pyarrow(client, fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    def export(dataset, **params):
+        response = client.get(f"/export/{dataset}", params={"format": fmt, **params})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == deployment.export.FORMATS[fmt]
+        if fmt == "arrow":
+            return pa.ipc.open_stream(response.content).read_all().to_pylist()
+        return pq.read_table(io.BytesIO(response.content)).to_pylist()
+
+    assert export("learning_path_edges") == [{"source": "Python Test", "target": "Data Test", "value": 1}]
+    rows = export("badge_enrollments", badge_name="Python Test")
+    assert [(r["badge"], r["total_enrollments"], r["completed"]) for r in rows] == [("Python Test", 2, 1)]
+
+def test_export_rejects_unknown_datasets_and_formats(client):
+    assert client.get("/export/users").status_code == 404
+    assert client.get("/export/completion_metrics", params={"format": "csv"}).status_code == 400
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from ..src import llm
+
+class SlowChain:
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def apredict(self, input):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return f"answer: {input}"
+
+def test_predict_returns_answer():
+    assert asyncio.run(llm.predict(SlowChain(0), "q", timeout=1)) == "answer: q"
+
+def test_predict_times_out():
+    with pytest.raises(llm.LLMTimeoutError):
+        asyncio.run(llm.predict(SlowChain(1), "q", timeout=0.05))
+
+def test_predict_caps_concurrency(monkeypatch):
+    monkeypatch.setattr(llm, "_semaphore", None)
+    monkeypatch.setattr(llm.settings, "LLM_MAX_CONCURRENCY", 2)
+    chain = SlowChain(0.01)
+    
+    async def burst():
+        return await asyncio.gather(*[llm.predict(chain, str(i), timeout=5) for i in range(6)])
+    
+    assert len(asyncio.run(burst())) == 6
+    assert chain.peak == 2
+
+def test_stream_yields_tokens_and_saves_turn():
+    from langchain_core.language_models.fake import FakeStreamingListLLM
+    from ..src.sessions import SessionStore
+    chain = SessionStore(lambda: FakeStreamingListLLM(responses=["two badges"])).get("s")
+    
+    async def collect():
+        return [token async for token in llm.stream(chain, "how many?", timeout=5)]
+    
+    assert "".join(asyncio.run(collect())) == "two badges"
+    assert chain.memory.chat_memory.messages[-1].content == "two badges"
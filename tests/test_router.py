@@ -0,0 +1,52 @@
+from sqlalchemy.orm import sessionmaker
+from ..src.analytics.router import IntentRouter
+from ..src.database.config import Base, create_database_engine
+from ..src.models.models import Badge
+
+def make_router():
+    router = IntentRouter()
+    router.load(["Python Master", "Python", "Data Science Pro"], ["Tech Corp", "Data Systems"])
+    return router
+
+def test_routes_badge_question_to_exact_badge():
+    route = make_router().route('How many people are enrolled in the "Python Master" badge?')
+    
+    assert route.method == "get_badge_enrollments"
+    assert route.kwargs == {"badge_name": "Python Master"}
+
+def test_routes_org_and_trend_questions():
+    router = make_router()
+    
+    assert router.route("How many users does tech corp have?").kwargs == {"org_name": "Tech Corp"}
+    trend = router.route("What's the enrollment trend for Data Systems over time?")
+    assert trend.method == "get_organization_trends"
+    assert trend.kwargs == {"org_name": "Data Systems"}
+
+def test_routes_completion_and_paths():
+    router = make_router()
+    
+    assert router.route("What's the completion rate?").method == "get_completion_metrics"
+    assert router.route("Show common learning paths").method == "get_learning_paths"
+    assert router.route("Hello there").method is None
+
+def test_entities_match_whole_words_only():
+    route = make_router().route("How many Pythonistas enrolled?")
+    
+    assert route.entities == {"badges": [], "organizations": []}
+
+def test_refresh_picks_up_renamed_badges(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'router.db'}")
+    Base.metadata.create_all(bind=engine)
+    router = IntentRouter(refresh_interval=0)
+    
+    with sessionmaker(bind=engine)() as db:
+        badge = Badge(name="Python Test", description="Python Testing")
+        db.add(badge)
+        db.commit()
+        assert router.route("How many enrolled in Python Test?", db).kwargs == {"badge_name": "Python Test"}
+        
+        # Same row count and ids, new name
+        badge.name = "Rust Test"
+        db.commit()
+        assert router.route("How many enrolled in Rust Test?", db).kwargs == {"badge_name": "Rust Test"}
+    engine.dispose()
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from ..src.serialization import dumps
+from ..src.compression import BROTLI_AVAILABLE, CompressionMiddleware
+
+def test_dumps_numpy_pandas_and_figures():
+    value = {
+        "array": np.array([1.5, 2.5]),
+        "objects": np.array(["a", None], dtype=object),
+        "scalar": np.int64(3),
+        "missing": float("nan"),
+        "when": pd.Timestamp("2025-01-02 03:04:05"),
+        "series": pd.Series([1, 2]),
+        "figure": go.Figure(go.Bar(x=["a"], y=[1])).to_plotly_json(),
+        1: "non-string key",
+    }
+    decoded = json.loads(dumps(value))
+    
+    assert decoded["array"] == [1.5, 2.5]
+    assert decoded["objects"] == ["a", None]
+    assert decoded["scalar"] == 3
+    assert decoded["missing"] is None
+    assert decoded["when"] == "2025-01-02T03:04:05"
+    assert decoded["series"] == [1, 2]
+    assert decoded["figure"]["data"][0]["type"] == "bar"
+    assert decoded["1"] == "non-string key"
+
+def make_client():
+    body = "x" * 5000
+    
+    async def large(request):
+        return PlainTextResponse(body)
+    
+    async def small(request):
+        return PlainTextResponse("ok")
+    
+    async def stream(request):
+        async def chunks():
+            for _ in range(3):
+                yield body
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+    
+    async def export(request):
+        return Response(body.encode(), media_type="application/vnd.apache.arrow.stream")
+    
+    app = Starlette(routes=[Route("/large", large), Route("/small", small), Route("/stream", stream),
+                            Route("/export", export)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app), body
+
+def test_gzip_and_identity():
+    client, body = make_client()
+    
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == body
+    
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/export", headers={"Accept-Encoding": "gzip"}).headers
+    
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert "content-length" not in streamed.headers
+    assert streamed.text == body * 3
+
+@pytest.mark.skipif(not BROTLI_AVAILABLE, reason="brotli not installed")
+def test_brotli_preferred_when_accepted():
+    client, body = make_client()
+    
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == body
+    assert int(response.headers["content-length"]) < len(body)
+    
+    streamed = client.get("/stream", headers={"Accept-Encoding": "br"})
+    assert streamed.headers["content-encoding"] == "br"
+    assert streamed.text == body * 3
+    
+    # br;q=0 opts out
+    assert client.get("/large", headers={"Accept-Encoding": "gzip, br;q=0"}).headers["content-encoding"] == "gzip"
@@ -0,0 +1,59 @@
+import asyncio
+from langchain_core.language_models.fake import FakeListLLM
+from ..src.sessions import SessionStore, gather_by_session
+
+def make_store(**kwargs):
+    return SessionStore(lambda: FakeListLLM(responses=["ok"] * 100), **kwargs)
+
+def test_sessions_are_isolated():
+    store = make_store()
+    store.get("a").predict(input="hello from a")
+    
+    assert store.get("a").memory.chat_memory.messages
+    assert not store.get("b").memory.chat_memory.messages
+    assert not store.get(None).memory.chat_memory.messages
+
+def test_window_bounds_stored_history():
+    store = make_store(window_turns=2, max_message_chars=10)
+    chain = store.get("a")
+    for i in range(5):
+        chain.predict(input=f"question number {i} with a long payload")
+    
+    messages = chain.memory.chat_memory.messages
+    assert len(messages) == 4
+    assert all(len(m.content) <= 10 + len(" …[truncated]") for m in messages)
+
+def test_caps_evict_least_recently_used():
+    store = make_store(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.get(session_id)
+    
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 1
+
+def test_idle_sessions_expire():
+    store = make_store(idle_seconds=0)
+    store.get("a").predict(input="hi")
+    
+    assert not store.get("a").memory.chat_memory.messages
+
+def test_gather_by_session_orders_turns_within_a_session():
+    started, in_flight, peak = [], [0], [0]
+    
+    def call(name, delay):
+        async def run():
+            started.append(name)
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(delay)
+            in_flight[0] -= 1
+            return name
+        return run
+    
+    results = asyncio.run(gather_by_session([
+        ("s", call("s1", 0.02)), (None, call("a", 0)), ("s", call("s2", 0)), (None, call("b", 0))
+    ]))
+    
+    assert results == ["s1", "a", "s2", "b"]
+    assert started.index("s2") > started.index("s1")
+    assert peak[0] == 3
@@ -0,0 +1,29 @@
+from ..src.startup import HEAVY_MODULES, IMPORT_BUDGET_SECONDS, import_times
+from ..src.database import init_db as init_db_module
+
+def test_cold_start_imports():
+    times = import_times("src.deployment")
+    
+    assert [name for name in HEAVY_MODULES if name in times] == []
+    assert times["src.deployment"][1] / 1e6 < IMPORT_BUDGET_SECONDS
+
+def test_init_db_skipped_after_successful_boot(tmp_path, monkeypatch):
+    checks = []
+    rollup_checks = []
+    monkeypatch.setattr(init_db_module.settings, "INIT_DB_MARKER_PATH", str(tmp_path / "marker"))
+    monkeypatch.setattr(init_db_module, "_check_and_seed", lambda: checks.append(1))
+    monkeypatch.setattr(init_db_module, "_check_rollups", lambda: rollup_checks.append(1))
+    monkeypatch.setattr(init_db_module, "_boot_fingerprint", lambda: '{"database": "test"}')
+    
+    init_db_module.init_db()
+    init_db_module.init_db()
+    assert len(checks) == 1
+    # Rollups left stale by outside writes are still rebuilt on skipped boots
+    assert len(rollup_checks) == 1
+    
+    init_db_module.init_db(force=True)
+    assert len(checks) == 2
+    
+    monkeypatch.setattr(init_db_module, "_boot_fingerprint", lambda: '{"database": "other"}')
+    init_db_module.init_db()
+    assert len(checks) == 3
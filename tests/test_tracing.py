@@ -0,0 +1,52 @@
+import logging
+import time
+from ..src.tracing import Histogram, trace, stage, stage_seconds, request_seconds, render_metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "sql")
+    histogram.observe(0.5, "sql")
+    histogram.observe(5.0, "sql")
+    
+    assert histogram.render() == [
+        "# HELP demo_seconds Demo.",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{stage="sql",le="0.1"} 1',
+        'demo_seconds_bucket{stage="sql",le="1.0"} 2',
+        'demo_seconds_bucket{stage="sql",le="+Inf"} 3',
+        'demo_seconds_sum{stage="sql"} 5.55',
+        'demo_seconds_count{stage="sql"} 3',
+    ]
+
+def test_nested_stages_are_exclusive_and_recorded_per_intent():
+    with trace("/test") as current:
+        current.intent = "demo_intent"
+        with stage("render"):
+            time.sleep(0.02)
+            with stage("sql"):
+                time.sleep(0.03)
+    
+    assert 0.02 <= current.stages["render"] < 0.03
+    assert current.stages["sql"] >= 0.03
+    assert set(current.stages) == {"render", "sql", "other"}
+    assert ("/test", "demo_intent", "sql") in stage_seconds._series
+    assert ("/test", "demo_intent") in request_seconds._series
+    assert 'analytics_stage_duration_seconds_count{endpoint="/test",intent="demo_intent",stage="sql"} 1' \
+        in render_metrics()
+
+def test_stage_outside_a_trace_is_a_no_op():
+    with stage("sql"):
+        pass
+
+def test_slow_requests_are_logged_with_their_breakdown(caplog):
+    with caplog.at_level(logging.WARNING, logger="src.tracing.slow_requests"):
+        with trace("/test", slow_seconds=0.0) as current:
+            current.detail["query"] = "slow one"
+            with stage("llm"):
+                pass
+        with trace("/test", slow_seconds=60.0):
+            pass
+    
+    assert len(caplog.records) == 1
+    assert '"query": "slow one"' in caplog.records[0].getMessage()
+    assert '"llm"' in caplog.records[0].getMessage()